@@ -0,0 +1 @@
+"""Benchmark suite for chatnio, run against the local mock server (`python -m benchmarks`)."""
@@ -0,0 +1,89 @@
+# Desc: Benchmark Runner
+#
+# python -m benchmarks                                     run every benchmark
+# python -m benchmarks chat_stream rest                    run some of them
+# python -m benchmarks --save benchmarks/baseline.json     record a new baseline (or update some of its benchmarks)
+# python -m benchmarks --compare benchmarks/baseline.json  fail on regressions against the baseline
+import os
+import sys
+import json
+import argparse
+import platform
+
+import chatnio
+from chatnio.mock import MockServer
+
+from .common import BENCHMARKS, is_regression
+from . import bench_chat, bench_codec, bench_conversation, bench_export, bench_import, bench_rest  # noqa: F401 (register the benchmarks)
+
+
+def run(names: list) -> dict:
+    results = {}
+    for name in names:
+        # a fresh server per benchmark, so they do not share state
+        with MockServer() as server:
+            chatnio.set_endpoint(server.url)
+            chatnio.set_key(server.token)
+            try:
+                results[name] = BENCHMARKS[name](server)
+            except Exception as e:
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+
+        for metric, value in results[name].items():
+            print(f"{name:<20} {metric:<36} {value if isinstance(value, str) else round(value, 3)}")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            expected = baseline.get(name, {}).get(metric)
+            if isinstance(value, str) or not isinstance(expected, (int, float)):
+                continue
+            if is_regression(metric, value, expected, tolerance):
+                regressions.append(f"{name}.{metric}: {value:.3f} (baseline {expected:.3f})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="chatnio benchmarks")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--save", metavar="PATH", help="write the results as the new baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results against a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed regression ratio (default: 0.5)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = run(args.names or list(BENCHMARKS))
+
+    if args.save:
+        if args.names and os.path.exists(args.save):
+            # only some benchmarks were run, keep the others of the baseline
+            with open(args.save) as file:
+                results = {**json.load(file)["results"], **results}
+
+        with open(args.save, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+# Desc: Streaming Chat Benchmarks
+import gc
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+import chatnio
+from .common import benchmark, latency_metrics, Measure
+
+CONNECTIONS = 20
+ASKS = 50
+TOKENS = 256
+THREADS = 4
+
+
+def _responder(message: str, model: str) -> str:
+    return " ".join(["token"] * TOKENS)
+
+
+def _gc_collections() -> int:
+    return sum(generation["collections"] for generation in gc.get_stats())
+
+
+@benchmark("connect")
+def bench_connect(server) -> Dict[str, float]:
+    """Connect latency of `new_chat` (websocket + authentication handshake)"""
+
+    async def run():
+        samples = []
+        for _ in range(CONNECTIONS):
+            start = time.perf_counter()
+            chat = await chatnio.new_chat()
+            samples.append(time.perf_counter() - start)
+            await chat.close_async()
+        return samples
+
+    return latency_metrics("connect", asyncio.run(run()))
+
+
+@benchmark("chat_stream")
+def bench_chat_stream(server) -> Dict[str, float]:
+    """Time to first token, inter-frame latency and throughput of `Chat.ask`"""
+
+    server.responder = _responder
+
+    async def run():
+        first, gaps, frames = [], [], 0
+        chat = await chatnio.new_chat()
+        for _ in range(ASKS):
+            start = last = time.perf_counter()
+            async for partial in chat.ask("benchmark"):
+                now = time.perf_counter()
+                if last is start:
+                    first.append(now - start)
+                else:
+                    gaps.append(now - last)
+                last = now
+                frames += 1
+        await chat.close_async()
+        return first, gaps, frames
+
+    collections = _gc_collections()
+    with Measure() as measure:
+        first, gaps, frames = asyncio.run(run())
+    collections = _gc_collections() - collections
+    with Measure(memory=True) as memory:
+        asyncio.run(run())
+
+    return {
+        **latency_metrics("first_token", first),
+        **latency_metrics("inter_frame", gaps),
+        "frames_per_sec": frames / measure.wall,
+        "messages_per_sec_per_core": ASKS / measure.cpu,
+        "gc_collections": collections,
+        "peak_memory_kb": memory.peak / 1024,
+    }
+
+
+@benchmark("chat_stream_text")
+def bench_chat_stream_text(server) -> Dict[str, float]:
+    """Throughput of the text-only `Chat.ask_text` fast path"""
+
+    server.responder = _responder
+
+    async def run():
+        deltas = 0
+        chat = await chatnio.new_chat()
+        for _ in range(ASKS):
+            async for _ in chat.ask_text("benchmark"):
+                deltas += 1
+        await chat.close_async()
+        return deltas
+
+    collections = _gc_collections()
+    with Measure() as measure:
+        deltas = asyncio.run(run())
+    collections = _gc_collections() - collections
+    with Measure(memory=True) as memory:
+        asyncio.run(run())
+
+    return {
+        "frames_per_sec": deltas / measure.wall,
+        "messages_per_sec_per_core": ASKS / measure.cpu,
+        "gc_collections": collections,
+        "peak_memory_kb": memory.peak / 1024,
+    }
+
+
+@benchmark("chat_stream_sync")
+def bench_chat_stream_sync(server) -> Dict[str, float]:
+    """Throughput of `Chat.ask_sync` with a hook and of the `Chat.stream_sync` iterator, and the cost of leaving
+    an iterator early (the time until the next answer on the same chat is complete)"""
+
+    server.responder = _responder
+    chat = asyncio.run(chatnio.new_chat())  # opened on another loop, moved to the background loop on first use
+    frames = 0
+
+    def hook(partial):
+        nonlocal frames
+        frames += 1
+
+    # the work runs on the background loop thread, so only wall time is meaningful here
+    with Measure() as measure:
+        for _ in range(ASKS):
+            chat.ask_sync("benchmark", hook=hook)
+    with Measure(memory=True) as memory:
+        chat.ask_sync("benchmark", hook=hook)
+
+    iterated = 0
+    with Measure() as iterator:
+        for _ in range(ASKS):
+            for _ in chat.stream_sync("benchmark"):
+                iterated += 1
+
+    samples = []
+    for _ in range(CONNECTIONS):
+        start = time.perf_counter()
+        for _ in chat.stream_sync("benchmark", buffer=1):
+            break
+        for _ in chat.stream_sync("next", text=True):
+            pass
+        samples.append(time.perf_counter() - start)
+    chat.close()
+
+    chats = [chatnio.new_chat_sync() for _ in range(THREADS)]
+    with ThreadPoolExecutor(THREADS) as executor, Measure() as threaded:
+        list(executor.map(lambda chat: [chat.ask_sync("benchmark") for _ in range(ASKS)], chats))
+    for chat in chats:
+        chat.close()
+
+    return {
+        "frames_per_sec": frames / measure.wall,
+        "messages_per_sec": ASKS / measure.wall,
+        "threaded_messages_per_sec": THREADS * ASKS / threaded.wall,
+        "iterator_frames_per_sec": iterated / iterator.wall,
+        **latency_metrics("early_exit", samples),
+        "peak_memory_kb": memory.peak / 1024,
+    }
+
+
+@benchmark("reconnect")
+def bench_reconnect(server) -> Dict[str, float]:
+    """Recovery of a `Chat` with a reconnect policy: time from a dropped connection to the end of the next answer"""
+
+    async def run():
+        samples = []
+        chat = await chatnio.new_chat(1, reconnect=chatnio.ReconnectPolicy(base_delay=0.01))
+        for _ in range(CONNECTIONS):
+            await chat.connection.close()
+            start = time.perf_counter()
+            async for _ in chat.ask("recover"):
+                pass
+            samples.append(time.perf_counter() - start)
+        await chat.close_async()
+        return samples, chat.reconnects
+
+    samples, reconnects = asyncio.run(run())
+    return {**latency_metrics("recover", samples), "reconnects": reconnects}
+
+
+@benchmark("chat_hedge")
+def bench_chat_hedge(server) -> Dict[str, float]:
+    """Time to first token with 5% of the responses stalling 200ms: one chat, then hedged with a learned deadline"""
+
+    server.stall_rate, server.stall_time = 0.05, 0.2
+    server.random.seed(7)
+
+    async def first_frames(chat) -> list:
+        samples = []
+        for _ in range(ASKS * 4):
+            start, first = time.perf_counter(), None
+            async for _ in chat.ask("hedge"):
+                if first is None:
+                    first = time.perf_counter() - start
+            samples.append(first)
+        return samples
+
+    async def run():
+        chat = await chatnio.new_chat()
+        single = await first_frames(chat)
+        await chat.close_async()
+
+        hedged = await chatnio.new_hedged_chat(policy=chatnio.HedgePolicy(initial=0.02, min_delay=0.005))
+        samples = await first_frames(hedged)
+        await hedged.close_async()
+        return single, samples, hedged
+
+    single, samples, hedged = asyncio.run(run())
+    return {
+        **latency_metrics("single_ttft", single),
+        **latency_metrics("hedged_ttft", samples),
+        "hedges_per_ask": hedged.hedges / hedged.asks,
+        "deadline_ms": hedged.policy.deadline() * 1000,
+    }
@@ -0,0 +1,38 @@
+# Desc: JSON Codec Benchmarks
+import json
+import time
+from typing import Dict
+
+from chatnio.codec import CODECS, get_codec
+from .common import benchmark
+
+FRAMES = 20000
+HISTORY = 2000
+
+
+@benchmark("codec")
+def bench_codec(server) -> Dict[str, float]:
+    """Decode throughput of websocket frames and conversation histories per available codec"""
+
+    frame = json.dumps({"message": "token ", "keyword": "", "quota": 0, "end": False}).encode()
+    history = json.dumps({"status": True, "data": {"id": 1, "name": "benchmark", "message": [
+        {"role": "user", "content": "message " * 32} for _ in range(HISTORY)
+    ]}}).encode()
+
+    metrics = {}
+    for name in CODECS:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            continue
+
+        start = time.perf_counter()
+        for _ in range(FRAMES):
+            codec.loads(frame)
+        metrics[f"{name}_frames_per_sec"] = FRAMES / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(10):
+            codec.loads(history)
+        metrics[f"{name}_history_mb_per_sec"] = len(history) * 10 / (time.perf_counter() - start) / 2 ** 20
+    return metrics
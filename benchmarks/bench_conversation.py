@@ -0,0 +1,99 @@
+# Desc: Conversation Storage Benchmarks
+import time
+from typing import Dict
+
+from chatnio import Conversation, MessageList, ColumnarMessages
+from chatnio.codec import dumps_bytes, loads
+from chatnio.conversation import Message
+from .common import benchmark, Measure
+
+PAGES = 2000
+PAGE_SIZE = 50
+
+
+@benchmark("history_prepend")
+def bench_history_prepend(server) -> Dict[str, float]:
+    """Assembling a long history by prepending older pages (`Conversation.insert_messages`)"""
+
+    page = [Message("user", "message") for _ in range(PAGE_SIZE)]
+    conversation = Conversation({"id": 1, "name": "benchmark"})
+
+    start = time.perf_counter()
+    for _ in range(PAGES):
+        conversation.insert_messages(page)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in conversation:
+        pass
+    iteration = time.perf_counter() - start
+
+    with Measure(memory=True) as memory:
+        Conversation({"id": 1, "name": "benchmark"}).insert_messages(page * PAGES)
+
+    return {
+        "prepend_pages_per_sec": PAGES / elapsed,
+        "iterate_messages_per_sec": len(conversation) / iteration,
+        "peak_memory_kb": memory.peak / 1024,
+    }
+
+
+class _DictMessage(object):
+    # the message object before `__slots__`, for comparison
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+
+
+MESSAGES = 20000
+
+
+@benchmark("message_memory")
+def bench_message_memory(server) -> Dict[str, float]:
+    """Memory retained per message after parsing a history: plain objects, slotted `Message` and `ColumnarMessages`"""
+
+    payload = dumps_bytes([
+        {"role": "user" if index % 2 else "assistant", "content": f"message number {index}"}
+        for index in range(MESSAGES)
+    ])
+
+    def retained(build) -> float:
+        with Measure(memory=True) as memory:
+            store = build(loads(payload))
+        del store
+        return memory.current / MESSAGES
+
+    return {
+        "dict_message_bytes": retained(lambda data: [_DictMessage(item["role"], item["content"]) for item in data]),
+        "slots_message_bytes": retained(lambda data: MessageList(Message.parse_list(data))),
+        "columnar_message_bytes": retained(ColumnarMessages.from_records),
+    }
+
+
+CONVERSATIONS = 500
+
+
+@benchmark("conversation_parse")
+def bench_conversation_parse(server) -> Dict[str, float]:
+    """Building conversations with embedded history: lazily (names only) and with every message parsed"""
+
+    payload = [
+        {"id": index, "name": f"conversation {index}", "message": [
+            {"role": "user" if i % 2 else "assistant", "content": "message"} for i in range(50)
+        ]}
+        for index in range(CONVERSATIONS)
+    ]
+
+    start = time.perf_counter()
+    conversations = [Conversation(data) for data in payload]
+    lazy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for conversation in conversations:
+        conversation.messages
+    parse = time.perf_counter() - start
+
+    return {
+        "lazy_conversations_per_sec": CONVERSATIONS / lazy,
+        "parsed_conversations_per_sec": CONVERSATIONS / (lazy + parse),
+    }
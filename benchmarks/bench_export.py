@@ -0,0 +1,42 @@
+# Desc: Conversation Export Benchmarks
+import os
+import tempfile
+from typing import Dict
+
+import chatnio
+from .common import benchmark, Measure
+
+CONVERSATIONS = 200
+HISTORY = 50
+
+
+@benchmark("export")
+def bench_export(server) -> Dict[str, float]:
+    """Throughput and peak memory of exporting conversations and reading the archive back"""
+
+    ids = [
+        server.add_conversation(f"export {index}", [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": "message " * 16} for i in range(HISTORY)
+        ])["id"]
+        for index in range(CONVERSATIONS)
+    ]
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in ("jsonl", "binary"):
+            path = os.path.join(directory, f"archive.{fmt}")
+
+            with Measure() as measure:
+                chatnio.export_conversations(path, ids, format=fmt)
+            with Measure(memory=True) as memory:
+                chatnio.export_conversations(path, ids, format=fmt)
+            metrics[f"{fmt}_export_per_sec"] = CONVERSATIONS / measure.wall
+            metrics[f"{fmt}_export_peak_memory_kb"] = memory.peak / 1024
+            metrics[f"{fmt}_archive_kb"] = os.path.getsize(path) / 1024
+
+            with Measure() as measure:
+                for conversation in chatnio.read_archive(path):
+                    conversation.messages
+            metrics[f"{fmt}_read_per_sec"] = CONVERSATIONS / measure.wall
+
+    return metrics
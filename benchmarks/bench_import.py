@@ -0,0 +1,30 @@
+# Desc: Import Time Benchmarks
+import sys
+import subprocess
+from typing import Dict
+
+from .common import benchmark, percentile
+
+RUNS = 10
+
+
+def _import_time(code: str) -> float:
+    # time measured inside the interpreter, so the interpreter startup is not counted
+    timed = f"import time; start = time.perf_counter(); {code}; print(time.perf_counter() - start)"
+    samples = [
+        float(subprocess.check_output([sys.executable, "-c", timed], text=True))
+        for _ in range(RUNS)
+    ]
+    return percentile(samples, 50) * 1000
+
+
+@benchmark("import")
+def bench_import(server) -> Dict[str, float]:
+    """Cold start cost of `import chatnio` (median of fresh interpreters)"""
+
+    return {
+        "import_chatnio_ms": _import_time("import chatnio"),
+        "import_get_quota_ms": _import_time("import chatnio; chatnio.get_quota"),
+        "import_chat_ms": _import_time("import chatnio; chatnio.Chat"),
+        "import_first_client_ms": _import_time("import chatnio; chatnio.globals.get_client()"),
+    }
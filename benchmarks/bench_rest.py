@@ -0,0 +1,354 @@
+# Desc: REST Helper Benchmarks
+import time
+import asyncio
+from typing import Callable, Dict
+
+import chatnio
+from .common import benchmark, latency_metrics, Measure
+
+REQUESTS = 100
+HISTORY = 200
+
+
+def _sample(func: Callable, count: int = REQUESTS) -> list:
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@benchmark("rest")
+def bench_rest(server) -> Dict[str, float]:
+    """Latency of the blocking REST helpers"""
+
+    metrics = {}
+    for name, func in (
+        ("get_quota", chatnio.get_quota),
+        ("get_subscription", chatnio.get_subscription),
+        ("get_package", chatnio.get_package),
+        ("list_conversations", chatnio.list_conversations),
+    ):
+        metrics.update(latency_metrics(name, _sample(func)))
+    return metrics
+
+
+@benchmark("load_conversation")
+def bench_load_conversation(server) -> Dict[str, float]:
+    """Latency, throughput and memory of loading a long conversation"""
+
+    conversation = server.add_conversation("benchmark", [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": "message " * 32}
+        for i in range(HISTORY)
+    ])
+
+    with Measure() as measure:
+        samples = _sample(lambda: chatnio.load_conversation(conversation["id"]))
+    with Measure(memory=True) as memory:
+        chatnio.load_conversation(conversation["id"])
+
+    return {
+        **latency_metrics("load_conversation", samples),
+        "requests_per_sec": REQUESTS / measure.wall,
+        "requests_per_sec_per_core": REQUESTS / measure.cpu,
+        "peak_memory_kb": memory.peak / 1024,
+    }
+
+
+@benchmark("rest_async")
+def bench_rest_async(server) -> Dict[str, float]:
+    """Throughput of concurrent async REST helpers on one event loop"""
+
+    async def run():
+        await asyncio.gather(*[chatnio.get_quota_async() for _ in range(REQUESTS)])
+
+    with Measure() as measure:
+        asyncio.run(run())
+
+    return {
+        "requests_per_sec": REQUESTS / measure.wall,
+        "requests_per_sec_per_core": REQUESTS / measure.cpu,
+    }
+
+
+@benchmark("conversation_cache")
+def bench_conversation_cache(server) -> Dict[str, float]:
+    """Latency of `load_conversation` served from the cache, and revalidated with the server"""
+
+    conversation = server.add_conversation("benchmark", [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": "message " * 32}
+        for i in range(HISTORY)
+    ])
+
+    cache = chatnio.enable_conversation_cache()
+    try:
+        chatnio.load_conversation(conversation["id"])
+        hits = _sample(lambda: chatnio.load_conversation(conversation["id"]))
+
+        cache.ttl = 0
+        chatnio.invalidate_conversation()
+        chatnio.load_conversation(conversation["id"])
+        revalidations = _sample(lambda: chatnio.load_conversation(conversation["id"]))
+    finally:
+        chatnio.disable_conversation_cache()
+
+    return {
+        **latency_metrics("cache_hit", hits),
+        **latency_metrics("cache_revalidate", revalidations),
+    }
+
+
+LISTED = 1000
+
+
+@benchmark("conversation_list")
+def bench_conversation_list(server) -> Dict[str, float]:
+    """Listing many conversations: the whole list against the first streamed one (`iter_conversations`)"""
+
+    for index in range(LISTED):
+        server.add_conversation(f"conversation {index}")
+
+    whole = _sample(chatnio.list_conversations, 20)
+    first = _sample(lambda: next(iter(chatnio.iter_conversations())), 20)
+    streamed = _sample(lambda: list(chatnio.iter_conversations()), 20)
+
+    return {
+        **latency_metrics("list_conversations", whole),
+        **latency_metrics("iter_first_conversation", first),
+        **latency_metrics("iter_conversations", streamed),
+    }
+
+
+BULK = 200
+
+
+@benchmark("bulk_load")
+def bench_bulk_load(server) -> Dict[str, float]:
+    """Loading many conversations one by one against `load_conversations` / `load_conversations_async`"""
+
+    ids = [server.add_conversation(f"bulk {index}", [{"role": "user", "content": "hi"}])["id"] for index in range(BULK)]
+
+    start = time.perf_counter()
+    for _id in ids:
+        chatnio.load_conversation(_id)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in chatnio.load_conversations(ids, concurrency=8):
+        pass
+    threaded = time.perf_counter() - start
+
+    async def run():
+        async for _ in chatnio.load_conversations_async(ids, concurrency=8):
+            pass
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    concurrent = time.perf_counter() - start
+
+    return {
+        "sequential_loads_per_sec": BULK / sequential,
+        "bulk_loads_per_sec": BULK / threaded,
+        "bulk_async_loads_per_sec": BULK / concurrent,
+    }
+
+
+@benchmark("account_status")
+def bench_account_status(server) -> Dict[str, float]:
+    """Gating a request on the account: three blocking calls, one concurrent fetch, and the cached snapshot"""
+
+    def sequential():
+        chatnio.get_quota()
+        chatnio.get_subscription()
+        chatnio.get_package()
+
+    return {
+        **latency_metrics("sequential", _sample(sequential)),
+        **latency_metrics("fetch", _sample(lambda: chatnio.get_account_status(max_age=0))),
+        **latency_metrics("cached", _sample(chatnio.get_account_status)),
+    }
+
+
+@benchmark("quota_meter")
+def bench_quota_meter(server) -> Dict[str, float]:
+    """Reading the remaining quota: polling `get_quota` against the in-memory `QuotaMeter` estimate"""
+
+    meter = chatnio.QuotaMeter()
+    meter.reconcile()
+
+    start = time.perf_counter()
+    for index in range(10000):
+        meter.record(0.01, index % 10, "gpt-4", "sk-benchmark")
+    record = time.perf_counter() - start
+
+    return {
+        **latency_metrics("get_quota", _sample(chatnio.get_quota)),
+        **latency_metrics("meter_remaining", _sample(lambda: meter.remaining)),
+        "meter_records_per_sec": 10000 / record,
+    }
+
+
+@benchmark("clients")
+def bench_clients(server) -> Dict[str, float]:
+    """Per-instance `ChatNio` clients: the cost of running a call with a client, and two tenants served concurrently"""
+
+    from concurrent.futures import ThreadPoolExecutor
+    from chatnio.mock import MockServer
+
+    client = chatnio.ChatNio(server.token, server.url)
+    start = time.perf_counter()
+    for _ in range(100000):
+        client.call(int)
+    dispatch = (time.perf_counter() - start) / 100000
+
+    with MockServer(token="sk-other") as other:
+        tenants = [client, chatnio.ChatNio(other.token, other.url)]
+        with ThreadPoolExecutor(8) as executor, Measure() as measure:
+            list(executor.map(lambda index: tenants[index % 2].get_quota(), range(REQUESTS * 4)))
+        for tenant in tenants:
+            tenant.close()
+
+    return {
+        **latency_metrics("module_get_quota", _sample(chatnio.get_quota)),
+        **latency_metrics("client_get_quota", _sample(client.get_quota)),
+        "call_dispatch_us": dispatch * 1e6,
+        "two_tenants_requests_per_sec": REQUESTS * 4 / measure.wall,
+    }
+
+
+@benchmark("balancer")
+def bench_balancer(server) -> Dict[str, float]:
+    """Two mirrors, one failing half of its calls: success ratio of round-robin against the `Balancer`,
+    and the cost of routing a call"""
+
+    from chatnio.mock import MockServer
+
+    def run(call) -> float:
+        ok = 0
+        for index in range(REQUESTS * 4):
+            try:
+                call(index)
+                ok += 1
+            except Exception:
+                pass
+        return ok / (REQUESTS * 4)
+
+    with MockServer(error_rate=0.5, seed=1) as failing:
+        targets = [chatnio.ChatNio(server.token, server.url), chatnio.ChatNio(failing.token, failing.url)]
+        round_robin = run(lambda index: targets[index % 2].get_quota())
+
+        balancer = chatnio.Balancer(targets, eject_time=1.)
+        with Measure() as measure:
+            balanced = run(lambda index: balancer.get_quota())
+
+        start = time.perf_counter()
+        for _ in range(100000):
+            balancer.route(id)
+        route = (time.perf_counter() - start) / 100000
+        balancer.close()
+
+    return {
+        "round_robin_success_ratio": round_robin,
+        "balanced_success_ratio": balanced,
+        "balanced_requests_per_sec": REQUESTS * 4 / measure.wall,
+        "route_us": route * 1e6,
+    }
+
+
+@benchmark("rate_limit")
+def bench_rate_limit(server) -> Dict[str, float]:
+    """A bulk load against a server allowing 50 requests per second: success ratio without and with the adaptive
+    rate limiter, the share of the allowed rate it reaches, and its cost on an unthrottled server"""
+
+    from chatnio.mock import MockServer
+
+    allowed = 50
+
+    def run(client) -> float:
+        results = list(client.load_conversations([1] * REQUESTS * 2, concurrency=16))
+        return sum(result.ok for result in results) / len(results)
+
+    with MockServer(rate_limit=allowed) as limited:
+        limited.add_conversation("limited", _id=1)
+        client = chatnio.ChatNio(limited.token, limited.url)
+        unlimited = run(client)
+
+        time.sleep(1)
+        chatnio.enable_rate_limiter(rate=allowed * 4)
+        try:
+            throttled = limited.throttled
+            with Measure() as measure:
+                adaptive = run(client)
+            throttled = limited.throttled - throttled
+            samples = _sample(chatnio.get_quota)
+        finally:
+            chatnio.disable_rate_limiter()
+        client.close()
+
+    # the server lets a burst of one second through, then `allowed` per second
+    loads = REQUESTS * 2
+    ceiling = loads / ((loads - allowed) / allowed)
+    return {
+        "unlimited_success_ratio": unlimited,
+        "limited_success_ratio": adaptive,
+        "limited_loads_per_sec": loads / measure.wall,
+        "allowed_rate_ratio": loads / measure.wall / ceiling,
+        "server_throttled": throttled,
+        **latency_metrics("limited_get_quota", samples),
+    }
+
+
+@benchmark("http_transport")
+def bench_http_transport(server) -> Dict[str, float]:
+    """Bursts of `load_conversation` over http/1.1 (default pool, pool of 4 connections) and http/2 (h2c, one
+    multiplexed connection, needs `h2`), from 16 threads (at most one per connection) and from 64 concurrent tasks
+    (http/2 from tasks only, the sync http/2 connections of httpcore 1.0 are not thread safe)"""
+
+    from importlib.util import find_spec
+    from concurrent.futures import ThreadPoolExecutor
+
+    burst = REQUESTS * 4
+    _id = server.add_conversation("burst", [{"role": "user", "content": "hi"}] * 20)["id"]
+
+    def run(name: str, config: "chatnio.TransportConfig", threads: int = 16) -> Dict[str, float]:
+        client = chatnio.ChatNio(server.token, server.url, transport=config)
+        metrics = {}
+        if threads:
+            client.load_conversation(_id)  # warm up
+            with ThreadPoolExecutor(threads) as executor, Measure() as threaded:
+                list(executor.map(lambda _: client.load_conversation(_id), range(burst)))
+            metrics[f"{name}_threaded_loads_per_sec"] = burst / threaded.wall
+
+        async def gather():
+            await asyncio.gather(*(client.load_conversation_async(_id) for _ in range(64)))  # warm up
+            with Measure() as measure:
+                for _ in range(burst // 64):
+                    await asyncio.gather(*(client.load_conversation_async(_id) for _ in range(64)))
+            await client.close_async()
+            return measure
+
+        concurrent = asyncio.run(gather())
+        client.close()
+        metrics[f"{name}_async_loads_per_sec"] = burst // 64 * 64 / concurrent.wall
+        return metrics
+
+    # no more threads than connections: the sync pool of httpcore 1.0 breaks connections when threads queue on it
+    metrics = {
+        **run("http1", chatnio.TransportConfig()),
+        **run("http1_pool4", chatnio.TransportConfig(max_connections=4), threads=4),
+    }
+    if find_spec("h2") is not None:
+        metrics.update(run("http2", chatnio.TransportConfig(http2=True, http1=False), threads=0))
+
+    # switching the endpoint rebuilds the pools: the cost of the first call after a switch
+    client = chatnio.ChatNio(server.token, server.url)
+    samples = []
+    for _ in range(REQUESTS):
+        client.set_endpoint(server.url)
+        start = time.perf_counter()
+        client.get_quota()
+        samples.append(time.perf_counter() - start)
+    client.close()
+    metrics.update(latency_metrics("switched_get_quota", samples))
+    return metrics
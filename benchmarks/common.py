@@ -0,0 +1,93 @@
+# Desc: Benchmark Helpers
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+BENCHMARKS: Dict[str, Callable[..., Dict[str, float]]] = {}
+
+# metrics with these suffixes are better when higher, every other metric is better when lower
+HIGHER_IS_BETTER = ("_per_sec", "_per_core", "_ratio")
+
+
+def benchmark(name: str):
+    """
+    Register a benchmark, it receives the running mock server and returns its metrics
+    """
+
+    def decorator(func: Callable[..., Dict[str, float]]):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Get the q-th percentile (0 - 100) of the values, by linear interpolation
+    """
+
+    if not values:
+        return 0.
+
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def latency_metrics(prefix: str, samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples (seconds) as milliseconds percentiles
+    """
+
+    return {
+        f"{prefix}_p50_ms": percentile(samples, 50) * 1000,
+        f"{prefix}_p90_ms": percentile(samples, 90) * 1000,
+        f"{prefix}_p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+class Measure(object):
+    """
+    Measure wall time, cpu time and peak traced memory of a block
+
+    The cpu time is the one of the calling thread only, so the mock server thread is not counted.
+    Tracing memory slows everything down, so time and memory are measured in separate runs.
+
+    e.g.
+    >>> with Measure() as measure:
+    ...     work()
+    >>> measure.wall, measure.cpu, measure.peak, measure.current
+    """
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.wall = self.cpu = 0.
+        self.peak = self.current = 0
+
+    def __enter__(self) -> "Measure":
+        if self.memory:
+            tracemalloc.start()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.wall = time.perf_counter() - self._wall
+        self.cpu = time.thread_time() - self._cpu
+        if self.memory:
+            self.current, self.peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+
+def is_regression(metric: str, value: float, baseline: float, tolerance: float) -> bool:
+    """
+    Check if a metric got worse than the baseline by more than `tolerance` (a ratio)
+    """
+
+    if baseline == 0:
+        return False
+    if metric.endswith(HIGHER_IS_BETTER):
+        return value < baseline * (1 - tolerance)
+    return value > baseline * (1 + tolerance)
@@ -1,34 +1,208 @@
-from .auth import (
-    get_token,
-    set_key,
-    set_key_from_env,
-    clear_key,
-    is_authenticated,
-)
-
-from .quota import (
-    Subscription,
-    get_subscription,
-    buy_subscription,
-    get_quota,
-    buy_quota,
-    get_package,
-)
-
-from .conversation import (
-    Conversation,
-    list_conversations,
-    load_conversation,
-    delete_conversation,
-)
-
-from .chat import (
-    Chat,
-    PartialMessage,
-    new_chat,
-)
-
-from .globals import *
+# Submodules are imported on first access (PEP 562), so `import chatnio` stays cheap and
+# `httpx` / `websockets` are only loaded when they are needed.
+import importlib
+import sys
+from typing import TYPE_CHECKING
+
+_LAZY_IMPORTS = {
+    'auth': (
+        'get_token',
+        'set_key',
+        'set_key_from_env',
+        'clear_key',
+        'is_authenticated',
+    ),
+    'quota': (
+        'Subscription',
+        'get_subscription',
+        'buy_subscription',
+        'get_quota',
+        'buy_quota',
+        'get_package',
+        'get_subscription_async',
+        'buy_subscription_async',
+        'get_quota_async',
+        'buy_quota_async',
+        'get_package_async',
+        'AccountStatus',
+        'get_account_status',
+        'get_account_status_async',
+        'invalidate_account_status',
+    ),
+    'conversation': (
+        'Conversation',
+        'list_conversations',
+        'load_conversation',
+        'delete_conversation',
+        'list_conversations_async',
+        'iter_conversations',
+        'iter_conversations_async',
+        'load_conversation_async',
+        'delete_conversation_async',
+    ),
+    'storage': (
+        'MessageList',
+        'ColumnarMessages',
+    ),
+    'chat': (
+        'Chat',
+        'PartialMessage',
+        'TextStream',
+        'new_chat',
+        'new_chat_sync',
+        'ReconnectPolicy',
+        'StreamInterrupted',
+    ),
+    'hedge': (
+        'HedgePolicy',
+        'HedgedChat',
+        'new_hedged_chat',
+        'new_hedged_chat_sync',
+    ),
+    'codec': (
+        'Codec',
+        'get_codec',
+        'set_codec',
+    ),
+    'pool': (
+        'ConnectionPool',
+    ),
+    'cache': (
+        'TTLCache',
+        'enable_conversation_cache',
+        'disable_conversation_cache',
+        'invalidate_conversation',
+    ),
+    'batch': (
+        'Batch',
+        'BatchResult',
+        'batch_ask',
+    ),
+    'bulk': (
+        'BulkResult',
+        'load_conversations',
+        'delete_conversations',
+        'load_conversations_async',
+        'delete_conversations_async',
+    ),
+    'meter': (
+        'QuotaMeter',
+        'enable_quota_meter',
+        'disable_quota_meter',
+        'get_quota_meter',
+    ),
+    'runner': (
+        'BackgroundLoop',
+        'get_background_loop',
+        'run_sync',
+        'iterate_sync',
+    ),
+    'export': (
+        'ExportState',
+        'ExportResult',
+        'export_conversations',
+        'read_archive',
+    ),
+    'api': (
+        'ChatNio',
+    ),
+    'balancer': (
+        'Balancer',
+        'TargetStats',
+        'is_target_failure',
+    ),
+    'ratelimit': (
+        'TokenBucket',
+        'AdaptiveRateLimiter',
+        'enable_rate_limiter',
+        'disable_rate_limiter',
+        'get_rate_limiter',
+    ),
+    'transport': (
+        'TransportConfig',
+    ),
+    'globals': (
+        'set_endpoint',
+        'set_transport',
+        'get_transport',
+        'API_BASE',
+        'AuthenticationError',
+        'HEADERS',
+        'client',
+        'get_client',
+        'get_async_client',
+        'get_chat_url',
+        'get_default_client',
+        'current_client',
+    ),
+}
+
+_ATTRIBUTES = {name: module for module, names in _LAZY_IMPORTS.items() for name in names}
+_SUBMODULES = {
+    'api', 'auth', 'balancer', 'batch', 'bulk', 'cache', 'chat', 'codec', 'conversation', 'export',
+    'globals', 'hedge', 'meter', 'mock', 'pool', 'quota', 'ratelimit', 'runner', 'storage', 'transport',
+}
+
+# mutable settings, always read from their module instead of being cached here
+_LIVE_ATTRIBUTES = {'API_BASE', 'client'}
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+
+    module = _ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    if name not in _LIVE_ATTRIBUTES:
+        setattr(sys.modules[__name__], name, value)
+    return value
+
+
+def __dir__():
+    return sorted(set(__all__) | _SUBMODULES | {'__version__', '__author__'})
+
+
+if TYPE_CHECKING:
+    from .auth import get_token, set_key, set_key_from_env, clear_key, is_authenticated  # noqa: F401
+    from .quota import (  # noqa: F401
+        Subscription, get_subscription, buy_subscription, get_quota, buy_quota, get_package,
+        get_subscription_async, buy_subscription_async, get_quota_async, buy_quota_async, get_package_async,
+        AccountStatus, get_account_status, get_account_status_async, invalidate_account_status,
+    )
+    from .conversation import (  # noqa: F401
+        Conversation, list_conversations, load_conversation, delete_conversation,
+        list_conversations_async, load_conversation_async, delete_conversation_async,
+        iter_conversations, iter_conversations_async,
+    )
+    from .storage import MessageList, ColumnarMessages  # noqa: F401
+    from .chat import (  # noqa: F401
+        Chat, PartialMessage, TextStream, new_chat, new_chat_sync, ReconnectPolicy, StreamInterrupted,
+    )
+    from .hedge import HedgePolicy, HedgedChat, new_hedged_chat, new_hedged_chat_sync  # noqa: F401
+    from .codec import Codec, get_codec, set_codec  # noqa: F401
+    from .pool import ConnectionPool  # noqa: F401
+    from .cache import (  # noqa: F401
+        TTLCache, enable_conversation_cache, disable_conversation_cache, invalidate_conversation,
+    )
+    from .batch import Batch, BatchResult, batch_ask  # noqa: F401
+    from .bulk import (  # noqa: F401
+        BulkResult, load_conversations, delete_conversations,
+        load_conversations_async, delete_conversations_async,
+    )
+    from .meter import QuotaMeter, enable_quota_meter, disable_quota_meter, get_quota_meter  # noqa: F401
+    from .runner import BackgroundLoop, get_background_loop, run_sync, iterate_sync  # noqa: F401
+    from .export import ExportState, ExportResult, export_conversations, read_archive  # noqa: F401
+    from .globals import set_endpoint, API_BASE, AuthenticationError, get_default_client, current_client  # noqa: F401
+    from .globals import set_transport, get_transport  # noqa: F401
+    from .transport import TransportConfig  # noqa: F401
+    from .api import ChatNio  # noqa: F401
+    from .balancer import Balancer, TargetStats, is_target_failure  # noqa: F401
+    from .ratelimit import (  # noqa: F401
+        TokenBucket, AdaptiveRateLimiter, enable_rate_limiter, disable_rate_limiter, get_rate_limiter,
+    )
 
 __version__ = '0.0.1'
 __author__ = 'Deeptrain Community'
@@ -37,6 +211,23 @@ __all__ = [
     'API_BASE',
     'AuthenticationError',
 
+    'TransportConfig',
+    'set_transport',
+    'get_transport',
+
+    'ChatNio',
+    'get_default_client',
+    'current_client',
+    'Balancer',
+    'TargetStats',
+    'is_target_failure',
+
+    'TokenBucket',
+    'AdaptiveRateLimiter',
+    'enable_rate_limiter',
+    'disable_rate_limiter',
+    'get_rate_limiter',
+
     'get_token',
     'set_key',
     'set_key_from_env',
@@ -49,13 +240,76 @@ __all__ = [
     'get_package',
     'get_subscription',
     'buy_subscription',
+    'get_quota_async',
+    'buy_quota_async',
+    'get_package_async',
+    'get_subscription_async',
+    'buy_subscription_async',
+
+    'AccountStatus',
+    'get_account_status',
+    'get_account_status_async',
+    'invalidate_account_status',
+
+    'QuotaMeter',
+    'enable_quota_meter',
+    'disable_quota_meter',
+    'get_quota_meter',
 
     'Conversation',
     'list_conversations',
     'load_conversation',
     'delete_conversation',
+    'list_conversations_async',
+    'load_conversation_async',
+    'delete_conversation_async',
+    'iter_conversations',
+    'iter_conversations_async',
+
+    'MessageList',
+    'ColumnarMessages',
 
     'Chat',
     'PartialMessage',
+    'TextStream',
     'new_chat',
+    'new_chat_sync',
+    'ReconnectPolicy',
+    'StreamInterrupted',
+
+    'HedgePolicy',
+    'HedgedChat',
+    'new_hedged_chat',
+    'new_hedged_chat_sync',
+
+    'ConnectionPool',
+
+    'TTLCache',
+    'enable_conversation_cache',
+    'disable_conversation_cache',
+    'invalidate_conversation',
+
+    'Codec',
+    'get_codec',
+    'set_codec',
+
+    'Batch',
+    'BatchResult',
+    'batch_ask',
+
+    'BulkResult',
+    'load_conversations',
+    'delete_conversations',
+    'load_conversations_async',
+    'delete_conversations_async',
+
+    'ExportState',
+    'ExportResult',
+    'export_conversations',
+    'read_archive',
+
+    'BackgroundLoop',
+    'get_background_loop',
+    'run_sync',
+    'iterate_sync',
 ]
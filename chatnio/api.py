@@ -0,0 +1,416 @@
+# Desc: Client Objects for Chat Nio (one key and endpoint per client)
+import inspect
+import functools
+import importlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Iterator
+from weakref import WeakKeyDictionary
+
+from .globals import DEFAULT_API_BASE, HEADERS, _current
+from .meter import _mask
+
+if TYPE_CHECKING:
+    import httpx
+    from concurrent.futures import ThreadPoolExecutor
+    from .chat import Chat, ReconnectPolicy
+    from .codec import Codec
+    from .pool import ConnectionPool
+    from .transport import TransportConfig
+
+
+class _Api(object):
+    """
+    A module-level function of the api, read from a client as a method running with that client
+    """
+
+    __slots__ = ("module", "name")
+
+    def __init__(self, module: str):
+        self.module = module
+        self.name = ""
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, client, owner=None):
+        if client is None:
+            return self
+
+        func = getattr(importlib.import_module(f".{self.module}", __package__), self.name)
+
+        @functools.wraps(func)
+        def method(*args, **kwargs):
+            return client.call(func, *args, **kwargs)
+
+        return method
+
+
+class ChatNio(object):
+    """
+    A client of the Chat Nio API, with its own key, endpoint, http clients and chat connection pool
+
+    Every function of the module is available as a method running with this client, so clients for
+    different keys and endpoints can be used concurrently, from threads or tasks. The module-level
+    functions use the default client (see `set_key` and `set_endpoint`).
+
+    e.g.
+    >>> client = ChatNio("sk-...", endpoint="https://example.com/api")
+    >>> client.get_quota()
+    >>> for conversation in client.list_conversations():
+    ...     print(conversation.id, conversation.name)
+    >>> chat = await client.new_chat()  # the chat keeps the key and endpoint of the client
+
+    >>> with client.use():  # or run the module-level functions with this client
+    ...     chatnio.get_quota()
+
+    Attributes:
+        token (str): The key of the client
+        endpoint (str): The endpoint of the client
+        pool (ConnectionPool): The pool of the chat connections of the client (default: no pool)
+        transport (TransportConfig): The settings of the http connections (default: the defaults of httpx)
+        headers (dict): The headers of the http requests
+        max_workers (int): The threads of the client for the concurrent blocking requests (e.g. `get_account_status`)
+    """
+
+    def __init__(
+        self,
+        key: str = "",
+        endpoint: str = None,
+        pool: "ConnectionPool" = None,
+        transport: "TransportConfig" = None,
+        max_workers: int = 2,
+    ):
+        """
+        :param key: The key of the client (e.g. "sk-...", default: anonymous)
+        :param endpoint: The endpoint of the client (default: https://api.chatnio.net)
+        :param pool: The pool to borrow the chat connections from (default: open a connection per chat)
+        :param transport: The settings of the http connections (e.g. `TransportConfig(http2=True)`)
+        :param max_workers: The threads of the client for concurrent blocking requests (default: 2)
+        """
+
+        self.token = key
+        self.endpoint = endpoint or DEFAULT_API_BASE
+        self.pool = pool
+        self.transport = transport
+        self.max_workers = max_workers
+        self.headers = dict(HEADERS)
+        if key:
+            self.headers["Authorization"] = f"Bearer {key}"
+
+        self._client = None
+        self._executor = None
+        # async clients, one connection pool per event loop
+        self._async_clients = WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get_client(self) -> "httpx.Client":
+        """
+        Get the blocking http client of this client (created on first use)
+        :return: The `httpx.Client` instance
+        """
+
+        client = self._client
+        if client is None:
+            with self._lock:
+                client = self._client
+                if client is None:
+                    from .transport import build_client
+                    client = self._client = build_client(self.endpoint, self.headers, self.transport)
+        return client
+
+    def get_async_client(self) -> "httpx.AsyncClient":
+        """
+        Get the async http client of this client for the running event loop
+        :return: The `httpx.AsyncClient` instance
+        """
+
+        import asyncio
+        loop = asyncio.get_event_loop()
+        async_client = self._async_clients.get(loop)
+        if async_client is None:
+            from .transport import build_async_client
+            async_client = self._async_clients[loop] = build_async_client(self.endpoint, self.headers, self.transport)
+        return async_client
+
+    def get_executor(self) -> "ThreadPoolExecutor":
+        """
+        Get the threads of this client for concurrent blocking requests (created on first use),
+        so the blocking calls of one client never wait behind the ones of another
+        :return: The `ThreadPoolExecutor` instance
+        """
+
+        executor = self._executor
+        if executor is None:
+            with self._lock:
+                executor = self._executor
+                if executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    executor = self._executor = ThreadPoolExecutor(self.max_workers, "chatnio-client")
+        return executor
+
+    def set_header(self, name: str, value: str) -> None:
+        """
+        Set a header on the http clients of this client
+        """
+
+        self.headers[name] = value
+        if self._client is not None:
+            self._client.headers[name] = value
+        for async_client in list(self._async_clients.values()):
+            async_client.headers[name] = value
+
+    def set_key(self, token: str) -> str:
+        """
+        Set the key of this client
+        :param token: The key (e.g. "sk-...")
+        :return: The key that was set
+        """
+
+        self.token = token
+        self.set_header("Authorization", f"Bearer {token}")
+        return token
+
+    def clear_key(self) -> None:
+        """
+        Clear the key of this client
+        """
+
+        self.set_key("")
+
+    def get_token(self) -> str:
+        return self.token
+
+    def is_authenticated(self) -> bool:
+        return self.token.strip() != ""
+
+    def set_endpoint(self, endpoint: str) -> None:
+        """
+        Set the endpoint of this client
+        :param endpoint: The endpoint of the Chat Nio API
+        """
+
+        with self._lock:
+            self.endpoint = endpoint
+            self._retire()
+
+    def set_transport(self, transport: "TransportConfig" = None) -> None:
+        """
+        Set the settings of the http connections of this client
+        :param transport: The settings (default: the defaults of httpx)
+
+        e.g.
+        >>> client.set_transport(TransportConfig(http2=True, max_connections=32))
+        """
+
+        with self._lock:
+            self.transport = transport
+            self._retire()
+
+    def _retire(self) -> None:
+        # the next calls get new http clients, the old ones are closed once their requests in flight are done
+        client, self._client = self._client, None
+        async_clients, self._async_clients = self._async_clients, WeakKeyDictionary()
+        if client is None and not async_clients:
+            return
+
+        from .transport import retire_client
+        if client is not None:
+            retire_client(client)
+        for loop, async_client in list(async_clients.items()):
+            retire_client(async_client, loop)
+
+    @property
+    def chat_url(self) -> str:
+        # http to ws, https to wss
+        return self.endpoint.replace("http", "ws").replace("https", "wss") + "/chat"
+
+    @contextmanager
+    def use(self) -> Iterator["ChatNio"]:
+        """
+        Run the module-level functions with this client, in the current thread or task
+
+        e.g.
+        >>> with client.use():
+        ...     chatnio.get_quota()
+        """
+
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call a function of the api with this client (coroutines and iterators keep the client until they finish)
+        :param func: The function to call (e.g. `chatnio.get_quota`)
+        :return: The result of the function
+        """
+
+        token = _current.set(self)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+        if inspect.iscoroutine(result):
+            return self._await(result)
+        if inspect.isasyncgen(result):
+            return self._iterate_async(result)
+        if inspect.isgenerator(result):
+            return self._iterate(result)
+        return result
+
+    async def _await(self, coroutine) -> Any:
+        token = _current.set(self)
+        try:
+            return await coroutine
+        finally:
+            _current.reset(token)
+
+    def _iterate(self, iterator: Iterator) -> Iterator:
+        # every step runs in a context of its own, the caller's context never sees this client
+        context = contextvars.copy_context()
+        context.run(_current.set, self)
+        try:
+            while True:
+                try:
+                    item = context.run(next, iterator)
+                except StopIteration:
+                    return
+                yield item
+        finally:
+            context.run(iterator.close)
+
+    async def _iterate_async(self, iterator) -> AsyncIterator:
+        # the client is set around every step only, so it does not leak into the caller between steps
+        try:
+            while True:
+                token = _current.set(self)
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    _current.reset(token)
+                yield item
+        finally:
+            token = _current.set(self)
+            try:
+                await iterator.aclose()
+            finally:
+                _current.reset(token)
+
+    async def new_chat(
+        self,
+        conversation_id: int = -1,
+        pool: "ConnectionPool" = None,
+        codec: "Codec" = None,
+        reconnect: "ReconnectPolicy" = None,
+    ) -> "Chat":
+        """
+        Create a new chat connection with this client (see `chatnio.new_chat`)
+        :param conversation_id: The id of the conversation to connect to (default: -1)
+        :param pool: The connection pool to borrow the connection from (default: the pool of the client)
+        :param codec: The json codec of the websocket frames (default: the default codec)
+        :param reconnect: The policy to recover from dropped connections (default: no reconnection)
+        :return: The `chat` instance
+        """
+
+        from .chat import new_chat
+        return await self.call(new_chat, conversation_id, pool if pool is not None else self.pool, codec, reconnect)
+
+    def new_chat_sync(
+        self,
+        conversation_id: int = -1,
+        pool: "ConnectionPool" = None,
+        codec: "Codec" = None,
+        reconnect: "ReconnectPolicy" = None,
+    ) -> "Chat":
+        """
+        Create a new chat connection with this client, from synchronous code (see `chatnio.new_chat_sync`)
+        """
+
+        from .chat import new_chat_sync
+        return self.call(new_chat_sync, conversation_id, pool if pool is not None else self.pool, codec, reconnect)
+
+    get_quota = _Api("quota")
+    buy_quota = _Api("quota")
+    get_subscription = _Api("quota")
+    buy_subscription = _Api("quota")
+    get_package = _Api("quota")
+    get_account_status = _Api("quota")
+    get_quota_async = _Api("quota")
+    buy_quota_async = _Api("quota")
+    get_subscription_async = _Api("quota")
+    buy_subscription_async = _Api("quota")
+    get_package_async = _Api("quota")
+    get_account_status_async = _Api("quota")
+
+    list_conversations = _Api("conversation")
+    iter_conversations = _Api("conversation")
+    load_conversation = _Api("conversation")
+    delete_conversation = _Api("conversation")
+    list_conversations_async = _Api("conversation")
+    iter_conversations_async = _Api("conversation")
+    load_conversation_async = _Api("conversation")
+    delete_conversation_async = _Api("conversation")
+
+    load_conversations = _Api("bulk")
+    delete_conversations = _Api("bulk")
+    load_conversations_async = _Api("bulk")
+    delete_conversations_async = _Api("bulk")
+
+    export_conversations = _Api("export")
+    batch_ask = _Api("batch")
+
+    new_hedged_chat = _Api("hedge")
+    new_hedged_chat_sync = _Api("hedge")
+
+    def close(self) -> None:
+        """
+        Close the blocking http client and the threads of this client (the async clients are closed by `close_async`)
+        """
+
+        client, self._client = self._client, None
+        if client is not None:
+            client.close()
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    async def close_async(self) -> None:
+        """
+        Close the http clients of this client (the async one of the running event loop)
+        """
+
+        import asyncio
+        self.close()
+        async_client = self._async_clients.pop(asyncio.get_event_loop(), None)
+        if async_client is not None:
+            await async_client.aclose()
+
+    def __enter__(self) -> "ChatNio":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "ChatNio":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close_async()
+
+    def __str__(self):
+        return f"ChatNio(endpoint={self.endpoint}, token={_mask(self.token)})"
+
+    __repr__ = __str__
+
+
+# the api methods of a client (the functions of the module, run with the client)
+API_METHODS = ("new_chat", "new_chat_sync") + tuple(
+    name for name, value in vars(ChatNio).items() if isinstance(value, _Api)
+)
@@ -1,15 +1,15 @@
 # Desc: Authentication for Chat Nio
-from .globals import client, AuthenticationError
+from .globals import get_default_client, current_client, AuthenticationError
 
 TOKEN = ""
 
 
 def get_token() -> str:
     """
-    Get the token for the Chat Nio API
+    Get the token for the Chat Nio API (of the current client, see `ChatNio.use`)
     """
 
-    return TOKEN
+    return current_client().token
 
 
 def set_key(token: str) -> str:
@@ -21,9 +21,7 @@ def set_key(token: str) -> str:
 
     global TOKEN
     TOKEN = token
-    client.headers["Authorization"] = f"Bearer {TOKEN}"
-
-    return TOKEN
+    return get_default_client().set_key(token)
 
 
 def set_key_from_env(env: str = "CHATNIO_TOKEN") -> str:
@@ -51,7 +49,7 @@ def is_authenticated() -> bool:
     :return: The authentication status of the user (True if authenticated)
     """
 
-    return TOKEN.strip() != ""
+    return current_client().is_authenticated()
 
 
 def authenticate_require() -> None:
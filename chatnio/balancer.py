@@ -0,0 +1,384 @@
+# Desc: Load Balancing for Chat Nio (several keys and endpoints)
+import time
+import random
+import sys
+import inspect
+import threading
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, List, Optional
+
+from .api import ChatNio, API_METHODS
+
+STRATEGIES = ("least_outstanding", "latency")
+
+
+def is_target_failure(error: BaseException) -> bool:
+    """
+    Check if an error counts against the health of a target: network and connection errors, timeouts,
+    5xx and 429 responses. The errors of the call itself (e.g. a `ValueError` for invalid arguments, or an
+    `AuthenticationError` for a missing conversation) say nothing about the target.
+    """
+
+    from .ratelimit import handshake_status
+    status, _ = handshake_status(error)  # http errors and rejected websocket handshakes
+    if status:
+        return status >= 500 or status == 429
+    if isinstance(error, (ConnectionError, EOFError, OSError, TimeoutError)):
+        return True
+
+    kinds = []
+    if "asyncio" in sys.modules:
+        import asyncio
+        kinds.append(asyncio.TimeoutError)
+    if "httpx" in sys.modules:
+        import httpx
+        kinds.append(httpx.TransportError)
+    if "websockets" in sys.modules:
+        from websockets.exceptions import WebSocketException
+        kinds.append(WebSocketException)
+    return isinstance(error, tuple(kinds))
+
+
+class TargetStats(object):
+    """
+    The health of a target of a `Balancer`
+
+    Attributes:
+        target (ChatNio): The client of the target
+        requests (int): The number of finished calls
+        errors (int): The number of calls failed by the target (see `is_target_failure`)
+        outstanding (int): The number of calls in flight
+        latency (float): The moving average of the call duration in seconds (None before the first call)
+        error_rate (float): The moving average of the failures (0 to 1)
+        failures (int): The number of consecutive failures
+        quota (float): The remaining quota at the last `refresh_quota` (None if unknown)
+        ejections (int): The number of ejections in a row (the ejection time doubles with each one)
+        ejected_until (float): The time the target is back (`time.monotonic`, 0 if it is not ejected)
+    """
+
+    __slots__ = (
+        "target", "requests", "errors", "outstanding", "latency", "error_rate",
+        "failures", "quota", "ejections", "ejected_until",
+    )
+
+    def __init__(self, target: ChatNio):
+        self.target = target
+        self.requests = 0
+        self.errors = 0
+        self.outstanding = 0
+        self.latency: Optional[float] = None
+        self.error_rate = 0.
+        self.failures = 0
+        self.quota: Optional[float] = None
+        self.ejections = 0
+        self.ejected_until = 0.
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    def copy(self) -> "TargetStats":
+        stats = TargetStats.__new__(TargetStats)
+        for name in TargetStats.__slots__:
+            setattr(stats, name, getattr(self, name))
+        return stats
+
+    def __str__(self):
+        latency = "None" if self.latency is None else f"{self.latency * 1000:.1f}ms"
+        return (
+            f"TargetStats(target={self.target}, requests={self.requests}, errors={self.errors}, "
+            f"outstanding={self.outstanding}, latency={latency}, error_rate={self.error_rate:.2f}, "
+            f"quota={self.quota}, ejected={self.ejected})"
+        )
+
+    __repr__ = __str__
+
+
+class _Route(object):
+    """
+    An api method of the clients, read from a balancer as a method running on the picked target
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, balancer, owner=None):
+        if balancer is None:
+            return self
+
+        name = self.name
+
+        def method(*args, **kwargs):
+            return balancer.route(lambda target: getattr(target, name)(*args, **kwargs))
+
+        method.__name__ = name
+        method.__doc__ = getattr(ChatNio, name).__doc__
+        return method
+
+
+class Balancer(object):
+    """
+    Spread the calls over several clients (keys and / or mirror endpoints), avoiding the unhealthy ones
+
+    Every api method of `ChatNio` is available and runs on the target picked for the call:
+    - "least_outstanding": the target with the fewest calls in flight (ties are broken at random)
+    - "latency": the target with the lowest average duration, weighted by its calls in flight
+
+    Only network and connection errors, timeouts, 5xx and 429 count as failures (see `is_target_failure`).
+    A target failing `eject_after` times in a row, or with an error rate above `max_error_rate`, is ejected for
+    `eject_time` seconds (doubled for every ejection in a row). A target with a quota at or below `min_quota`
+    (see `refresh_quota`) is skipped. If every target is out, the one coming back first is used anyway.
+
+    The targets must be interchangeable for the routed calls: mirrors of one account, or keys used for new chats.
+    A `Chat` stays on the target it was opened on.
+
+    e.g.
+    >>> balancer = Balancer.from_keys(["sk-a...", "sk-b..."], endpoints=["https://a.example", "https://b.example"])
+    >>> chat = await balancer.new_chat()
+    >>> balancer.get_quota()
+    >>> for stats in balancer.stats():
+    ...     print(stats)
+    """
+
+    def __init__(
+        self,
+        targets: Iterable[ChatNio],
+        strategy: str = "least_outstanding",
+        eject_after: int = 3,
+        max_error_rate: float = 0.5,
+        eject_time: float = 10.,
+        min_quota: float = None,
+        smoothing: float = 0.2,
+    ):
+        """
+        :param targets: The clients to balance
+        :param strategy: "least_outstanding" or "latency" (default: "least_outstanding")
+        :param eject_after: The number of consecutive failures that ejects a target (default: 3)
+        :param max_error_rate: The error rate that ejects a target, after 10 calls (default: 0.5)
+        :param eject_time: The seconds of the first ejection of a target (default: 10)
+        :param min_quota: The quota at or below which a target is skipped (default: quota is not checked)
+        :param smoothing: The weight of the last call in the moving averages (default: 0.2)
+        """
+
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy} (available: {', '.join(STRATEGIES)})")
+
+        self._targets: List[TargetStats] = [TargetStats(target) for target in targets]
+        if not self._targets:
+            raise ValueError("Balancer needs at least one target")
+
+        self.strategy = strategy
+        self.eject_after = eject_after
+        self.max_error_rate = max_error_rate
+        self.eject_time = eject_time
+        self.min_quota = min_quota
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[str], endpoints: Iterable[str] = None, **options) -> "Balancer":
+        """
+        Balance every key on every endpoint
+        :param keys: The keys
+        :param endpoints: The endpoints (default: https://api.chatnio.net)
+        :param options: The options of the balancer
+        """
+
+        endpoints = list(endpoints or [None])
+        return cls([ChatNio(key, endpoint) for key in keys for endpoint in endpoints], **options)
+
+    @property
+    def targets(self) -> List[ChatNio]:
+        return [stats.target for stats in self._targets]
+
+    def stats(self) -> List[TargetStats]:
+        """
+        Get a snapshot of the health of every target
+        """
+
+        with self._lock:
+            return [stats.copy() for stats in self._targets]
+
+    def _available(self, stats: TargetStats, now: float) -> bool:
+        if now < stats.ejected_until:
+            return False
+        return self.min_quota is None or stats.quota is None or stats.quota > self.min_quota
+
+    def _score(self, stats: TargetStats) -> float:
+        if self.strategy == "latency":
+            # unknown targets are tried first
+            return (stats.latency or 0.) * (stats.outstanding + 1)
+        return stats.outstanding
+
+    def _pick(self) -> TargetStats:
+        now = time.monotonic()
+        candidates = [stats for stats in self._targets if self._available(stats, now)]
+        if not candidates:
+            # every target is out, fail open on the one coming back first
+            return min(self._targets, key=lambda stats: stats.ejected_until)
+
+        best = min(self._score(stats) for stats in candidates)
+        return self._random.choice([stats for stats in candidates if self._score(stats) == best])
+
+    def pick(self) -> ChatNio:
+        """
+        Pick a target without routing a call (e.g. for `with balancer.pick().use():`)
+        :return: The client of the target
+        """
+
+        with self._lock:
+            return self._pick().target
+
+    def _start(self) -> TargetStats:
+        with self._lock:
+            stats = self._pick()
+            stats.outstanding += 1
+            return stats
+
+    def _finish(self, stats: TargetStats, start: float, error: Optional[BaseException]) -> None:
+        if error is not None and not is_target_failure(error):
+            # the target answered, the call itself was wrong
+            error = None
+        duration = time.perf_counter() - start
+        alpha = self.smoothing
+        with self._lock:
+            stats.outstanding -= 1
+            stats.requests += 1
+            stats.latency = duration if stats.latency is None else alpha * duration + (1 - alpha) * stats.latency
+            stats.error_rate = alpha * (error is not None) + (1 - alpha) * stats.error_rate
+
+            if error is None:
+                stats.failures = 0
+                if stats.error_rate < self.max_error_rate / 2:
+                    stats.ejections = 0
+                return
+
+            stats.errors += 1
+            stats.failures += 1
+            failing = stats.failures >= self.eject_after or (
+                stats.requests >= 10 and stats.error_rate >= self.max_error_rate
+            )
+            if failing and time.monotonic() >= stats.ejected_until:
+                stats.ejected_until = time.monotonic() + self.eject_time * 2 ** min(stats.ejections, 6)
+                stats.ejections += 1
+                stats.failures = 0
+
+    def _abandon(self, stats: TargetStats) -> None:
+        # cancelled or interrupted, says nothing about the health of the target
+        with self._lock:
+            stats.outstanding -= 1
+
+    def route(self, call: Callable[[ChatNio], Any]) -> Any:
+        """
+        Run a call on the picked target, tracking its duration and outcome
+        (coroutines and iterators are tracked until they finish)
+        :param call: The call, given the client of the target (e.g. `lambda client: client.get_quota()`)
+        :return: The result of the call
+        """
+
+        stats = self._start()
+        start = time.perf_counter()
+        try:
+            result = call(stats.target)
+        except Exception as e:
+            self._finish(stats, start, e)
+            raise
+        except BaseException:
+            self._abandon(stats)
+            raise
+
+        if inspect.iscoroutine(result):
+            return self._await(stats, start, result)
+        if inspect.isasyncgen(result):
+            return self._iterate_async(stats, start, result)
+        if inspect.isgenerator(result):
+            return self._iterate(stats, start, result)
+        self._finish(stats, start, None)
+        return result
+
+    async def _await(self, stats: TargetStats, start: float, coroutine) -> Any:
+        try:
+            result = await coroutine
+        except Exception as e:
+            self._finish(stats, start, e)
+            raise
+        except BaseException:
+            self._abandon(stats)
+            raise
+        self._finish(stats, start, None)
+        return result
+
+    def _iterate(self, stats: TargetStats, start: float, iterator: Iterator) -> Iterator:
+        try:
+            yield from iterator
+        except Exception as e:
+            self._finish(stats, start, e)
+            raise
+        except BaseException:
+            # closed early (GeneratorExit) or interrupted
+            iterator.close()
+            self._abandon(stats)
+            raise
+        self._finish(stats, start, None)
+
+    async def _iterate_async(self, stats: TargetStats, start: float, iterator) -> AsyncIterator:
+        try:
+            async for item in iterator:
+                yield item
+        except Exception as e:
+            self._finish(stats, start, e)
+            raise
+        except BaseException:
+            await iterator.aclose()
+            self._abandon(stats)
+            raise
+        self._finish(stats, start, None)
+
+    def _store_quota(self, stats: TargetStats, quota: Optional[float]) -> None:
+        with self._lock:
+            stats.quota = quota
+
+    def refresh_quota(self) -> List[Optional[float]]:
+        """
+        Fetch the remaining quota of every target (a target failing to answer keeps an unknown quota)
+        :return: The quota of every target, in the order of the targets
+        """
+
+        for stats in self._targets:
+            try:
+                self._store_quota(stats, stats.target.get_quota())
+            except Exception:
+                self._store_quota(stats, None)
+        return [stats.quota for stats in self._targets]
+
+    async def refresh_quota_async(self) -> List[Optional[float]]:
+        """
+        Fetch the remaining quota of every target, concurrently (async version of `refresh_quota`)
+        """
+
+        import asyncio
+        quotas = await asyncio.gather(
+            *(stats.target.get_quota_async() for stats in self._targets), return_exceptions=True,
+        )
+        for stats, quota in zip(self._targets, quotas):
+            self._store_quota(stats, None if isinstance(quota, BaseException) else quota)
+        return [stats.quota for stats in self._targets]
+
+    def close(self) -> None:
+        for target in self.targets:
+            target.close()
+
+    async def close_async(self) -> None:
+        for target in self.targets:
+            await target.close_async()
+
+    def __str__(self):
+        return f"Balancer(strategy={self.strategy}, targets={len(self._targets)})"
+
+    __repr__ = __str__
+
+
+for _name in API_METHODS:
+    setattr(Balancer, _name, _Route(_name))
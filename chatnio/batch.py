@@ -0,0 +1,235 @@
+# Desc: Batch Asking for Chat Nio
+import asyncio
+from typing import AsyncGenerator, Iterable, List, Optional, Union
+
+from .globals import current_client, _current
+from .chat import Chat, new_chat
+from .pool import ConnectionPool
+
+Job = Union[str, tuple, list, dict]
+
+
+class BatchResult(object):
+    """
+    The result of one job in a batch
+
+    Attributes:
+        index (int): The position of the job in the submitted jobs
+        message (str): The message that was asked
+        model (str): The model that was used
+        web (bool): Whether online searching was enabled
+        response (str): The full response text (empty if the job failed)
+        quota (float): The quota used by the job
+        error (Exception): The error raised by the job (None if successful)
+    """
+
+    def __init__(self, index: int, message: str, model: str, web: bool):
+        self.index = index
+        self.message = message
+        self.model = model
+        self.web = web
+        self.response = ""
+        self.quota = 0.
+        self.error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __bool__(self):
+        return self.ok
+
+    def __str__(self):
+        return (
+            f"BatchResult(index={self.index}, model={self.model}, "
+            f"quota={self.quota}, ok={self.ok}, error={self.error!r})"
+        )
+
+    __repr__ = __str__
+
+
+def _parse_job(job: Job, model: str, web: bool) -> tuple:
+    if isinstance(job, str):
+        return job, model, web
+    if isinstance(job, dict) and isinstance(job.get("message"), str):
+        return job["message"], job.get("model", model), job.get("web", web)
+    if isinstance(job, (tuple, list)) and 1 <= len(job) <= 3 and isinstance(job[0], str):
+        job = tuple(job)
+        return job + (model, web)[len(job) - 1:]
+
+    raise ValueError(f"Invalid batch job {job!r}: expected a message, a (message, model, web) tuple or a dict")
+
+
+class Batch(object):
+    """
+    A batch of independent asks, answered over a bounded set of `Chat` connections
+
+    Results are yielded in completion order. A failed job is reported through `BatchResult.error`
+    and does not stop the batch; its connection is reopened for the next job. A malformed job stops the batch:
+    the jobs already running finish, then iterating raises `ValueError`.
+
+    Every job is a new conversation (id -1) on a connection of its own, borrowed from `pool` if set
+    (warm it to take the handshakes off the critical path). With `shared_history`, each of the `concurrency`
+    connections keeps its conversation instead and answers its jobs one after another, so they see each
+    other's messages and the quota grows with the history.
+
+    e.g.
+    >>> batch = Batch(["hi", ("what is 1+1?", "gpt-4"), {"message": "hello", "web": True}], concurrency=2)
+    >>> async for result in batch:
+    ...     print(result.index, result.response)
+    """
+
+    def __init__(
+        self,
+        jobs: Iterable[Job],
+        concurrency: int = 4,
+        model: str = "gpt-3.5-turbo",
+        web: bool = False,
+        pool: ConnectionPool = None,
+        shared_history: bool = False,
+    ):
+        if concurrency <= 0:
+            raise ValueError("Concurrency must be greater than 0")
+
+        self._jobs = iter(jobs)
+        self._index = 0
+        self.concurrency = concurrency
+        self.model = model
+        self.web = web
+        self.shared_history = shared_history
+
+        # the workers run with the client current at creation (see `ChatNio.use`)
+        self._client = current_client()
+        self.pool = pool if pool is not None else self._client.pool
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.cancelled = False
+
+    def _next_job(self) -> Optional[BatchResult]:
+        if self.cancelled:
+            return None
+
+        try:
+            job = next(self._jobs)
+        except StopIteration:
+            return None
+
+        try:
+            result = BatchResult(self._index, *_parse_job(job, self.model, self.web))
+        except ValueError:
+            # no new job is started, the error is raised once the running ones are done
+            self.cancelled = True
+            raise
+        self._index += 1
+        return result
+
+    async def _worker(self) -> None:
+        # a task runs in a context of its own, setting the client here does not leak to the caller
+        _current.set(self._client)
+        chat: Optional[Chat] = None
+        try:
+            while True:
+                result = self._next_job()
+                if result is None:
+                    break
+
+                try:
+                    if chat is None:
+                        chat = await new_chat(pool=self.pool)
+
+                    chunks = []
+                    async for partial in chat.ask(result.message, result.model, result.web):
+                        chunks.append(partial.message)
+                        if partial.end:
+                            result.quota = partial.quota
+                    result.response = "".join(chunks)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    result.error = e
+                    if chat is not None:
+                        # the connection state is unknown, start over for the next job
+                        await _close_quietly(chat)
+                        chat = None
+
+                if chat is not None and not self.shared_history:
+                    # the conversation of this job is done, the next job starts a new one
+                    await _close_quietly(chat)
+                    chat = None
+                await self._queue.put(result)
+        finally:
+            if chat is not None:
+                await _close_quietly(chat)
+            self._queue.put_nowait(None)
+
+    def cancel(self) -> None:
+        """
+        Cancel the batch, pending jobs are dropped and running asks are interrupted
+        """
+
+        self.cancelled = True
+        for worker in self._workers:
+            worker.cancel()
+
+    async def __aiter__(self) -> AsyncGenerator[BatchResult, None]:
+        if self._queue is not None:
+            raise RuntimeError("Batch can only be iterated once")
+
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+
+        running = len(self._workers)
+        try:
+            while running:
+                result = await self._queue.get()
+                if result is None:
+                    running -= 1
+                    continue
+                yield result
+            # raises the error of a malformed job
+            await asyncio.gather(*self._workers)
+        finally:
+            self.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def collect(self) -> List[BatchResult]:
+        """
+        Run the whole batch
+        :return: The results, in the order of the submitted jobs
+        """
+
+        results = [result async for result in self]
+        return sorted(results, key=lambda result: result.index)
+
+
+async def _close_quietly(chat: Chat) -> None:
+    try:
+        await chat.close_async()
+    except Exception:
+        pass
+
+
+def batch_ask(
+    jobs: Iterable[Job],
+    concurrency: int = 4,
+    model: str = "gpt-3.5-turbo",
+    web: bool = False,
+    pool: ConnectionPool = None,
+    shared_history: bool = False,
+) -> Batch:
+    """
+    Ask many independent questions to the Chat Nio API, over at most `concurrency` connections
+    :param jobs: The jobs to run, each is a message, a (message, model, web) tuple or a dict
+    :param concurrency: The maximum number of connections (default: 4)
+    :param model: The default model of the jobs (default: "gpt-3.5-turbo")
+    :param web: The default online searching option of the jobs (default: False)
+    :param pool: The connection pool to borrow the connections from (default: the pool of the client)
+    :param shared_history: Whether the jobs of one connection share a conversation (default: a new one per job)
+    :return: The `batch` instance, iterate it asynchronously to get the results as they finish
+
+    e.g.
+    >>> async for result in batch_ask(["hi", "hello"], concurrency=2):
+    ...     print(result.response if result.ok else result.error)
+    """
+
+    return Batch(jobs, concurrency, model, web, pool, shared_history)
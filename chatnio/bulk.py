@@ -0,0 +1,192 @@
+# Desc: Bulk Conversation Operations for Chat Nio
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from .auth import authenticate_require
+from .ratelimit import TokenBucket
+from .conversation import (
+    load_conversation, delete_conversation, load_conversation_async, delete_conversation_async,
+)
+
+
+class BulkResult(object):
+    """
+    The result of one id in a bulk operation
+
+    Attributes:
+        id (int): The id of the conversation
+        value (Any): The result of the operation (`Conversation` for loads, bool for deletes, None if it failed)
+        error (Exception): The error raised by the operation (None if successful)
+    """
+
+    __slots__ = ("id", "value", "error")
+
+    def __init__(self, _id: int, value: Any = None, error: Optional[BaseException] = None):
+        self.id = _id
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __bool__(self):
+        return self.ok
+
+    def __str__(self):
+        return f"BulkResult(id={self.id}, ok={self.ok}, value={self.value!r}, error={self.error!r})"
+
+    __repr__ = __str__
+
+
+def _limiter(rate) -> Optional[TokenBucket]:
+    # a plain rate spreads the requests evenly (no burst), a bucket can be shared between several bulk operations
+    return rate if isinstance(rate, TokenBucket) or rate is None else TokenBucket(rate, burst=1)
+
+
+def _prepare(concurrency: int, rate) -> Tuple[Optional[TokenBucket], contextvars.Context]:
+    # checked when the operation is created, not when it is first iterated, and the requests run with the context
+    # of the caller at that point (e.g. the `ChatNio` client of `with client.use():`) wherever they are iterated
+    if concurrency <= 0:
+        raise ValueError("Concurrency must be greater than 0")
+
+    authenticate_require()
+    return _limiter(rate), contextvars.copy_context()
+
+
+def _run(
+    func: Callable, ids: Iterable[int], concurrency: int, limiter: Optional[TokenBucket], context: contextvars.Context,
+) -> Iterator[BulkResult]:
+    def call(_id: int) -> BulkResult:
+        try:
+            if limiter is not None:
+                limiter.wait()
+            return BulkResult(_id, func(_id))
+        except Exception as e:
+            return BulkResult(_id, error=e)
+
+    ids = iter(ids)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = set()
+    try:
+        # at most `concurrency` ids are in flight, the rest of the ids are not read yet
+        for _id in ids:
+            # the workers run with the context of the caller (a copy each, a context is entered by one thread at a time)
+            pending.add(executor.submit(context.copy().run, call, _id))
+            if len(pending) < concurrency:
+                continue
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+async def _run_async(
+    func: Callable, ids: Iterable[int], concurrency: int, limiter: Optional[TokenBucket], context: contextvars.Context,
+) -> AsyncIterator[BulkResult]:
+    ids = iter(ids)
+    # results wait in a bounded queue, so a slow consumer holds back the workers instead of buffering everything
+    queue: asyncio.Queue = asyncio.Queue(concurrency)
+
+    async def worker() -> None:
+        for _id in ids:
+            try:
+                if limiter is not None:
+                    await limiter.wait_async()
+                result = BulkResult(_id, await func(_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                result = BulkResult(_id, error=e)
+            await queue.put(result)
+
+    async def run() -> None:
+        try:
+            await worker()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # reading the ids failed
+            await queue.put(BulkResult(None, error=e))
+        await queue.put(None)
+
+    # the tasks copy the context of the caller when they are created
+    workers: List[asyncio.Task] = [context.run(asyncio.ensure_future, run()) for _ in range(concurrency)]
+
+    running = len(workers)
+    try:
+        while running:
+            result = await queue.get()
+            if result is None:
+                running -= 1
+                continue
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def load_conversations(ids: Iterable[int], concurrency: int = 8, rate: float = None) -> Iterator[BulkResult]:
+    """
+    Load many conversations from the Chat Nio API, over at most `concurrency` requests in flight
+    :param ids: The ids of the conversations to load (any iterable, read as requests complete)
+    :param concurrency: The maximum number of requests in flight (default: 8)
+    :param rate: The maximum number of requests per second (a number or a shared `TokenBucket`, default: unlimited)
+    :return: The iterator of results, in completion order (a failed id is reported through `BulkResult.error`)
+    :raise AuthenticationError: If the client is not authenticated (when called, not when iterated)
+
+    e.g.
+    >>> for result in load_conversations(range(1, 1001), concurrency=16, rate=50):
+    ...     print(result.id, result.value.name if result.ok else result.error)
+    """
+
+    return _run(load_conversation, ids, concurrency, *_prepare(concurrency, rate))
+
+
+def delete_conversations(ids: Iterable[int], concurrency: int = 8, rate: float = None) -> Iterator[BulkResult]:
+    """
+    Delete many conversations from the Chat Nio API, over at most `concurrency` requests in flight
+    :param ids: The ids of the conversations to delete (any iterable, read as requests complete)
+    :param concurrency: The maximum number of requests in flight (default: 8)
+    :param rate: The maximum number of requests per second (a number or a shared `TokenBucket`, default: unlimited)
+    :return: The iterator of results (`BulkResult.value` is the status of the deletion), in completion order
+    :raise AuthenticationError: If the client is not authenticated (when called, not when iterated)
+    """
+
+    return _run(delete_conversation, ids, concurrency, *_prepare(concurrency, rate))
+
+
+def load_conversations_async(
+    ids: Iterable[int], concurrency: int = 8, rate: float = None,
+) -> AsyncIterator[BulkResult]:
+    """
+    Load many conversations from the Chat Nio API (async version of `load_conversations`)
+
+    e.g.
+    >>> async for result in load_conversations_async(ids, concurrency=16):
+    ...     print(result.id, result.ok)
+    """
+
+    return _run_async(load_conversation_async, ids, concurrency, *_prepare(concurrency, rate))
+
+
+def delete_conversations_async(
+    ids: Iterable[int], concurrency: int = 8, rate: float = None,
+) -> AsyncIterator[BulkResult]:
+    """
+    Delete many conversations from the Chat Nio API (async version of `delete_conversations`)
+    """
+
+    return _run_async(delete_conversation_async, ids, concurrency, *_prepare(concurrency, rate))
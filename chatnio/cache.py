@@ -0,0 +1,207 @@
+# Desc: Response Cache for Chat Nio (conversations)
+import time
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Hashable, Optional
+
+from .globals import current_client
+
+if TYPE_CHECKING:
+    from .api import ChatNio
+
+
+class CacheEntry(object):
+    """
+    A cached value with its expiry time and validator (etag)
+    """
+
+    __slots__ = ("value", "etag", "expires")
+
+    def __init__(self, value: Any, etag: Optional[str], expires: float):
+        self.value = value
+        self.etag = etag
+        self.expires = expires
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires
+
+
+class TTLCache(object):
+    """
+    A thread-safe cache with least recently used eviction and a time to live per entry
+
+    Expired entries are kept (until evicted) so they can be revalidated with their etag.
+
+    Attributes:
+        maxsize (int): The maximum number of entries
+        ttl (float): The seconds an entry is fresh
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.):
+        if maxsize <= 0:
+            raise ValueError("Max size must be greater than 0")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def lookup(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Get the entry of a key, fresh or not
+        :param key: The key of the entry
+        :return: The entry (None if there is no entry)
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if entry.fresh:
+                self.hits += 1
+            return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get the value of a fresh entry
+        :param key: The key of the entry
+        :param default: The value to return if there is no fresh entry
+        """
+
+        entry = self.lookup(key)
+        return entry.value if entry is not None and entry.fresh else default
+
+    def set(self, key: Hashable, value: Any, etag: str = None) -> CacheEntry:
+        """
+        Set the value of a key
+        :param key: The key of the entry
+        :param value: The value to cache
+        :param etag: The etag of the value, to revalidate it once expired (default: None)
+        :return: The new entry
+        """
+
+        entry = CacheEntry(value, etag, time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def refresh(self, entry: CacheEntry) -> None:
+        """
+        Mark an entry as fresh again, after the server confirmed it did not change
+        :param entry: The entry to refresh
+        """
+
+        with self._lock:
+            entry.expires = time.monotonic() + self.ttl
+            self.revalidations += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        Remove an entry
+        :param key: The key of the entry
+        :return: Whether an entry was removed
+        """
+
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """
+        Remove every entry
+        """
+
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+        return (
+            f"TTLCache(size={len(self)}, maxsize={self.maxsize}, ttl={self.ttl}, "
+            f"hits={self.hits}, misses={self.misses}, revalidations={self.revalidations})"
+        )
+
+    __repr__ = __str__
+
+
+_conversation_cache: Optional[TTLCache] = None
+
+
+def enable_conversation_cache(maxsize: int = 128, ttl: float = 60.) -> TTLCache:
+    """
+    Cache `load_conversation` and `list_conversations` in memory
+
+    Entries are invalidated by `delete_conversation` and by chat activity on the conversation,
+    expired entries are revalidated with the server (etag) instead of being downloaded again.
+    :param maxsize: The maximum number of cached conversations (default: 128)
+    :param ttl: The seconds a cached conversation is served without asking the server (default: 60)
+    :return: The `cache` instance
+    """
+
+    global _conversation_cache
+    _conversation_cache = TTLCache(maxsize, ttl)
+    return _conversation_cache
+
+
+def disable_conversation_cache() -> None:
+    """
+    Stop caching conversations (the cache is dropped)
+    """
+
+    global _conversation_cache
+    _conversation_cache = None
+
+
+def get_conversation_cache() -> Optional[TTLCache]:
+    """
+    Get the conversation cache
+    :return: The `cache` instance (None if the cache is disabled)
+    """
+
+    return _conversation_cache
+
+
+def conversation_key(*parts: Hashable, client: "ChatNio" = None) -> tuple:
+    """
+    Build the cache key of a conversation request, scoped to the key and endpoint of a client
+    (clients never see the cached conversations of each other)
+    :param parts: The parts of the key (e.g. "load", 42)
+    :param client: The client of the request (default: the current client)
+    """
+
+    client = client or current_client()
+    return (client.token, client.endpoint) + parts
+
+
+def invalidate_conversation(_id: int = None, client: "ChatNio" = None) -> None:
+    """
+    Drop a conversation from the cache, together with the cached conversation list
+    :param _id: The id of the conversation (default: drop every conversation)
+    :param client: The client the conversation belongs to (default: the current client)
+    """
+
+    cache = _conversation_cache
+    if cache is None:
+        return
+
+    if _id is None:
+        cache.clear()
+        return
+
+    cache.invalidate(conversation_key("load", _id, client=client))
+    cache.invalidate(conversation_key("list", client=client))
@@ -1,10 +1,15 @@
 # Desc: Chat Connection for Chat Nio
-import json
-from typing import AsyncGenerator
-import websockets
+import sys
+import random
+import asyncio
+from typing import Any, AsyncGenerator, Iterator, Optional, Union
 
-from .globals import get_chat_url
-from .auth import is_authenticated, get_token
+from .globals import current_client
+from .pool import ConnectionPool, abort, is_open, supports_raw_recv
+from .codec import Codec, get_codec
+from .cache import invalidate_conversation
+from .meter import get_quota_meter
+from .ratelimit import connect_limited
 
 
 class PartialMessage(object):
@@ -12,6 +17,8 @@ class PartialMessage(object):
     The partial message object for the Chat Nio API
     """
 
+    __slots__ = ("message", "keyword", "quota", "end")
+
     message: str
     keyword: str
     quota: float
@@ -38,58 +45,363 @@ class PartialMessage(object):
         return len(self.message)
 
 
+class TextStream(object):
+    """
+    The text-only response stream of `Chat.ask_text`
+
+    Attributes:
+        keyword (str): The keyword of the response (set when the response is finished)
+        quota (float): The quota used by the response (set when the response is finished)
+        end (bool): Whether the response is finished
+    """
+
+    __slots__ = ("_frames", "keyword", "quota", "end")
+
+    def __init__(self, frames: AsyncGenerator[dict, None]):
+        self._frames = frames
+        self.keyword = ""
+        self.quota = 0.
+        self.end = False
+
+    def __aiter__(self) -> "TextStream":
+        return self
+
+    async def __anext__(self) -> str:
+        frames = self._frames
+        while True:
+            data = await frames.__anext__()
+            if data.get("end"):
+                self.end = True
+                self.keyword = data.get("keyword", "")
+                self.quota = float(data.get("quota", 0.))
+
+            text = data.get("message")
+            if text:
+                return text
+
+    async def aclose(self) -> None:
+        """
+        Stop reading the response
+        """
+
+        await self._frames.aclose()
+
+    async def text(self) -> str:
+        """
+        Read the whole response
+        :return: The full response text
+        """
+
+        return "".join([delta async for delta in self])
+
+    def __str__(self):
+        return f"TextStream(keyword=\"{self.keyword}\", quota={self.quota}, end={self.end})"
+
+    __repr__ = __str__
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class StreamInterrupted(ConnectionError):
+    """
+    The connection dropped in the middle of a response (after some of it was received)
+
+    Attributes:
+        received (str): The text received before the connection dropped
+    """
+
+    def __init__(self, message: str, received: str = ""):
+        super().__init__(message)
+        self.received = received
+
+
+def is_disconnect(error: BaseException) -> bool:
+    """
+    Check if an error means the websocket connection is gone
+    :param error: The error raised by the connection
+    :return: True for closed connections and network errors
+    """
+
+    if isinstance(error, asyncio.TimeoutError):
+        return False
+    if isinstance(error, (ConnectionError, EOFError, OSError)):
+        return True
+    if "websockets" in sys.modules:
+        from websockets.exceptions import ConnectionClosed, InvalidState
+        return isinstance(error, (ConnectionClosed, InvalidState))
+    return False
+
+
+class ReconnectPolicy(object):
+    """
+    How a `Chat` recovers from a dropped connection: reconnect with jittered exponential backoff,
+    and optionally send again an ask that was interrupted before anything was received
+
+    An ask interrupted after part of the response was received is never sent again (the response would be
+    generated and paid twice), it raises `StreamInterrupted` and the chat reconnects for the next ask.
+
+    Attributes:
+        max_attempts (int): The maximum number of connection attempts per reconnection
+        base_delay (float): The seconds to wait before the second attempt, doubled for every attempt after it
+        max_delay (float): The maximum seconds to wait between two attempts
+        jitter (bool): Whether to wait a random time between 0 and the delay ("full jitter")
+        retry_in_flight (bool): Whether to send again an ask interrupted before its first frame
+
+    e.g.
+    >>> chat = await new_chat(42, reconnect=ReconnectPolicy(max_attempts=10, max_delay=60))
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.,
+        jitter: bool = True,
+        retry_in_flight: bool = True,
+    ):
+        if max_attempts <= 0:
+            raise ValueError("Max attempts must be greater than 0")
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_in_flight = retry_in_flight
+
+    def delay(self, attempt: int) -> float:
+        """
+        Get the seconds to wait before an attempt
+        :param attempt: The number of failed attempts so far (0 for the first attempt)
+        :return: The seconds to wait
+        """
+
+        if attempt <= 0:
+            return 0.
+
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def __str__(self):
+        return (
+            f"ReconnectPolicy(max_attempts={self.max_attempts}, base_delay={self.base_delay}, "
+            f"max_delay={self.max_delay}, retry_in_flight={self.retry_in_flight})"
+        )
+
+    __repr__ = __str__
+
+
 class Chat(object):
     """
     The chat connection for the Chat Nio API
+
+    With a `pool`, the connection is borrowed from the pool: for an existing conversation it is
+    taken back after the `end` frame of every response, for a new conversation (id -1) it is
+    kept until the chat is closed.
+
+    With a `reconnect` policy, a dropped connection is opened again (with the same handshake) instead of
+    failing every later ask. A new conversation (id -1) starts over on the server after a reconnection.
     """
     id: int
     token: str
-    connection: websockets.WebSocketClientProtocol = None
+    connection: Any = None  # the websocket connection
+    drain_timeout: float = 30.  # the maximum seconds to read the rest of a response left early
 
-    def __init__(self, conversation_id: int = -1):
+    def __init__(
+        self,
+        conversation_id: int = -1,
+        pool: ConnectionPool = None,
+        codec: Codec = None,
+        reconnect: ReconnectPolicy = None,
+    ):
         self.id = conversation_id
-        self.uri = get_chat_url()
-        self._waiting = False
+        # the key and endpoint are the ones of the client current at creation (see `ChatNio.use`)
+        self.client = current_client()
+        self.uri = self.client.chat_url
+        self.pool = pool
+        self.codec = codec or get_codec()
+        self.reconnect_policy = reconnect
+        self.reconnects = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lease_token = ""
+        self._used = False
+
+        # asks on one socket are serialized by this lock (created lazily, bound to the running loop)
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop = None
+        self._pending = 0
 
     @property
     def token(self):
-        return "anonymous" if not is_authenticated() else get_token()
+        return "anonymous" if not self.client.is_authenticated() else self.client.token
 
     async def connect(self) -> None:
-        self.connection = await websockets.connect(self.uri)
+        # the connection can only be used on the event loop it was opened on
+        self._loop = asyncio.get_event_loop()
+        if self.pool is not None:
+            self._lease_token = self.token
+            self.connection = await self.pool.acquire(self.uri, self._lease_token, self.id, self.codec)
+            return
+
+        import websockets
+        self.connection = await connect_limited(self.uri, self.token, lambda: websockets.connect(self.uri))
 
         return await self.send({
             "id": self.id,
             "token": self.token,
         })
 
+    async def reconnect(self) -> None:
+        """
+        Drop the current connection and connect again, with the backoff of the reconnect policy
+        :raise: The error of the last attempt, if every attempt failed
+        """
+
+        policy = self.reconnect_policy or ReconnectPolicy(max_attempts=1)
+        await self._drop_connection()
+
+        for attempt in range(policy.max_attempts):
+            delay = policy.delay(attempt)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                await self.connect()
+                self.reconnects += 1
+                return
+            except Exception as e:
+                await self._drop_connection()
+                if not is_disconnect(e) or attempt == policy.max_attempts - 1:
+                    raise
+
+    async def _drop_connection(self, abort: bool = False) -> None:
+        if self.connection is None:
+            return
+        if self.pool is not None:
+            self._give_back(reusable=False)
+            return
+
+        connection, self.connection = self.connection, None
+        transport = getattr(connection, "transport", None)
+        if abort and transport is not None:
+            transport.abort()
+            return
+        try:
+            await asyncio.wait_for(connection.close(), 1.)
+        except Exception:
+            pass
+
     def is_connected(self) -> bool:
-        return self.connection is not None
+        """
+        Check if the connection is open (a dropped connection is not connected)
+        """
+
+        return is_open(self.connection)
 
     def raise_if_not_connected(self) -> None:
         if not self.is_connected():
             raise ConnectionError("Not connected to chat server ({}).".format(self.uri))
 
+    def _give_back(self, reusable: bool = True) -> None:
+        # a new conversation is bound to the connection once a message was sent, so it cannot be shared
+        reusable = reusable and not (self.id == -1 and self._used)
+
+        connection, self.connection = self.connection, None
+        self.pool.release(self.uri, self._lease_token, self.id, connection, reusable)
+
     def close(self) -> bool:
-        if self.is_connected():
-            self.connection.close()
+        """
+        Close the connection (from synchronous code, or without waiting for the closing handshake)
+        :return: Whether a connection was closed
+        """
+
+        if not self.is_connected():
+            return False
+
+        loop, running = self._loop, _running_loop()
+        if loop is not None and loop is not running and loop.is_running():
+            # the connection lives on a loop of another thread (e.g. the background loop of the sync API)
+            return asyncio.run_coroutine_threadsafe(self.close_async(), loop).result()
+
+        if loop is not None and loop is not running:
+            # the loop of the connection is stopped or gone, no closing handshake can run on it:
+            # drop the socket (a pooled connection is bound to that loop, it is not handed out again)
+            connection, self.connection = self.connection, None
+            abort(connection)
             return True
-        return False
+
+        if self.pool is not None:
+            self._give_back()
+            return True
+
+        connection, self.connection = self.connection, None
+        closing = connection.close()
+        if asyncio.iscoroutine(closing):
+            if running is not None:
+                asyncio.ensure_future(closing)
+            else:
+                closing.close()  # never connected on a loop (e.g. a connection set by hand), nothing to wait for
+        return True
+
+    def _detach(self) -> None:
+        # forget a connection opened on another event loop, closing it on that loop if it still runs
+        connection, self.connection = self.connection, None
+        loop = self._loop
+        if connection is None or loop is None:
+            return
+
+        if loop.is_closed() or not loop.is_running():
+            # no loop left to run the closing handshake, drop the socket
+            abort(connection)
+            return
+
+        if self.pool is not None:
+            pool, key = self.pool, (self.uri, self._lease_token, self.id)
+            loop.call_soon_threadsafe(lambda: pool.release(*key, connection, reusable=False))
+        else:
+            asyncio.run_coroutine_threadsafe(connection.close(), loop)
+
+    async def close_async(self) -> bool:
+        """
+        Close the connection and wait for the closing handshake
+        :return: Whether a connection was closed
+        """
+
+        if not self.is_connected():
+            return False
+        if self.pool is not None:
+            self._give_back()
+            return True
+
+        connection, self.connection = self.connection, None
+        await connection.close()
+        return True
 
     async def send(self, message: any) -> None:
         self.raise_if_not_connected()
 
         if not isinstance(message, str):
-            message = json.dumps(message)
+            message = self.codec.dumps(message)
         await self.connection.send(message)
 
     async def receive(self) -> PartialMessage:
+        return PartialMessage(await self._receive_data())
+
+    async def _receive_data(self) -> dict:
         self.raise_if_not_connected()
 
-        response = await self.connection.recv()
+        if self.codec.raw and supports_raw_recv(self.connection):
+            # decode the frame straight from its bytes, without the utf-8 decoded copy
+            response = await self.connection.recv(decode=False)
+        else:
+            response = await self.connection.recv()
+
         if not isinstance(response, dict):
-            response = json.loads(response)
-        return PartialMessage(response)
+            response = self.codec.loads(response)
+        return response
 
     async def send_message(self, message: str, model: str = "gpt-3.5-turbo", web: bool = False) -> None:
         """
@@ -101,6 +413,7 @@ class Chat(object):
         see more at https://docs.chatnio.net/reference/api-jie-kou-can-kao/liao-tian
         """
 
+        self._used = True
         await self.send({
             "type": "chat",
             "message": message,
@@ -108,22 +421,67 @@ class Chat(object):
             "web": web,
         })
 
-    def _waiting_for_end(self) -> None:
-        while self._waiting:
-            pass
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_event_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    @property
+    def queue_size(self) -> int:
+        """
+        The number of asks that are waiting for (or holding) this connection
+        """
+
+        return self._pending
+
+    def is_busy(self) -> bool:
+        """
+        Check if a response is currently streaming on this connection
+        """
+
+        return self._lock is not None and self._lock.locked()
+
+    async def _acquire(self, timeout: float = None) -> None:
+        """
+        Wait for the turn to use this connection
+        :param timeout: The maximum seconds to wait (default: wait forever)
+        :raise asyncio.TimeoutError: If the connection is still busy after `timeout` seconds
+        """
+
+        lock = self._get_lock()
+        self._pending += 1
+        try:
+            if timeout is None:
+                await lock.acquire()
+            else:
+                await asyncio.wait_for(lock.acquire(), timeout)
+        except BaseException:
+            self._pending -= 1
+            raise
+
+    def _release(self) -> None:
+        self._pending -= 1
+        self._lock.release()
 
     async def ask(
         self,
         message: str,
         model: str = "gpt-3.5-turbo",
         web: bool = False,
+        timeout: float = None,
     ) -> AsyncGenerator[PartialMessage, None]:
         """
         Ask a question to the Chat Nio API
+
+        Asks sharing one `Chat` are queued and answered one by one on its connection.
         :param message: The message to ask
         :param model: The model to use (default: "gpt-3.5-turbo")
         :param web: Whether to enable online searching features (default: False)
+        :param timeout: The maximum seconds to wait for the connection to be free (default: wait forever)
         :return: The response from the Chat Nio API
+        :raise asyncio.TimeoutError: If the connection is still busy after `timeout` seconds
 
         see more at https://docs.chatnio.net/reference/api-jie-kou-can-kao/liao-tian
 
@@ -143,24 +501,192 @@ class Chat(object):
         >>> chat.close()
         """
 
+        frames = self._frames(message, model, web, timeout)
+        try:
+            async for data in frames:
+                yield PartialMessage(data)
+        finally:
+            await frames.aclose()
+
+    def ask_text(
+        self,
+        message: str,
+        model: str = "gpt-3.5-turbo",
+        web: bool = False,
+        timeout: float = None,
+    ) -> "TextStream":
+        """
+        Ask a question to the Chat Nio API, streaming only the text deltas
+
+        Unlike `ask`, no `PartialMessage` is built per frame; the quota and the end flag are set once
+        on the returned stream when the response is finished.
+        :param message: The message to ask
+        :param model: The model to use (default: "gpt-3.5-turbo")
+        :param web: Whether to enable online searching features (default: False)
+        :param timeout: The maximum seconds to wait for the connection to be free (default: wait forever)
+        :return: The `text stream`, iterate it asynchronously to get the text deltas
+
+        e.g.
+        >>> stream = chat.ask_text("hi")
+        >>> async for delta in stream:
+        ...     print(delta, end="")
+        Hi, how can I assist you?
+        >>> print(stream.quota, stream.end)
+        0.0 True
+        """
+
+        return TextStream(self._frames(message, model, web, timeout))
+
+    async def _frames(
+        self,
+        message: str,
+        model: str,
+        web: bool,
+        timeout: Optional[float],
+    ) -> AsyncGenerator[dict, None]:
         if message.strip() == "":
-            yield PartialMessage({"message": "", "keyword": "", "quota": 0., "end": True})
+            yield {"message": "", "keyword": "", "quota": 0., "end": True}
             return
 
-        # fix: avoiding contextualization, blocked from the client
-        self._waiting_for_end()
-        self._waiting = True
+        # fix: avoiding contextualization, one response at a time on the connection
+        await self._acquire(timeout)
+        finished = False
+        sent = False
+        attempts = 0
+        try:
+            while True:
+                received = []
+                sent = False
+                try:
+                    if not self.is_connected() and (self.pool is not None or self.reconnect_policy is not None):
+                        if self.connection is None:
+                            await self.connect()
+                        else:
+                            await self.reconnect()
+
+                    await self.send_message(message, model, web)
+                    sent = True
+                    while True:
+                        data = await self._receive_data()
+                        if data.get("end"):
+                            self._record(data, model)
+
+                        received.append(data.get("message", ""))
+                        yield data
+
+                        if data.get("end"):
+                            break
+                    finished = True
+                    break
+                except Exception as e:
+                    policy = self.reconnect_policy
+                    if policy is None or not is_disconnect(e):
+                        raise
+
+                    # recover the connection for this ask or the next one
+                    await self.reconnect()
+                    sent = False
+                    attempts += 1
+                    if received:
+                        raise StreamInterrupted(
+                            "Connection dropped in the middle of the response", "".join(received),
+                        ) from e
+                    if not policy.retry_in_flight or attempts >= policy.max_attempts:
+                        raise
+        finally:
+            if self._used:
+                # the conversation changed on the server
+                invalidate_conversation(self.id, self.client)
+            if self.pool is not None and self.connection is not None and (self.id != -1 or not finished):
+                # an interrupted response leaves unread frames behind, never hand out that connection
+                self._give_back(reusable=finished)
+
+            if self.pool is None and sent and not finished and self.is_connected():
+                # the caller left early: read the rest of the response off the socket in the background,
+                # the next ask keeps waiting for the connection until it is clean
+                self._pending -= 1
+                asyncio.ensure_future(self._drain(self._lock, model, self.drain_timeout))
+            else:
+                self._release()
+
+    def _record(self, data: dict, model: str) -> None:
+        meter = get_quota_meter()
+        if meter is not None:
+            meter.record(float(data.get("quota", 0.)), self.id, model, self.token, self.client)
+
+    async def _drain(self, lock: asyncio.Lock, model: str, timeout: float) -> None:
+        # holds the lock of the interrupted ask until its `end` frame is read
+        async def skip() -> None:
+            while True:
+                data = await self._receive_data()
+                if data.get("end"):
+                    self._record(data, model)
+                    return
+
+        try:
+            await asyncio.wait_for(skip(), timeout)
+        except asyncio.CancelledError:
+            await self._drop_connection()
+            raise
+        except Exception:
+            # the response did not end in time (or the connection failed), open a clean connection instead:
+            # the socket is aborted, a closing handshake would wait behind the rest of the response
+            await self._drop_connection(abort=True)
+            try:
+                await self.reconnect()
+            except Exception:
+                await self._drop_connection()
+        finally:
+            lock.release()
+
+    async def _stream_on_loop(self, message: str, model: str, web: bool, timeout: Optional[float], text: bool):
+        if self.connection is not None and self._loop not in (None, asyncio.get_event_loop()):
+            # opened by another event loop (e.g. `new_chat` under `asyncio.run`), open it again on this one
+            self._detach()
+        if self.connection is None and self.pool is None:
+            await self.connect()
+
+        stream = self.ask_text(message, model, web, timeout) if text else self.ask(message, model, web, timeout)
+        try:
+            async for item in stream:
+                yield item
+        finally:
+            await stream.aclose()
+
+    def stream_sync(
+        self,
+        message: str,
+        model: str = "gpt-3.5-turbo",
+        web: bool = False,
+        timeout: float = None,
+        text: bool = False,
+        buffer: int = 16,
+    ) -> Iterator[Union[PartialMessage, str]]:
+        """
+        Ask a question to the Chat Nio API from synchronous code, iterating the response as it streams
 
-        await self.send_message(message, model, web)
-        while True:
-            response = await self.receive()
-            yield response
+        The response streams on the background event loop of the sync API (see `chatnio.runner`), which keeps
+        the connection for the next calls; at most `buffer` frames are read ahead of the caller.
+        Leaving the loop early stops the stream: the rest of the response is read off the connection in the
+        background, so the next ask on this chat gets a clean connection.
+        :param message: The message to ask
+        :param model: The model to use (default: "gpt-3.5-turbo")
+        :param web: Whether to enable online searching features (default: False)
+        :param timeout: The maximum seconds to wait for the connection to be free (default: wait forever)
+        :param text: Whether to yield only the text deltas instead of `PartialMessage` objects (default: False)
+        :param buffer: The maximum number of frames read ahead of the caller (default: 16)
+        :return: The iterator of the response
 
-            if response.end:
-                break
+        e.g.
+        >>> chat = new_chat_sync()
+        >>> for delta in chat.stream_sync("hi", text=True):
+        ...     print(delta, end="")
+        Hi, how can I assist you?
+        >>> chat.close()
+        """
 
-        self._waiting = False
-        return
+        from .runner import iterate_sync
+        return iterate_sync(self._stream_on_loop(message, model, web, timeout, text), buffer)
 
     def ask_sync(
         self,
@@ -168,13 +694,19 @@ class Chat(object):
         model: str = "gpt-3.5-turbo",
         web: bool = False,
         hook: callable = None,
+        timeout: float = None,
     ) -> None:
         """
-        Ask a question to the Chat Nio API
+        Ask a question to the Chat Nio API, from synchronous code
+
+        The response streams on the background event loop of the sync API (see `chatnio.runner`), which keeps
+        the connection for the next calls; asks from many threads run concurrently.
+        Use `stream_sync` to iterate the response on the calling thread instead.
         :param message: The message to ask
         :param model: The model to use (default: "gpt-3.5-turbo")
         :param web: Whether to enable online searching features (default: False)
-        :param hook: The hook to call when a partial message is received
+        :param hook: The hook to call when a partial message is received (on the loop thread, keep it fast)
+        :param timeout: The maximum seconds to wait for the connection to be free (default: wait forever)
         :return: The response from the Chat Nio API
 
         see more at https://docs.chatnio.net/reference/api-jie-kou-can-kao/liao-tian
@@ -191,26 +723,15 @@ class Chat(object):
         if message.strip() == "":
             return
 
-        # fix: avoiding contextualization, blocked from the client
-        self._waiting_for_end()
-        self._waiting = True
+        from .runner import run_sync
 
         async def stream():
-            await self.send_message(message, model, web)
-            while True:
-                response = await self.receive()
+            # the hook runs right on the loop, without handing every frame over to this thread
+            async for response in self._stream_on_loop(message, model, web, timeout, False):
                 if hook is not None:
                     hook(response)
 
-                if response.end:
-                    break
-
-            self._waiting = False
-            return
-
-        import asyncio
-        asyncio.run(stream())
-        return
+        run_sync(stream())
 
     def __str__(self):
         return f"Chat(id={self.id}, token={self.token}, connection={self.connection})"
@@ -224,13 +745,47 @@ class Chat(object):
         return self.id
 
 
-async def new_chat(conversation_id: int = -1) -> Chat:
+async def new_chat(
+    conversation_id: int = -1,
+    pool: ConnectionPool = None,
+    codec: Codec = None,
+    reconnect: ReconnectPolicy = None,
+) -> Chat:
     """
     Create a new chat connection for the Chat Nio API
     :param conversation_id: The id of the conversation to connect to (default: -1)
+    :param pool: The connection pool to borrow the connection from (default: open a new connection)
+    :param codec: The json codec of the websocket frames (default: the default codec)
+    :param reconnect: The policy to recover from dropped connections (default: no reconnection)
     :return: The `chat` instance
     """
 
-    chat = Chat(conversation_id)
+    chat = Chat(conversation_id, pool, codec, reconnect)
     await chat.connect()
     return chat
+
+
+def new_chat_sync(
+    conversation_id: int = -1,
+    pool: ConnectionPool = None,
+    codec: Codec = None,
+    reconnect: ReconnectPolicy = None,
+) -> Chat:
+    """
+    Create a new chat connection for the Chat Nio API, from synchronous code
+    (the connection is opened on the background event loop of the sync API)
+
+    e.g.
+    >>> chat = new_chat_sync(42)
+    >>> chat.ask_sync("hi", hook=lambda partial: print(partial.message, end=""))
+    >>> chat.close()
+
+    :param conversation_id: The id of the conversation to connect to (default: -1)
+    :param pool: The connection pool to borrow the connection from (default: open a new connection)
+    :param codec: The json codec of the websocket frames (default: the default codec)
+    :param reconnect: The policy to recover from dropped connections (default: no reconnection)
+    :return: The `chat` instance
+    """
+
+    from .runner import run_sync
+    return run_sync(new_chat(conversation_id, pool, codec, reconnect))
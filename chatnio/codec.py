@@ -0,0 +1,383 @@
+# Desc: JSON Codecs for Chat Nio (websocket frames and REST payloads)
+import re
+import json
+import codecs
+from typing import Any, Dict, List, Optional, Union
+
+
+class Codec(object):
+    """
+    The json codec for the Chat Nio API, the standard library `json` module by default
+
+    Attributes:
+        name (str): The name of the codec
+        raw (bool): Whether websocket frames can be decoded from raw bytes (skipping the utf-8 decoding)
+    """
+
+    name = "json"
+    raw = False
+
+    def dumps(self, data: Any) -> str:
+        """
+        Encode data to a json string (websocket frames)
+        """
+
+        return json.dumps(data)
+
+    def dumps_bytes(self, data: Any) -> bytes:
+        """
+        Encode data to json bytes (REST payloads)
+        """
+
+        return json.dumps(data).encode()
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """
+        Decode json from a string or bytes
+        """
+
+        return json.loads(data)
+
+    def __str__(self):
+        return f"Codec(name={self.name})"
+
+    __repr__ = __str__
+
+
+class OrjsonCodec(Codec):
+    name = "orjson"
+    raw = True
+
+    def __init__(self):
+        import orjson
+        self._dumps = orjson.dumps
+        self._loads = orjson.loads
+
+    def dumps(self, data: Any) -> str:
+        return self._dumps(data).decode()
+
+    def dumps_bytes(self, data: Any) -> bytes:
+        return self._dumps(data)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._loads(data)
+
+
+class MsgspecCodec(Codec):
+    name = "msgspec"
+    raw = True
+
+    def __init__(self):
+        import msgspec
+        self._encode = msgspec.json.Encoder().encode
+        self._decode = msgspec.json.Decoder().decode
+
+    def dumps(self, data: Any) -> str:
+        return self._encode(data).decode()
+
+    def dumps_bytes(self, data: Any) -> bytes:
+        return self._encode(data)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._decode(data)
+
+
+class UjsonCodec(Codec):
+    name = "ujson"
+    raw = True
+
+    def __init__(self):
+        import ujson
+        self._dumps = ujson.dumps
+        self._loads = ujson.loads
+
+    def dumps(self, data: Any) -> str:
+        return self._dumps(data)
+
+    def dumps_bytes(self, data: Any) -> bytes:
+        return self._dumps(data).encode()
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._loads(data)
+
+
+# the fastest available codec is preferred
+CODECS = {
+    "orjson": OrjsonCodec,
+    "msgspec": MsgspecCodec,
+    "ujson": UjsonCodec,
+    "json": Codec,
+}
+
+_instances: Dict[str, Codec] = {}
+_default: Optional[Codec] = None
+
+
+def get_codec(name: str = None) -> Codec:
+    """
+    Get a json codec
+    :param name: The name of the codec ("orjson", "msgspec", "ujson" or "json", default: the current default codec)
+    :return: The `codec` instance
+    :raise ImportError: If the library of the codec is not installed
+    """
+
+    global _default
+    if name is None:
+        if _default is None:
+            _default = _best_codec()
+        return _default
+
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name} (available: {', '.join(CODECS)})")
+
+    if name not in _instances:
+        _instances[name] = CODECS[name]()
+    return _instances[name]
+
+
+def _best_codec() -> Codec:
+    for name in CODECS:
+        try:
+            return get_codec(name)
+        except ImportError:
+            continue
+
+
+def set_codec(codec: Union[str, Codec, None]) -> Codec:
+    """
+    Set the default json codec, used by the REST functions and by `Chat` instances without a codec
+    :param codec: The codec or its name (None: the fastest available codec)
+    :return: The codec that was set
+    """
+
+    global _default
+    _default = codec if isinstance(codec, Codec) else get_codec(codec) if codec else _best_codec()
+    return _default
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Decode json with the default codec
+    """
+
+    return get_codec().loads(data)
+
+
+def dumps_bytes(data: Any) -> bytes:
+    """
+    Encode data to json bytes with the default codec
+    """
+
+    return get_codec().dumps_bytes(data)
+
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+_SEPARATOR = re.compile(r"[ \t\r\n,]*")
+_SCALAR_END = re.compile(r"[ \t\r\n,\]}]")
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+
+
+class ArrayStream(object):
+    """
+    An incremental decoder for the items of an array in a json document (e.g. `{"data": [...]}`),
+    items are decoded as soon as their bytes arrive instead of after the whole document
+
+    The array is looked up among the keys of the top level object only (not inside the other values).
+    An item split over many chunks is scanned on from where the previous chunk stopped and decoded once
+    it is complete, instead of being decoded again from its start for every chunk.
+
+    e.g.
+    >>> stream = ArrayStream("data")
+    >>> stream.feed(b'{"status": true, "data": [{"id": 1}, {"i')
+    [{'id': 1}]
+    >>> stream.feed(b'd": 2}]}')
+    [{'id': 2}]
+    """
+
+    def __init__(self, key: str = None):
+        """
+        :param key: The key of the array in the top level object (default: the document is the array)
+        """
+
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._key = key
+        self._position = 0  # where the next token starts
+
+        # the top level object before the array: "open", "key", "colon", "value" (None: no array to find)
+        self._phase: Optional[str] = "open"
+        self._name = None
+
+        # the value being scanned: its start, where the scan resumes, and the scan state
+        self._start: Optional[int] = None
+        self._scan = 0
+        self._depth = 0
+        self._string = False
+
+        self.found = False
+        self.done = False
+
+    def _begin(self, position: int) -> None:
+        self._start = self._scan = position
+        self._depth, self._string = 0, False
+
+    def _value_end(self, buffer: str) -> Optional[int]:
+        # the end of the value at `_start`, scanning on from where the previous chunk stopped (None: incomplete)
+        start = self._start
+        if buffer[start] not in '{["':
+            match = _SCALAR_END.search(buffer, start)  # a number or literal, ended by the next delimiter
+            return match.start() if match is not None else None
+
+        position, depth, string = self._scan, self._depth, self._string
+        if position == start:
+            position += 1
+            string, depth = (True, 0) if buffer[start] == '"' else (False, 1)
+
+        end = None
+        while True:
+            if string:
+                match = _STRING_SPECIAL.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                    break
+                if match.group() == "\\":
+                    if match.end() >= len(buffer):
+                        position = match.start()  # the escaped character is in the next chunk
+                        break
+                    position = match.end() + 1
+                    continue
+                position, string = match.end(), False
+                if depth == 0:
+                    end = position
+                    break
+            else:
+                match = _STRUCTURAL.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                    break
+                char, position = match.group(), match.end()
+                if char == '"':
+                    string = True
+                elif char in "{[":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        end = position
+                        break
+
+        self._scan, self._depth, self._string = position, depth, string
+        return end
+
+    def _find(self) -> bool:
+        # walks the top level object key by key up to the array
+        buffer = self._buffer
+        while self._phase is not None:
+            if self._start is None:
+                skip = _SEPARATOR if self._phase == "key" else _WHITESPACE
+                position = self._position = skip.match(buffer, self._position).end()
+                if position >= len(buffer):
+                    return False
+
+                char = buffer[position]
+                if self._phase == "open":
+                    if char != ("[" if self._key is None else "{"):
+                        self._phase = None  # another document (e.g. an error response)
+                        return False
+                    self._position += 1
+                    self._phase = "key"
+                    if self._key is None:
+                        return True
+                    continue
+                if self._phase == "colon":
+                    if char != ":":
+                        self._phase = None
+                        return False
+                    self._position += 1
+                    self._phase = "value"
+                    continue
+                if self._phase == "key" and char == "}":
+                    self._phase = None
+                    return False
+                if self._phase == "value" and char == "[" and self._name == self._key:
+                    self._position += 1
+                    return True
+                self._begin(position)
+
+            end = self._value_end(buffer)
+            if end is None:
+                return False
+            if self._phase == "key":
+                self._name = self._decoder.decode(buffer[self._start:end])
+                self._phase = "colon"
+            else:
+                self._phase = "key"
+            self._position, self._start = end, None
+        return False
+
+    def feed(self, data: bytes) -> List[Any]:
+        """
+        Feed the next chunk of the document
+        :param data: The chunk of the document
+        :return: The items that were completed by the chunk
+        """
+
+        if self.done:
+            return []
+        self._buffer += self._text.decode(data)
+
+        if not self.found:
+            if not self._find():
+                return []
+            self.found = True
+
+        items = []
+        buffer = self._buffer
+        while True:
+            if self._start is None:
+                position = self._position = _SEPARATOR.match(buffer, self._position).end()
+                if position >= len(buffer):
+                    break
+                if buffer[position] == "]":
+                    self.done = True
+                    self._position += 1
+                    break
+                # most items arrive whole: decode them right away
+                try:
+                    item, end = self._decoder.raw_decode(buffer, position)
+                    if end < len(buffer) or isinstance(item, (dict, list, str)):
+                        items.append(item)
+                        self._position = end
+                        continue
+                except ValueError:
+                    pass
+                # else scan it chunk by chunk, it is decoded once complete
+                self._begin(position)
+
+            end = self._value_end(buffer)
+            if end is None:
+                break  # the item is not complete yet
+            items.append(self._decoder.raw_decode(buffer, self._start)[0])
+            self._position, self._start = end, None
+
+        # drop the decoded items, the buffer only holds the incomplete one
+        cut = self._position if self._start is None else self._start
+        self._buffer = buffer[cut:]
+        self._position -= cut
+        if self._start is not None:
+            self._start -= cut
+            self._scan -= cut
+        return items
+
+    def close(self) -> Optional[Any]:
+        """
+        Finish the document
+        :return: The whole decoded document if the array was never found (e.g. an error response), else None
+        """
+
+        self._buffer += self._text.decode(b"", final=True)
+        if self.found:
+            return None
+        return self._decoder.decode(self._buffer) if self._buffer.strip() else None
@@ -1,19 +1,28 @@
 # Desc: Conversation Operations for Chat Nio
-import json
-from typing import List
+import sys
+import copy
+from typing import Any, AsyncIterator, Iterator, List, Optional
 from .auth import is_authenticated, authenticate_require
-from .globals import client, AuthenticationError
+from .globals import get_client, get_async_client, AuthenticationError
+from .codec import ArrayStream, get_codec, loads
+from .cache import CacheEntry, conversation_key, get_conversation_cache, invalidate_conversation
+from .storage import MessageList, ColumnarMessages
 
 
 class Message(object):
     """
     The message object for the Chat Nio API
+
+    Roles are interned, so the few distinct roles are shared by every message.
     """
+
+    __slots__ = ("role", "content")
+
     role: str
     content: str
 
     def __init__(self, role: str, content: str):
-        self.role = role
+        self.role = sys.intern(role) if type(role) is str else role
         self.content = content
 
     @property
@@ -29,7 +38,7 @@ class Message(object):
         }
 
     def json_format(self) -> str:
-        return json.dumps(self.format)
+        return get_codec().dumps(self.format)
 
     def __str__(self):
         return f"Message(role={self.role}, content={self.content})"
@@ -83,19 +92,77 @@ class Conversation(object):
     Attributes:
         id (int): The id of the conversation
         name (str): The name of the conversation
-        messages (list): The messages in the conversation
+        messages (MessageList): The messages in the conversation (O(1) appends and prepends),
+            a `ColumnarMessages` store for compact conversations
         length (int): The length of the conversation (number of messages)
     """
 
+    __slots__ = ("id", "name", "_messages", "_raw", "_columnar")
+
     id: int
     name: str
-    messages: List[Message]
-    length: int
 
-    def __init__(self, data: dict):
+    def __init__(self, data: dict, columnar: bool = False):
+        """
+        The messages are parsed on first access, so listing conversations does not pay for their history
+        :param data: The conversation data from the Chat Nio API
+        :param columnar: Whether to keep the messages in a compact `ColumnarMessages` store (default: False)
+        """
+
         self.id = data["id"]
         self.name = data["name"]
-        self.messages = Message.parse_list(data.get("messages", data.get("message", [])))
+
+        raw = data.get("messages", data.get("message", []))
+        self._raw = raw if isinstance(raw, list) else []
+        self._messages = None
+        self._columnar = columnar
+
+    @property
+    def messages(self) -> MessageList:
+        if self._messages is None:
+            self._parse()
+        return self._messages
+
+    @messages.setter
+    def messages(self, value: List[Message]):
+        self._messages = value if isinstance(value, (MessageList, ColumnarMessages)) else MessageList(value)
+        self._raw = None
+
+    def _parse(self) -> None:
+        if self._columnar:
+            self._messages = ColumnarMessages.from_records(self._raw)
+        else:
+            self._messages = MessageList(Message.parse_list(self._raw))
+        self._raw = None
+
+    @property
+    def parsed(self) -> bool:
+        """
+        Whether the messages were parsed already
+        """
+
+        return self._messages is not None
+
+    @property
+    def columnar(self) -> bool:
+        """
+        Whether the messages are kept in a compact `ColumnarMessages` store
+        """
+
+        if self._messages is None:
+            return self._columnar
+        return isinstance(self._messages, ColumnarMessages)
+
+    def compact(self) -> "Conversation":
+        """
+        Move the messages into a compact `ColumnarMessages` store (e.g. for large, mostly read histories)
+        :return: The conversation itself
+        """
+
+        self._columnar = True
+        if self._messages is not None and not isinstance(self._messages, ColumnarMessages):
+            self._messages = ColumnarMessages(self._messages)
+        return self
 
     def __str__(self):
         return f"Conversation(id={self.id}, name={self.name}, length={self.length})"
@@ -104,11 +171,23 @@ class Conversation(object):
 
     @property
     def length(self):
-        return len(self.messages)
+        return len(self._raw) if self._messages is None else len(self._messages)
 
     @length.setter
     def length(self, value):
-        self.messages = self.messages[:value]
+        del self.messages[value:]
+
+    def copy(self) -> "Conversation":
+        """
+        Copy the conversation (the list of messages is copied, the messages are shared)
+        :return: The copied conversation
+        """
+
+        conversation = copy.copy(self)
+        if self._messages is not None:
+            # an unparsed payload is never modified, so it is shared
+            conversation._messages = self._messages.copy()
+        return conversation
 
     def get_messages(self, limit: int = None) -> List[Message]:
         """
@@ -123,20 +202,28 @@ class Conversation(object):
 
     def insert_message(self, message: Message) -> None:
         """
-        Insert a message into the conversation
+        Insert a message at the beginning of the conversation
         :param message: The message to insert into the conversation
         """
 
-        self.messages.insert(0, message)
+        self.messages.appendleft(message)
 
     def insert_messages(self, messages: List[Message]) -> None:
         """
-        Insert messages into the conversation
+        Insert messages at the beginning of the conversation, keeping their order (e.g. an older page of history)
         :param messages: The messages to insert into the conversation
         """
 
-        for message in messages:
-            self.insert_message(message)
+        self.messages.extendleft(messages)
+
+    def splice_messages(self, index: int, messages: List[Message]) -> None:
+        """
+        Insert messages at a position of the conversation, keeping their order
+        :param index: The position of the first inserted message
+        :param messages: The messages to insert into the conversation
+        """
+
+        self.messages.splice(index, messages)
 
     def append_message(self, message: Message) -> None:
         """
@@ -152,8 +239,7 @@ class Conversation(object):
         :param messages: The messages to append into the conversation
         """
 
-        for message in messages:
-            self.append_message(message)
+        self.messages.extend(messages)
 
     def delete_message(self, index: int) -> None:
         """
@@ -179,7 +265,7 @@ class Conversation(object):
         return self.messages[item]
 
     def __len__(self):
-        return len(self.messages)
+        return self.length
 
     def __iter__(self):
         return iter(self.messages)
@@ -216,6 +302,41 @@ class Conversation(object):
         del self.messages[i:j]
 
 
+def _cache_lookup(key: tuple) -> Optional[CacheEntry]:
+    cache = get_conversation_cache()
+    return cache.lookup(key) if cache is not None else None
+
+
+def _validators(entry: Optional[CacheEntry]) -> Optional[dict]:
+    # conditional request for an expired entry, the server answers 304 if it did not change
+    if entry is None or entry.fresh or not entry.etag:
+        return None
+    return {"If-None-Match": entry.etag}
+
+
+def _not_modified(resp, entry: Optional[CacheEntry]) -> bool:
+    cache = get_conversation_cache()
+    if resp.status_code != 304 or entry is None or cache is None:
+        return False
+
+    cache.refresh(entry)
+    return True
+
+
+def _copy(value: Any) -> Any:
+    # cached conversations are never handed out, so callers cannot modify the cache
+    return [item.copy() for item in value] if isinstance(value, list) else value.copy()
+
+
+def _cache_store(key: tuple, value: Any, resp) -> Any:
+    cache = get_conversation_cache()
+    if cache is None:
+        return value
+
+    cache.set(key, value, resp.headers.get("etag"))
+    return _copy(value)
+
+
 def list_conversations() -> List[Conversation]:
     """
     List the conversations for the Chat Nio API
@@ -224,14 +345,150 @@ def list_conversations() -> List[Conversation]:
 
     authenticate_require()
 
-    resp = client.get("/conversation/list")
+    key = conversation_key("list")
+    entry = _cache_lookup(key)
+    if entry is not None and entry.fresh:
+        return _copy(entry.value)
+
+    resp = get_client().get("/conversation/list", headers=_validators(entry))
+    if _not_modified(resp, entry):
+        return _copy(entry.value)
+    resp.raise_for_status()
+
+    data = loads(resp.content)
+    if not data["status"]:
+        raise AuthenticationError(data["message"])
+
+    return _cache_store(key, [Conversation(conversation) for conversation in data["data"]], resp)
+
+
+async def list_conversations_async() -> List[Conversation]:
+    """
+    List the conversations for the Chat Nio API (async version of `list_conversations`)
+    :return: The list of conversations
+    """
+
+    authenticate_require()
+
+    key = conversation_key("list")
+    entry = _cache_lookup(key)
+    if entry is not None and entry.fresh:
+        return _copy(entry.value)
+
+    resp = await get_async_client().get("/conversation/list", headers=_validators(entry))
+    if _not_modified(resp, entry):
+        return _copy(entry.value)
     resp.raise_for_status()
 
-    data = resp.json()
+    data = loads(resp.content)
     if not data["status"]:
         raise AuthenticationError(data["message"])
 
-    return [Conversation(conversation) for conversation in data["data"]]
+    return _cache_store(key, [Conversation(conversation) for conversation in data["data"]], resp)
+
+
+def _stream_end(stream: ArrayStream) -> None:
+    document = stream.close()
+    if document is not None and not document.get("status"):
+        raise AuthenticationError(document.get("message", ""))
+
+
+# a streamed list longer than this is not cached (it would be kept whole in memory)
+LIST_CACHE_LIMIT = 1000
+
+
+def _collector() -> Optional[list]:
+    # the streamed conversations are only kept to cache the whole list once it is complete
+    return [] if get_conversation_cache() is not None else None
+
+
+def _collect(conversations: Optional[list], conversation: Conversation) -> Optional[list]:
+    if conversations is None or len(conversations) >= LIST_CACHE_LIMIT:
+        return None
+    conversations.append(conversation.copy())
+    return conversations
+
+
+def iter_conversations(chunk_size: int = None) -> Iterator[Conversation]:
+    """
+    List the conversations for the Chat Nio API as a stream, each conversation is yielded as soon as it is decoded
+    (e.g. render the first entries of a long list before the response is complete)
+
+    e.g.
+    >>> for conversation in iter_conversations():
+    ...     print(conversation.id, conversation.name)
+    >>> first_page = list(itertools.islice(iter_conversations(), 20))  # stops reading after 20 conversations
+
+    :param chunk_size: The size of the chunks read from the response (default: as they arrive)
+    :return: The iterator of conversations
+    """
+
+    authenticate_require()
+
+    key = conversation_key("list")
+    entry = _cache_lookup(key)
+    if entry is not None and entry.fresh:
+        yield from _copy(entry.value)
+        return
+
+    with get_client().stream("GET", "/conversation/list", headers=_validators(entry)) as resp:
+        if _not_modified(resp, entry):
+            yield from _copy(entry.value)
+            return
+        resp.raise_for_status()
+
+        stream = ArrayStream("data")
+        conversations = _collector()
+        for chunk in resp.iter_bytes(chunk_size):
+            for item in stream.feed(chunk):
+                conversation = Conversation(item)
+                conversations = _collect(conversations, conversation)
+                yield conversation
+        _stream_end(stream)
+
+    if conversations is not None:
+        _cache_store(key, conversations, resp)
+
+
+async def iter_conversations_async(chunk_size: int = None) -> AsyncIterator[Conversation]:
+    """
+    List the conversations for the Chat Nio API as a stream (async version of `iter_conversations`)
+
+    e.g.
+    >>> async for conversation in iter_conversations_async():
+    ...     print(conversation.id, conversation.name)
+
+    :param chunk_size: The size of the chunks read from the response (default: as they arrive)
+    :return: The async iterator of conversations
+    """
+
+    authenticate_require()
+
+    key = conversation_key("list")
+    entry = _cache_lookup(key)
+    if entry is not None and entry.fresh:
+        for conversation in _copy(entry.value):
+            yield conversation
+        return
+
+    async with get_async_client().stream("GET", "/conversation/list", headers=_validators(entry)) as resp:
+        if _not_modified(resp, entry):
+            for conversation in _copy(entry.value):
+                yield conversation
+            return
+        resp.raise_for_status()
+
+        stream = ArrayStream("data")
+        conversations = _collector()
+        async for chunk in resp.aiter_bytes(chunk_size):
+            for item in stream.feed(chunk):
+                conversation = Conversation(item)
+                conversations = _collect(conversations, conversation)
+                yield conversation
+        _stream_end(stream)
+
+    if conversations is not None:
+        _cache_store(key, conversations, resp)
 
 
 def load_conversation(_id: int) -> Conversation:
@@ -243,14 +500,47 @@ def load_conversation(_id: int) -> Conversation:
 
     authenticate_require()
 
-    resp = client.get("/conversation/load", params={"id": _id})
+    key = conversation_key("load", _id)
+    entry = _cache_lookup(key)
+    if entry is not None and entry.fresh:
+        return _copy(entry.value)
+
+    resp = get_client().get("/conversation/load", params={"id": _id}, headers=_validators(entry))
+    if _not_modified(resp, entry):
+        return _copy(entry.value)
     resp.raise_for_status()
 
-    data = resp.json()
+    data = loads(resp.content)
     if not data["status"]:
         raise AuthenticationError(data["message"])
 
-    return Conversation(data["data"])
+    return _cache_store(key, Conversation(data["data"]), resp)
+
+
+async def load_conversation_async(_id: int) -> Conversation:
+    """
+    Load a conversation from the Chat Nio API (async version of `load_conversation`)
+    :param _id: The id of the conversation to load
+    :return: The conversation that was loaded
+    """
+
+    authenticate_require()
+
+    key = conversation_key("load", _id)
+    entry = _cache_lookup(key)
+    if entry is not None and entry.fresh:
+        return _copy(entry.value)
+
+    resp = await get_async_client().get("/conversation/load", params={"id": _id}, headers=_validators(entry))
+    if _not_modified(resp, entry):
+        return _copy(entry.value)
+    resp.raise_for_status()
+
+    data = loads(resp.content)
+    if not data["status"]:
+        raise AuthenticationError(data["message"])
+
+    return _cache_store(key, Conversation(data["data"]), resp)
 
 
 def delete_conversation(_id: int) -> bool:
@@ -262,8 +552,26 @@ def delete_conversation(_id: int) -> bool:
 
     authenticate_require()
 
-    resp = client.get("/conversation/delete?id={}".format(_id))
+    resp = get_client().get("/conversation/delete?id={}".format(_id))
+    resp.raise_for_status()
+    invalidate_conversation(_id)
+
+    data = loads(resp.content)
+    return bool(data["status"])
+
+
+async def delete_conversation_async(_id: int) -> bool:
+    """
+    Delete a conversation from the Chat Nio API (async version of `delete_conversation`)
+    :param _id: The id of the conversation to delete
+    :return: The status of the deletion (True if successful)
+    """
+
+    authenticate_require()
+
+    resp = await get_async_client().get("/conversation/delete", params={"id": _id})
     resp.raise_for_status()
+    invalidate_conversation(_id)
 
-    data = resp.json()
+    data = loads(resp.content)
     return bool(data["status"])
@@ -0,0 +1,304 @@
+# Desc: Conversation Export for Chat Nio (jsonl and binary archives)
+import os
+import mmap
+import struct
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .globals import get_client, AuthenticationError
+from .codec import get_codec, loads
+from .conversation import Conversation, iter_conversations
+from .bulk import _prepare, _run
+
+FORMATS = ("jsonl", "binary")
+
+# binary archives: the magic, then one record per conversation (4 bytes big-endian length + json)
+MAGIC = b"CNIOARC1"
+_LENGTH = struct.Struct(">I")
+
+
+class ExportState(object):
+    """
+    The state of an export, kept in a json file between runs
+
+    The progress of the current run (exported ids and the archive offset they end at) allows resuming
+    an interrupted run; the etag and digest of every exported conversation allow incremental runs.
+
+    Attributes:
+        path (str): The path of the state file
+        offset (int): The archive size at the last checkpoint (0 if no run is in progress)
+        done (List[int]): The ids exported (or skipped) by the run in progress
+        etags (Dict[str, str]): The etag of every exported conversation, by id
+        digests (Dict[str, str]): The content digest of every exported conversation, by id
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.done: List[int] = []
+        self.etags: Dict[str, str] = {}
+        self.digests: Dict[str, str] = {}
+
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                data = loads(file.read())
+            self.offset = data.get("offset", 0)
+            self.done = data.get("done", [])
+            self.etags = data.get("etags", {})
+            self.digests = data.get("digests", {})
+
+    @property
+    def in_progress(self) -> bool:
+        return self.offset > 0
+
+    def save(self) -> None:
+        """
+        Write the state atomically (a crash leaves either the old or the new state)
+        """
+
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(get_codec().dumps_bytes({
+                "offset": self.offset,
+                "done": self.done,
+                "etags": self.etags,
+                "digests": self.digests,
+            }))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+
+    def __str__(self):
+        return f"ExportState(path={self.path}, offset={self.offset}, done={len(self.done)}, known={len(self.digests)})"
+
+    __repr__ = __str__
+
+
+class ExportResult(object):
+    """
+    The summary of an export run
+
+    Attributes:
+        written (int): The number of conversations written to the archive
+        skipped (int): The number of unchanged (incremental) or already exported (resumed) conversations
+        failed (Dict[int, Exception]): The conversations that could not be loaded, by id
+        size (int): The size of the archive in bytes
+    """
+
+    def __init__(self):
+        self.written = 0
+        self.skipped = 0
+        self.failed: Dict[int, BaseException] = {}
+        self.size = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    def __bool__(self):
+        return self.ok
+
+    def __str__(self):
+        return (
+            f"ExportResult(written={self.written}, skipped={self.skipped}, "
+            f"failed={len(self.failed)}, size={self.size})"
+        )
+
+    __repr__ = __str__
+
+
+def _guess_format(path: str) -> str:
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "binary"
+
+
+def _encode(payload: bytes, fmt: str) -> bytes:
+    if fmt == "jsonl":
+        return payload + b"\n"
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def _fetch(_id: int, etag: Optional[str]) -> Tuple[Optional[dict], Optional[str]]:
+    # conditional load, (None, etag) if the conversation did not change since the etag
+    resp = get_client().get("/conversation/load", params={"id": _id}, headers={"If-None-Match": etag} if etag else None)
+    if resp.status_code == 304:
+        return None, etag
+    resp.raise_for_status()
+
+    data = loads(resp.content)
+    if not data["status"]:
+        raise AuthenticationError(data["message"])
+    return data["data"], resp.headers.get("etag")
+
+
+def export_conversations(
+    path: str,
+    ids: Iterable[int] = None,
+    format: str = None,
+    state: str = None,
+    incremental: bool = False,
+    concurrency: int = 8,
+    rate: float = None,
+    checkpoint_every: int = 100,
+) -> ExportResult:
+    """
+    Export conversations to an archive, streaming: each conversation is written as soon as it is loaded,
+    so memory does not grow with the number of conversations
+
+    e.g.
+    >>> export_conversations("conversations.jsonl", state="conversations.state")  # resumes if interrupted
+    >>> export_conversations("delta.bin", state="conversations.state", incremental=True)  # changed ones only
+
+    :param path: The path of the archive
+    :param ids: The ids of the conversations to export (default: every conversation, streamed from the list)
+    :param format: "jsonl" (one json conversation per line) or "binary" (length-prefixed json records)
+        (default: "jsonl" for .jsonl / .ndjson paths, else "binary")
+    :param state: The path of the state file, required to resume or to run incrementally (default: None)
+    :param incremental: Whether to skip the conversations that did not change since they were last exported
+    :param concurrency: The maximum number of requests in flight (default: 8)
+    :param rate: The maximum number of requests per second (default: unlimited)
+    :param checkpoint_every: The number of conversations between two checkpoints of the state (default: 100)
+    :return: The summary of the run
+    """
+
+    fmt = format or _guess_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (available: {', '.join(FORMATS)})")
+    if incremental and state is None:
+        raise ValueError("Incremental exports need a state file")
+
+    limiter, context = _prepare(concurrency, rate)
+    export_state = ExportState(state) if state is not None else None
+    result = ExportResult()
+
+    resume = export_state is not None and export_state.in_progress and os.path.exists(path)
+    if export_state is not None and not resume:
+        export_state.offset, export_state.done = 0, []
+    done = set(export_state.done) if resume else set()
+
+    if ids is None:
+        ids = (conversation.id for conversation in iter_conversations())
+
+    def pending_ids() -> Iterator[int]:
+        for _id in ids:
+            if _id in done:
+                result.skipped += 1
+                continue
+            yield _id
+
+    def fetch(_id: int):
+        etag = export_state.etags.get(str(_id)) if incremental else None
+        return _fetch(_id, etag)
+
+    codec = get_codec()
+    with open(path, "r+b" if resume else "wb") as file:
+        if resume:
+            # drop whatever was written after the last checkpoint
+            file.truncate(export_state.offset)
+            file.seek(export_state.offset)
+        elif fmt == "binary":
+            file.write(MAGIC)
+
+        # progress since the last checkpoint: ids, etags and digests are only saved with the data they describe
+        progress: List[tuple] = []
+
+        def checkpoint() -> None:
+            if export_state is None:
+                progress.clear()
+                return
+            file.flush()
+            os.fsync(file.fileno())
+            export_state.offset = file.tell()
+            for _id, etag, digest in progress:
+                export_state.done.append(_id)
+                if digest is not None:
+                    export_state.digests[str(_id)] = digest
+                if etag is not None:
+                    export_state.etags[str(_id)] = etag
+            export_state.save()
+            progress.clear()
+
+        for item in _run(fetch, pending_ids(), concurrency, limiter, context):
+            if not item.ok:
+                result.failed[item.id] = item.error
+                continue
+
+            data, etag = item.value
+            if data is None:
+                result.skipped += 1
+                progress.append((item.id, None, None))
+            else:
+                payload = codec.dumps_bytes(data)
+                digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+                if incremental and export_state.digests.get(str(item.id)) == digest:
+                    result.skipped += 1
+                else:
+                    file.write(_encode(payload, fmt))
+                    result.written += 1
+                progress.append((item.id, etag, digest))
+
+            if len(progress) >= checkpoint_every:
+                checkpoint()
+
+        checkpoint()
+        result.size = file.tell()
+
+    if export_state is not None:
+        # the run is complete, the next one starts over
+        export_state.offset, export_state.done = 0, []
+        export_state.save()
+    return result
+
+
+def _records(buffer, size: int) -> Iterator[bytes]:
+    if buffer[:len(MAGIC)] == MAGIC:
+        position = len(MAGIC)
+        while position < size:
+            if position + _LENGTH.size > size:
+                raise ValueError("Truncated archive record")
+            length, = _LENGTH.unpack_from(buffer, position)
+            position += _LENGTH.size
+            if position + length > size:
+                raise ValueError("Truncated archive record")
+            yield buffer[position:position + length]
+            position += length
+        return
+
+    position = 0
+    while position < size:
+        end = buffer.find(b"\n", position)
+        if end == -1:
+            end = size
+        line = buffer[position:end]
+        position = end + 1
+        if line.strip():
+            yield line
+
+
+def read_archive(path: str, columnar: bool = False, use_mmap: bool = True) -> Iterator[Conversation]:
+    """
+    Read the conversations of an archive (jsonl or binary, detected from the content) one by one
+    :param path: The path of the archive
+    :param columnar: Whether to keep the messages in compact `ColumnarMessages` stores (default: False)
+    :param use_mmap: Whether to memory-map the archive instead of reading it, for large files (default: True)
+    :return: The iterator of conversations
+
+    e.g.
+    >>> for conversation in read_archive("conversations.bin"):
+    ...     print(conversation.id, conversation.name, len(conversation))
+    """
+
+    codec = get_codec()
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return
+
+        if not use_mmap:
+            buffer = file.read()
+            for record in _records(buffer, size):
+                yield Conversation(codec.loads(record), columnar)
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for record in _records(buffer, size):
+                yield Conversation(codec.loads(record), columnar)
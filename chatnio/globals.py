@@ -1,15 +1,79 @@
 # Desc: Globals for Chat Nio
-import httpx
+import threading
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
 
-API_BASE = "https://api.chatnio.net"
+if TYPE_CHECKING:
+    import httpx
+    from .api import ChatNio
+    from .transport import TransportConfig
 
-client = httpx.Client(
-    base_url=API_BASE,
-    headers={
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    },
-)
+DEFAULT_API_BASE = "https://api.chatnio.net"
+API_BASE = DEFAULT_API_BASE
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json",
+}
+
+# the client of the calls made in the current thread / task (see `ChatNio.use`), the default one if unset
+_current: ContextVar = ContextVar("chatnio_client", default=None)
+
+# the client behind the module-level functions, created on first use (see `get_default_client`)
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_default_client() -> "ChatNio":
+    """
+    Get the default client, configured by `set_key` and `set_endpoint`
+    :return: The `ChatNio` instance
+    """
+
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                from .api import ChatNio
+                from . import auth
+                _default = ChatNio(auth.TOKEN, API_BASE)
+    return _default
+
+
+def current_client() -> "ChatNio":
+    """
+    Get the client of the current thread / task (the default client outside of `ChatNio.use`)
+    :return: The `ChatNio` instance
+    """
+
+    client = _current.get()
+    return client if client is not None else get_default_client()
+
+
+def get_client() -> "httpx.Client":
+    """
+    Get the blocking client of the current `ChatNio` client
+    :return: The `httpx.Client` instance
+    """
+
+    return current_client().get_client()
+
+
+def get_async_client() -> "httpx.AsyncClient":
+    """
+    Get the async client of the current `ChatNio` client, for the running event loop
+    :return: The `httpx.AsyncClient` instance
+    """
+
+    return current_client().get_async_client()
+
+
+def set_header(name: str, value: str) -> None:
+    """
+    Set a header on the http clients of the default client
+    """
+
+    get_default_client().set_header(name, value)
 
 
 def set_endpoint(endpoint: str) -> None:
@@ -20,14 +84,45 @@ def set_endpoint(endpoint: str) -> None:
 
     global API_BASE
     API_BASE = endpoint
-    client.base_url = endpoint
+    get_default_client().set_endpoint(endpoint)
+
+
+def set_transport(transport: "TransportConfig" = None, **options) -> None:
+    """
+    Set the settings of the http connections of the default client
+    :param transport: The settings (default: the defaults of httpx)
+    :param options: Settings to build a `TransportConfig` from, instead of passing one
+
+    e.g.
+    >>> set_transport(http2=True, max_connections=32, read_timeout=30)
+    """
+
+    if options:
+        from .transport import TransportConfig
+        transport = (transport or TransportConfig()).replace(**options)
+    get_default_client().set_transport(transport)
+
+
+def get_transport() -> "TransportConfig":
+    """
+    Get the settings of the http connections of the current client (None: the defaults of httpx)
+    """
+
+    return current_client().transport
 
 
 def get_chat_url():
     # http to ws, https to wss
-    return API_BASE.replace("http", "ws").replace("https", "wss") + "/chat"
+    return current_client().chat_url
 
 
 class AuthenticationError(Exception):
     def __init__(self, message: str = "Authentication Error"):
         super().__init__(message)
+
+
+def __getattr__(name: str):
+    # `client` is kept as a module attribute for compatibility, it is created on first access
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
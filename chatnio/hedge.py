@@ -0,0 +1,333 @@
+# Desc: Hedged Asks for Chat Nio (tail latency)
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING, AsyncGenerator, Iterator, List, Optional, Sequence
+
+from .chat import Chat, PartialMessage, ReconnectPolicy
+from .pool import ConnectionPool
+from .codec import Codec
+
+if TYPE_CHECKING:
+    from .api import ChatNio
+
+
+class HedgePolicy(object):
+    """
+    When to hedge an ask: after a fixed `delay`, or after the `percentile` of the first frame latencies
+    of the recent asks (the `initial` delay until `min_samples` asks were measured)
+
+    Attributes:
+        delay (float): The fixed seconds before a hedge (None: learned from the history)
+        percentile (float): The percentile of the recent first frame latencies to hedge after (0 - 100)
+        history (int): The number of recent latencies kept
+        min_samples (int): The number of latencies needed before the percentile is used
+        initial (float): The seconds before a hedge while the history is too short
+        min_delay (float): The lowest learned delay (so a fast history does not hedge every ask)
+        max_hedges (int): The maximum number of extra requests per ask (at most one attempt per chat)
+    """
+
+    def __init__(
+        self,
+        delay: float = None,
+        percentile: float = 95.,
+        history: int = 100,
+        min_samples: int = 10,
+        initial: float = 1.,
+        min_delay: float = 0.,
+        max_hedges: int = 1,
+    ):
+        if not 0 < percentile <= 100:
+            raise ValueError("Percentile must be in (0, 100]")
+
+        self.delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial = initial
+        self.min_delay = min_delay
+        self.max_hedges = max_hedges
+        self.latencies = deque(maxlen=history)
+
+    def record(self, latency: float) -> None:
+        """
+        Add the first frame latency of an attempt to the history (the seconds it ran, if it was cancelled before)
+        """
+
+        self.latencies.append(latency)
+
+    def deadline(self) -> float:
+        """
+        The seconds to wait for the first frame before hedging
+        """
+
+        if self.delay is not None:
+            return self.delay
+        if len(self.latencies) < self.min_samples:
+            return self.initial
+
+        latencies = sorted(self.latencies)
+        rank = min(len(latencies) - 1, max(0, round(len(latencies) * self.percentile / 100) - 1))
+        return max(latencies[rank], self.min_delay)
+
+    def __str__(self):
+        deadline = "learned" if self.delay is None else f"{self.delay}s"
+        return (
+            f"HedgePolicy(deadline={deadline}, percentile={self.percentile}, "
+            f"samples={len(self.latencies)}, max_hedges={self.max_hedges})"
+        )
+
+    __repr__ = __str__
+
+
+class _Attempt(object):
+    __slots__ = ("index", "chat", "model", "stream", "first", "start", "latency")
+
+    def __init__(self, index: int, chat: Chat, model: str, stream: AsyncGenerator, start: float):
+        self.index = index
+        self.chat = chat
+        self.model = model
+        self.stream = stream
+        self.start = start
+        # the seconds to the first frame (None until it came)
+        self.latency: Optional[float] = None
+        self.first = asyncio.ensure_future(_first(stream))
+
+
+async def _first(stream: AsyncGenerator) -> Optional[PartialMessage]:
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def _cancel(attempt: _Attempt) -> None:
+    # the ask of a loser is cancelled without draining the rest of its response: its chat drops the connection
+    # (the drain timeout is read when the ask is left, so the override only applies to this attempt)
+    chat = attempt.chat
+    overridden = "drain_timeout" in vars(chat)
+    drain_timeout, chat.drain_timeout = chat.drain_timeout, 0.
+    try:
+        attempt.first.cancel()
+        await asyncio.gather(attempt.first, return_exceptions=True)
+        await attempt.stream.aclose()
+    finally:
+        if overridden:
+            chat.drain_timeout = drain_timeout
+        else:
+            del chat.drain_timeout
+
+
+class HedgedChat(object):
+    """
+    Hedged asks over several chats, trading extra spend for a lower tail latency
+
+    An ask starts on the least busy chat. If its first frame has not come after the deadline of the policy,
+    the same message is sent on the next chat (with the next fallback model, if any); the first stream
+    to produce a frame is streamed, the others are cancelled. A failed attempt is hedged right away.
+
+    A loser cancelled in the middle of its response drops its connection, so the server stops generating it:
+    a pooled one is never handed out again, an own one is opened again (it is not drained, whatever the
+    `drain_timeout` of its chat). An ask makes at most one attempt per chat.
+
+    The policy learns from every attempt: the first frame latency of the winner and of the losers that answered
+    too, and the seconds the cancelled losers ran (so the slow attempts are not left out of the percentile).
+
+    Every attempt sends the message: on an existing conversation, a hedge adds it to the history once more,
+    so hedge new conversations (id -1) unless that is acceptable. The chats can be on other pooled
+    connections, other endpoints or other keys (see `new_hedged_chat`).
+
+    e.g.
+    >>> chat = await new_hedged_chat(targets=[primary, mirror], models=["gpt-3.5-turbo-16k"])
+    >>> async for partial in chat.ask("hi", model="gpt-4"):
+    ...     print(partial.message, end="")
+    >>> print(chat.hedges, chat.hedge_wins, chat.policy.deadline())
+    >>> await chat.close_async()
+
+    Attributes:
+        chats (list): The chats the attempts are spread over
+        models (list): The fallback models of the hedges (default: the model of the ask)
+        policy (HedgePolicy): When to hedge
+        asks (int): The number of asks
+        hedges (int): The number of extra requests started
+        hedge_wins (int): The number of asks answered first by a hedge
+    """
+
+    def __init__(self, chats: Sequence[Chat], models: Sequence[str] = None, policy: HedgePolicy = None):
+        if not chats:
+            raise ValueError("Hedged chat needs at least one chat")
+
+        self.chats: List[Chat] = list(chats)
+        self.models: List[str] = list(models or [])
+        self.policy = policy or HedgePolicy()
+        self.asks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _model(self, index: int, model: str) -> str:
+        if index == 0 or not self.models:
+            return model
+        return self.models[(index - 1) % len(self.models)]
+
+    async def ask(
+        self,
+        message: str,
+        model: str = "gpt-3.5-turbo",
+        web: bool = False,
+        timeout: float = None,
+    ) -> AsyncGenerator[PartialMessage, None]:
+        """
+        Ask a question, hedged (see `Chat.ask`)
+        :param message: The message to ask
+        :param model: The model of the first attempt (default: "gpt-3.5-turbo")
+        :param web: Whether to enable online searching features (default: False)
+        :param timeout: The maximum seconds an attempt waits for its chat to be free (default: wait forever),
+            an attempt that timed out is hedged right away
+        :return: The response of the first attempt to answer
+        :raise: The error of the last attempt, if every attempt failed
+        """
+
+        loop = asyncio.get_event_loop()
+        # the least busy chats first (a chat still draining a lost response is busy)
+        chats = sorted(self.chats, key=lambda chat: (chat.is_busy(), chat.queue_size))
+        attempts: List[_Attempt] = []
+        pending = {}
+        winner: Optional[_Attempt] = None
+        self.asks += 1
+
+        def start() -> None:
+            index = len(attempts)
+            chat = chats[index]
+            attempt_model = self._model(index, model)
+            attempt = _Attempt(index, chat, attempt_model, chat.ask(message, attempt_model, web, timeout), loop.time())
+            attempts.append(attempt)
+            pending[attempt.first] = attempt
+            if index:
+                self.hedges += 1
+
+        try:
+            start()
+            error: Optional[BaseException] = None
+            while winner is None:
+                hedge = len(attempts) <= min(self.policy.max_hedges, len(chats) - 1)
+                if not pending:
+                    if not hedge:
+                        raise error
+                    start()
+                    continue
+
+                remaining = max(attempts[-1].start + self.policy.deadline() - loop.time(), 0.) if hedge else None
+                done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    start()
+                    continue
+
+                for attempt in sorted((pending.pop(task) for task in done), key=lambda attempt: attempt.index):
+                    if attempt.first.exception() is None:
+                        attempt.latency = loop.time() - attempt.start
+                    if winner is None and attempt.first.exception() is None:
+                        winner = attempt
+                    elif attempt.first.exception() is not None:
+                        error = attempt.first.exception()
+                        await attempt.stream.aclose()
+                    else:
+                        # answered too, but later in the order
+                        pending[attempt.first] = attempt
+
+            if winner.index:
+                self.hedge_wins += 1
+            losers, pending = list(pending.values()), {}
+            # the losers are recorded too, censored at the seconds they ran if they have not answered
+            for attempt in [winner] + losers:
+                self.policy.record(attempt.latency if attempt.latency is not None else loop.time() - attempt.start)
+            await asyncio.gather(*(_cancel(attempt) for attempt in losers))
+
+            first = winner.first.result()
+            if first is None:
+                return
+            yield first
+            async for partial in winner.stream:
+                yield partial
+        finally:
+            # left early (or failed): nothing keeps running
+            await asyncio.gather(*(_cancel(attempt) for attempt in pending.values()))
+            if winner is not None:
+                await winner.stream.aclose()
+
+    def stream_sync(
+        self,
+        message: str,
+        model: str = "gpt-3.5-turbo",
+        web: bool = False,
+        timeout: float = None,
+    ) -> Iterator[PartialMessage]:
+        """
+        Ask a question hedged, from synchronous code (the chats must be opened with `new_hedged_chat_sync`)
+        """
+
+        from .runner import iterate_sync
+        return iterate_sync(self.ask(message, model, web, timeout))
+
+    def close(self) -> bool:
+        return all([chat.close() for chat in self.chats])
+
+    async def close_async(self) -> bool:
+        return all([await chat.close_async() for chat in self.chats])
+
+    def __str__(self):
+        return f"HedgedChat(chats={len(self.chats)}, asks={self.asks}, hedges={self.hedges}, policy={self.policy})"
+
+    __repr__ = __str__
+
+
+async def new_hedged_chat(
+    conversation_id: int = -1,
+    count: int = 2,
+    targets: Sequence["ChatNio"] = None,
+    models: Sequence[str] = None,
+    policy: HedgePolicy = None,
+    pool: ConnectionPool = None,
+    codec: Codec = None,
+    reconnect: ReconnectPolicy = None,
+) -> HedgedChat:
+    """
+    Open the chats of a hedged chat
+    :param conversation_id: The id of the conversation to connect to (default: -1)
+    :param count: The number of chats (default: 2, at least one per target)
+    :param targets: The clients to open the chats with, in turn (e.g. mirrors, default: the current client)
+    :param models: The fallback models of the hedges (default: the model of the ask)
+    :param policy: When to hedge (default: after the 95th percentile of the recent first frame latencies)
+    :param pool: The connection pool to borrow the connections from (default: the pool of each client)
+    :param codec: The json codec of the websocket frames (default: the default codec)
+    :param reconnect: The policy to recover from dropped connections (default: no reconnection)
+    :return: The `hedged chat` instance
+    """
+
+    from .globals import current_client
+    targets = list(targets or [current_client()])
+    chats = await asyncio.gather(*(
+        targets[index % len(targets)].new_chat(conversation_id, pool, codec, reconnect)
+        for index in range(max(count, len(targets)))
+    ))
+    return HedgedChat(chats, models, policy)
+
+
+def new_hedged_chat_sync(
+    conversation_id: int = -1,
+    count: int = 2,
+    targets: Sequence["ChatNio"] = None,
+    models: Sequence[str] = None,
+    policy: HedgePolicy = None,
+    pool: ConnectionPool = None,
+    codec: Codec = None,
+    reconnect: ReconnectPolicy = None,
+) -> HedgedChat:
+    """
+    Open the chats of a hedged chat, from synchronous code (on the background event loop of the sync API)
+
+    e.g.
+    >>> chat = new_hedged_chat_sync(policy=HedgePolicy(delay=0.5))
+    >>> for partial in chat.stream_sync("hi"):
+    ...     print(partial.message, end="")
+    """
+
+    from .runner import run_sync
+    return run_sync(new_hedged_chat(conversation_id, count, targets, models, policy, pool, codec, reconnect))
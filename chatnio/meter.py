@@ -0,0 +1,316 @@
+# Desc: Local Quota Meter for Chat Nio (spend of the chat streams)
+import time
+import threading
+from collections import defaultdict
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+from .globals import current_client
+
+if TYPE_CHECKING:
+    from .api import ChatNio
+
+
+def _mask(token: str) -> str:
+    # never keep the whole secret key around, the last characters are enough to tell keys apart
+    return token if len(token) <= 8 else f"{token[:3]}...{token[-4:]}"
+
+
+class _Account(object):
+    # the reconciliation state of one account (endpoint and key)
+    __slots__ = ("server_quota", "spent_since", "reconciled_at", "reconciling", "drift")
+
+    def __init__(self):
+        self.server_quota: Optional[float] = None
+        self.spent_since = 0.
+        self.reconciled_at = 0.
+        self.reconciling = False
+        self.drift = 0.
+
+
+def _account_key(client: "ChatNio") -> Tuple[str, str]:
+    return client.endpoint, _mask(client.token)
+
+
+class QuotaMeter(object):
+    """
+    A thread-safe, in-memory meter of the quota spent by chat responses (the `quota` of their `end` frame)
+
+    The spend is kept per conversation, model and key. The remaining quota of every account (endpoint and key)
+    is estimated from its last reconciliation with the server (`get_quota` of its client) minus its spend since
+    then, so it can be read on the hot path. A failed reconciliation is retried after `reconcile_interval`.
+
+    Attributes:
+        budget (float): The spend that triggers `on_budget` (default: no budget)
+        on_budget (Callable[[QuotaMeter], None]): Called once when the spend reaches the budget
+        reconcile_interval (float): The seconds between two automatic reconciliations (default: manual only)
+        total (float): The quota spent since the meter was created (or reset)
+    """
+
+    def __init__(
+        self,
+        budget: float = None,
+        on_budget: Callable[["QuotaMeter"], None] = None,
+        reconcile_interval: float = None,
+    ):
+        self.budget = budget
+        self.on_budget = on_budget
+        self.reconcile_interval = reconcile_interval
+
+        self._lock = threading.Lock()
+        self.total = 0.
+        self.responses = 0
+        self._by_conversation: Dict[int, float] = defaultdict(float)
+        self._by_model: Dict[str, float] = defaultdict(float)
+        self._by_key: Dict[str, float] = defaultdict(float)
+        self._notified = False
+        self._accounts: Dict[Tuple[str, str], _Account] = {}
+
+    def _account(self, client: "ChatNio") -> _Account:
+        # called with the lock held
+        key = _account_key(client)
+        account = self._accounts.get(key)
+        if account is None:
+            account = self._accounts[key] = _Account()
+        return account
+
+    def record(
+        self,
+        quota: float,
+        conversation_id: int = -1,
+        model: str = "",
+        token: str = "",
+        client: "ChatNio" = None,
+    ) -> None:
+        """
+        Record the quota spent by a response
+        :param quota: The quota of the `end` frame
+        :param conversation_id: The id of the conversation
+        :param model: The model of the response
+        :param token: The key the response was paid with (only a masked form is kept)
+        :param client: The client the response was paid with, whose account is charged (default: the current client)
+        """
+
+        client = client if client is not None else current_client()
+        with self._lock:
+            self.total += quota
+            self.responses += 1
+            account = self._account(client)
+            account.spent_since += quota
+            self._by_conversation[conversation_id] += quota
+            self._by_model[model] += quota
+            self._by_key[_mask(token)] += quota
+
+            notify = (
+                self.budget is not None and self.on_budget is not None
+                and not self._notified and self.total >= self.budget
+            )
+            if notify:
+                self._notified = True
+
+            reconcile = (
+                self.reconcile_interval is not None and not account.reconciling
+                and time.monotonic() - account.reconciled_at >= self.reconcile_interval
+            )
+            if reconcile:
+                account.reconciling = True
+
+        if notify:
+            self.on_budget(self)
+        if reconcile:
+            self._reconcile_in_background(client)
+
+    @property
+    def by_conversation(self) -> Dict[int, float]:
+        with self._lock:
+            return dict(self._by_conversation)
+
+    @property
+    def by_model(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._by_model)
+
+    @property
+    def by_key(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._by_key)
+
+    def get_remaining(self, client: "ChatNio" = None) -> Optional[float]:
+        """
+        Get the estimated remaining quota of an account
+        :param client: The client of the account (default: the current client)
+        :return: The estimate (None before the first reconciliation of the account)
+        """
+
+        client = client if client is not None else current_client()
+        with self._lock:
+            account = self._accounts.get(_account_key(client))
+            if account is None or account.server_quota is None:
+                return None
+            return account.server_quota - account.spent_since
+
+    def get_drift(self, client: "ChatNio" = None) -> float:
+        """
+        Get the difference between the estimated and the real remaining quota of an account at its last reconciliation
+        :param client: The client of the account (default: the current client)
+        """
+
+        client = client if client is not None else current_client()
+        with self._lock:
+            account = self._accounts.get(_account_key(client))
+            return account.drift if account is not None else 0.
+
+    @property
+    def remaining(self) -> Optional[float]:
+        """
+        The estimated remaining quota of the current client (None before the first reconciliation)
+        """
+
+        return self.get_remaining()
+
+    @property
+    def drift(self) -> float:
+        """
+        The difference between the estimated and the real remaining quota of the current client
+        at the last reconciliation
+        """
+
+        return self.get_drift()
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.total >= self.budget
+
+    def _reconcile_in_background(self, client: "ChatNio") -> None:
+        # never block the stream that recorded the spend
+        try:
+            import asyncio
+            asyncio.get_running_loop()
+        except RuntimeError:
+            threading.Thread(target=self._reconcile_quietly, args=(client,), daemon=True).start()
+        else:
+            asyncio.ensure_future(self._reconcile_quietly_async(client))
+
+    def _reconcile_quietly(self, client: "ChatNio") -> None:
+        try:
+            self.reconcile(client)
+        except Exception:
+            pass
+
+    async def _reconcile_quietly_async(self, client: "ChatNio") -> None:
+        try:
+            await self.reconcile_async(client)
+        except Exception:
+            pass
+
+    def _start_reconcile(self, client: "ChatNio") -> Tuple[_Account, float]:
+        with self._lock:
+            account = self._account(client)
+            account.reconciling = True
+            return account, account.spent_since
+
+    def _finish_reconcile(self, account: _Account, quota: Optional[float], spent: float) -> Optional[float]:
+        with self._lock:
+            # a failed request (no quota) waits for the next interval too, so a server down is not polled every response
+            account.reconciled_at = time.monotonic()
+            account.reconciling = False
+            if quota is None:
+                return None
+
+            if account.server_quota is not None:
+                account.drift = (account.server_quota - spent) - quota
+            # spend recorded while the request was in flight is kept (it may already be counted by the server)
+            account.spent_since -= spent
+            account.server_quota = quota
+            return quota
+
+    def reconcile(self, client: "ChatNio" = None) -> float:
+        """
+        Align the estimate of an account with its real quota (`get_quota`)
+        :param client: The client of the account (default: the current client)
+        :return: The real remaining quota
+        """
+
+        client = client if client is not None else current_client()
+        account, spent = self._start_reconcile(client)
+        try:
+            quota = client.get_quota()
+        except BaseException:
+            self._finish_reconcile(account, None, spent)
+            raise
+        return self._finish_reconcile(account, quota, spent)
+
+    async def reconcile_async(self, client: "ChatNio" = None) -> float:
+        """
+        Align the estimate of an account with its real quota (async version of `reconcile`)
+        :param client: The client of the account (default: the current client)
+        :return: The real remaining quota
+        """
+
+        client = client if client is not None else current_client()
+        account, spent = self._start_reconcile(client)
+        try:
+            quota = await client.get_quota_async()
+        except BaseException:
+            self._finish_reconcile(account, None, spent)
+            raise
+        return self._finish_reconcile(account, quota, spent)
+
+    def reset(self) -> None:
+        """
+        Forget the recorded spend (the last reconciliation is kept)
+        """
+
+        with self._lock:
+            self.total = 0.
+            self.responses = 0
+            self._by_conversation.clear()
+            self._by_model.clear()
+            self._by_key.clear()
+            self._notified = False
+
+    def __str__(self):
+        return (
+            f"QuotaMeter(total={self.total}, responses={self.responses}, "
+            f"remaining={self.remaining}, budget={self.budget})"
+        )
+
+    __repr__ = __str__
+
+
+_meter: Optional[QuotaMeter] = None
+
+
+def enable_quota_meter(
+    budget: float = None,
+    on_budget: Callable[[QuotaMeter], None] = None,
+    reconcile_interval: float = None,
+) -> QuotaMeter:
+    """
+    Meter the quota spent by every chat response in memory
+    :param budget: The spend that triggers `on_budget` (default: no budget)
+    :param on_budget: Called once, with the meter, when the spend reaches the budget
+    :param reconcile_interval: The seconds between two automatic reconciliations with `get_quota` (default: manual)
+    :return: The `meter` instance
+    """
+
+    global _meter
+    _meter = QuotaMeter(budget, on_budget, reconcile_interval)
+    return _meter
+
+
+def disable_quota_meter() -> None:
+    """
+    Stop metering the quota (the meter is dropped)
+    """
+
+    global _meter
+    _meter = None
+
+
+def get_quota_meter() -> Optional[QuotaMeter]:
+    """
+    Get the quota meter
+    :return: The `meter` instance (None if the meter is disabled)
+    """
+
+    return _meter
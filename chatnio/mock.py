@@ -0,0 +1,572 @@
+# Desc: Local Stand-in Server for Chat Nio (tests and benchmarks)
+import json
+import time
+import base64
+import struct
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit, parse_qs
+
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+def default_responder(message: str, model: str) -> str:
+    """
+    The default answer of the mock server: the question, repeated until it is 64 tokens long
+    """
+
+    words = message.split() or ["..."]
+    return " ".join(words[i % len(words)] for i in range(64))
+
+
+class MockServer(object):
+    """
+    A local stand-in for the Chat Nio API, serving the REST endpoints and the `/chat` websocket on one port
+
+    It runs its own event loop in a background thread, so both sync and async clients can use it.
+    It speaks http/1.1, and http/2 with prior knowledge (h2c) if the `h2` package is installed.
+
+    Attributes:
+        token (str): The only accepted api key
+        token_rate (float): The tokens streamed per second on `/chat` (None: as fast as possible)
+        chunk_size (int): The tokens per websocket frame
+        latency (float): The seconds to wait before every http response and before the first frame
+        stall_rate (float): The probability of a chat response stalling `stall_time` more seconds before its first frame
+        stall_time (float): The extra seconds of a stalled chat response (e.g. a slow upstream model)
+        error_rate (float): The probability of answering a http request with `error_status`
+        error_status (int): The status code of the injected http errors
+        drop_rate (float): The probability of dropping a websocket connection in the middle of a response
+        rate_limit (float): The requests (and websocket handshakes) allowed per second, the others get a 429
+            with a `Retry-After` (None: no limit)
+        quota_per_token (float): The quota charged per streamed token
+        responder (callable): Builds the answer text from (message, model)
+
+    e.g.
+    >>> with MockServer(token_rate=200, chunk_size=4) as server:
+    ...     chatnio.set_endpoint(server.url)
+    ...     chatnio.set_key(server.token)
+    ...     print(chatnio.get_quota())
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        token: str = "sk-mock",
+        token_rate: Optional[float] = None,
+        chunk_size: int = 1,
+        latency: float = 0.,
+        stall_rate: float = 0.,
+        stall_time: float = 1.,
+        error_rate: float = 0.,
+        error_status: int = 500,
+        drop_rate: float = 0.,
+        rate_limit: Optional[float] = None,
+        quota: float = 100.,
+        quota_per_token: float = 0.001,
+        responder: Callable[[str, str], str] = default_responder,
+        seed: Optional[int] = None,
+    ):
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be greater than 0")
+
+        self.host = host
+        self.port = port
+        self.token = token
+        self.token_rate = token_rate
+        self.chunk_size = chunk_size
+        self.latency = latency
+        self.stall_rate = stall_rate
+        self.stall_time = stall_time
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.rate_limit = rate_limit
+        self.quota = quota
+        self.quota_per_token = quota_per_token
+        self.responder = responder
+        self.random = random.Random(seed)
+
+        self.subscription = {"is_subscribed": False, "expired": 0, "level": 0}
+        self.package = {"cert": False, "teenager": False}
+        self.conversations: Dict[int, dict] = {}
+        self.requests = 0
+        self.connections = 0
+        self.disconnections = 0
+        self.http2_connections = 0
+        self.stalls = 0
+        self.throttled = 0
+        self._allowance = rate_limit or 0.
+        self._allowed_at = time.monotonic()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """
+        The endpoint of the server, pass it to `chatnio.set_endpoint`
+        """
+
+        return f"http://{self.host}:{self.port}"
+
+    def add_conversation(self, name: str, messages: list = None, _id: int = None) -> dict:
+        """
+        Add a conversation to the server
+        :param name: The name of the conversation
+        :param messages: The messages ({"role": ..., "content": ...}) of the conversation
+        :param _id: The id of the conversation (default: the next free id)
+        :return: The conversation data
+        """
+
+        with self._lock:
+            if _id is None:
+                _id = max(self.conversations, default=0) + 1
+            conversation = {"id": _id, "name": name, "message": list(messages or [])}
+            self.conversations[_id] = conversation
+            return conversation
+
+    # lifecycle
+
+    def start(self) -> "MockServer":
+        """
+        Start the server in a background thread
+        :return: The server itself
+        """
+
+        if self._thread is not None:
+            raise RuntimeError("Mock server is already running")
+
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="chatnio-mock-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop the server and wait for its thread
+        """
+
+        if self._thread is None:
+            return
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # http
+
+    def _authorized(self, headers: dict) -> bool:
+        return headers.get("authorization", "") == f"Bearer {self.token}"
+
+    def _throttle(self) -> Optional[float]:
+        # a token bucket of `rate_limit` per second (bursts of one second), returns the retry after if throttled
+        if not self.rate_limit:
+            return None
+
+        now = time.monotonic()
+        self._allowance = min(self.rate_limit, self._allowance + (now - self._allowed_at) * self.rate_limit)
+        self._allowed_at = now
+        if self._allowance >= 1:
+            self._allowance -= 1
+            return None
+
+        self.throttled += 1
+        return (1 - self._allowance) / self.rate_limit
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                if head.startswith(_HTTP2_PREFACE):
+                    await self._http2(reader, writer, head + await reader.readexactly(6))
+                    return
+
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+                websocket = headers.get("upgrade", "").lower() == "websocket"
+                if websocket:
+                    retry_after = self._throttle()
+                    if retry_after is None:
+                        await self._websocket(reader, writer, headers)
+                        return
+                    status, extra, content = _too_many_requests(retry_after)
+                else:
+                    status, extra, content = await self._respond(method, target, headers, body)
+
+                extra = "".join(f"{name}: {value}\r\n" for name, value in extra)
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(content)}\r\n{extra}"
+                    f"Connection: {'close' if websocket else 'keep-alive'}\r\n\r\n".encode() + content
+                )
+                await writer.drain()
+                if websocket:
+                    return
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method: str, target: str, headers: dict, body: bytes) -> tuple:
+        """
+        Answer a http request
+        :return: (status, extra headers, content)
+        """
+
+        retry_after = self._throttle()
+        if retry_after is not None:
+            return _too_many_requests(retry_after)
+
+        status, payload = await self._route(method, target, headers, body)
+        content = json.dumps(payload).encode()
+        if method != "GET" or status != 200:
+            return status, [], content
+
+        etag = '"' + hashlib.sha1(content).hexdigest()[:16] + '"'
+        if headers.get("if-none-match") == etag:
+            status, content = 304, b""
+        return status, [("ETag", etag)], content
+
+    async def _http2(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, preface: bytes) -> None:
+        # http/2 with prior knowledge (h2c), only with the `h2` package installed
+        import h2.config
+        import h2.events
+        import h2.connection
+
+        config = h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        connection = h2.connection.H2Connection(config)
+        connection.initiate_connection()
+        self.http2_connections += 1
+
+        requests: Dict[int, tuple] = {}
+        window = asyncio.Event()
+        tasks = set()
+
+        async def respond(stream_id: int, headers: dict, body: bytes) -> None:
+            status, extra, content = await self._respond(headers[":method"], headers[":path"], headers, body)
+            connection.send_headers(stream_id, [
+                (":status", str(status)),
+                ("content-type", "application/json"),
+                ("content-length", str(len(content))),
+            ] + [(name.lower(), value) for name, value in extra], end_stream=not content)
+
+            while content:
+                size = min(connection.local_flow_control_window(stream_id), connection.max_outbound_frame_size)
+                if size <= 0:
+                    window.clear()
+                    await window.wait()
+                    continue
+                chunk, content = content[:size], content[size:]
+                connection.send_data(stream_id, chunk, end_stream=not content)
+                writer.write(connection.data_to_send())
+            writer.write(connection.data_to_send())
+
+        data = preface
+        try:
+            while data:
+                for event in connection.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        requests[event.stream_id] = ({name.lower(): value for name, value in event.headers}, [])
+                    elif isinstance(event, h2.events.DataReceived):
+                        requests[event.stream_id][1].append(event.data)
+                        connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, h2.events.StreamEnded):
+                        headers, body = requests.pop(event.stream_id)
+                        task = asyncio.ensure_future(respond(event.stream_id, headers, b"".join(body)))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                    elif isinstance(event, h2.events.WindowUpdated):
+                        window.set()
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        return
+
+                writer.write(connection.data_to_send())
+                await writer.drain()
+                data = await reader.read(65536)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _route(self, method: str, target: str, headers: dict, body: bytes) -> tuple:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self.error_status, {"status": False, "message": "injected error"}
+
+        url = urlsplit(target)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        route = (method, url.path)
+        if route not in _ROUTES:
+            return 404, {"status": False, "message": "not found"}
+        if not self._authorized(headers):
+            return 200, {"status": False, "message": "unauthorized"}
+
+        data = json.loads(body) if body else {}
+        with self._lock:
+            return 200, _ROUTES[route](self, query, data)
+
+    def _get_quota(self, query: dict, data: dict) -> dict:
+        return {"status": True, "quota": self.quota}
+
+    def _buy(self, query: dict, data: dict) -> dict:
+        self.quota += float(data.get("quota", 0))
+        return {"status": True}
+
+    def _get_subscription(self, query: dict, data: dict) -> dict:
+        return {"status": True, **self.subscription}
+
+    def _subscribe(self, query: dict, data: dict) -> dict:
+        self.subscription = {
+            "is_subscribed": True,
+            "expired": self.subscription["expired"] + 30 * int(data.get("month", 0)),
+            "level": int(data.get("level", 1)),
+        }
+        return {"status": True}
+
+    def _get_package(self, query: dict, data: dict) -> dict:
+        return {"status": True, "data": self.package}
+
+    def _list_conversations(self, query: dict, data: dict) -> dict:
+        return {
+            "status": True,
+            "data": [{"id": item["id"], "name": item["name"]} for item in self.conversations.values()],
+        }
+
+    def _load_conversation(self, query: dict, data: dict) -> dict:
+        conversation = self.conversations.get(int(query.get("id", -1)))
+        if conversation is None:
+            return {"status": False, "message": "conversation not found"}
+        return {"status": True, "data": conversation}
+
+    def _delete_conversation(self, query: dict, data: dict) -> dict:
+        return {"status": self.conversations.pop(int(query.get("id", -1)), None) is not None}
+
+    # websocket
+
+    async def _websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, headers: dict) -> None:
+        accept = base64.b64encode(
+            hashlib.sha1((headers["sec-websocket-key"] + _WEBSOCKET_GUID).encode()).digest()
+        ).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        await writer.drain()
+        self.connections += 1
+        try:
+            await self._serve_chat(reader, writer)
+        finally:
+            self.disconnections += 1
+
+    async def _serve_chat(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        conversation = None
+        authenticated = None
+        while True:
+            message = await _read_message(reader, writer)
+            if message is None:
+                return
+
+            data = json.loads(message)
+            if authenticated is None:
+                # handshake: {"id": ..., "token": ...}
+                authenticated = data.get("token") == self.token
+                conversation = self.conversations.get(data.get("id", -1))
+                continue
+
+            if data.get("type") != "chat":
+                continue
+
+            if not authenticated:
+                await _write_frame(writer, 0x1, json.dumps({
+                    "message": "authentication failed", "keyword": "", "quota": 0, "end": True,
+                }).encode())
+                continue
+
+            if conversation is None:
+                conversation = self.add_conversation(data.get("message", "")[:50])
+
+            if not await self._stream(writer, conversation, data.get("message", ""), data.get("model", "")):
+                return
+
+    async def _stream(self, writer: asyncio.StreamWriter, conversation: dict, message: str, model: str) -> bool:
+        answer = self.responder(message, model)
+        tokens = answer.split(" ")
+        delay = self.chunk_size / self.token_rate if self.token_rate else 0.
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.stall_rate and self.random.random() < self.stall_rate:
+            self.stalls += 1
+            await asyncio.sleep(self.stall_time)
+
+        drop_at = -1
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            drop_at = self.random.randrange(len(tokens))
+
+        for start in range(0, len(tokens), self.chunk_size):
+            if 0 <= drop_at < start + self.chunk_size:
+                writer.transport.abort()
+                return False
+
+            chunk = " ".join(tokens[start:start + self.chunk_size])
+            if start + self.chunk_size < len(tokens):
+                chunk += " "
+            await _write_frame(writer, 0x1, json.dumps({
+                "message": chunk, "keyword": "", "quota": 0, "end": False,
+            }).encode())
+            if delay:
+                await asyncio.sleep(delay)
+
+        cost = round(len(tokens) * self.quota_per_token, 6)
+        with self._lock:
+            self.quota -= cost
+            conversation["message"].append({"role": "user", "content": message})
+            conversation["message"].append({"role": "assistant", "content": answer})
+
+        await _write_frame(writer, 0x1, json.dumps({
+            "message": "", "keyword": "", "quota": cost, "end": True,
+        }).encode())
+        return True
+
+
+_HTTP2_PREFACE = b"PRI * HTTP/2.0\r\n\r\n"
+
+
+def _too_many_requests(retry_after: float) -> tuple:
+    content = json.dumps({"status": False, "message": "too many requests"}).encode()
+    return 429, [("Retry-After", f"{retry_after:.3f}")], content
+
+
+_ROUTES = {
+    ("GET", "/quota"): MockServer._get_quota,
+    ("POST", "/buy"): MockServer._buy,
+    ("GET", "/subscription"): MockServer._get_subscription,
+    ("POST", "/subscribe"): MockServer._subscribe,
+    ("GET", "/package"): MockServer._get_package,
+    ("GET", "/conversation/list"): MockServer._list_conversations,
+    ("GET", "/conversation/load"): MockServer._load_conversation,
+    ("GET", "/conversation/delete"): MockServer._delete_conversation,
+}
+
+
+async def _write_frame(writer: asyncio.StreamWriter, opcode: int, payload: bytes) -> None:
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+
+    writer.write(header + payload)
+    await writer.drain()
+
+
+async def _read_message(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[str]:
+    """
+    Read the next text or binary message, answering pings and closing handshakes on the way
+    :return: The message, None if the connection was closed
+    """
+
+    fragments = []
+    try:
+        while True:
+            first, second = await reader.readexactly(2)
+            fin, opcode = first & 0x80, first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length, = struct.unpack("!H", await reader.readexactly(2))
+            elif length == 127:
+                length, = struct.unpack("!Q", await reader.readexactly(8))
+
+            mask = await reader.readexactly(4) if second & 0x80 else b""
+            payload = await reader.readexactly(length)
+            if mask:
+                key = (mask * (length // 4 + 1))[:length]
+                payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+
+            if opcode == 0x8:
+                await _write_frame(writer, 0x8, payload[:2])
+                return None
+            if opcode == 0x9:
+                await _write_frame(writer, 0xA, payload)
+                continue
+            if opcode == 0xA:
+                continue
+
+            fragments.append(payload)
+            if fin:
+                return b"".join(fragments).decode()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+def serve(host: str = "127.0.0.1", port: int = 8094, **options) -> None:
+    """
+    Run a mock server in the foreground until interrupted (`python -m chatnio.mock`)
+    """
+
+    server = MockServer(host, port, **options).start()
+    print(f"Chat Nio mock server running at {server.url} (token: {server.token})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    serve()
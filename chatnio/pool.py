@@ -0,0 +1,271 @@
+# Desc: Websocket Connection Pool for Chat Nio
+import time
+import socket
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from .codec import Codec, get_codec
+from .ratelimit import connect_limited
+
+Key = Tuple[str, str, int]
+
+
+def is_open(connection) -> bool:
+    """
+    Check the real state of a websocket connection (not only whether it exists)
+    :param connection: The websocket connection
+    :return: True if the connection is open
+    """
+
+    if connection is None:
+        return False
+
+    state = getattr(connection, "state", None)
+    return getattr(state, "name", "OPEN") == "OPEN"
+
+
+def abort(connection) -> None:
+    """
+    Drop the socket of a websocket connection, without the closing handshake
+    (the server sees the disconnect even if the event loop of the connection never runs again)
+    :param connection: The websocket connection
+    """
+
+    transport = getattr(connection, "transport", None)
+    if transport is None:
+        return
+
+    sock = transport.get_extra_info("socket")
+    try:
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    try:
+        transport.abort()
+    except Exception:
+        # the loop of the connection is closed, the socket is released with the transport
+        pass
+
+
+_raw_recv: Dict[type, bool] = {}
+
+
+def supports_raw_recv(connection) -> bool:
+    """
+    Check if the connection can return text frames as raw bytes (`recv(decode=False)`, websockets >= 13)
+    :param connection: The websocket connection
+    :return: True if raw frames are supported
+    """
+
+    kind = type(connection)
+    if kind not in _raw_recv:
+        import inspect
+        try:
+            _raw_recv[kind] = "decode" in inspect.signature(connection.recv).parameters
+        except (TypeError, ValueError):
+            _raw_recv[kind] = False
+    return _raw_recv[kind]
+
+
+async def open_connection(uri: str, token: str, conversation_id: int, codec: Codec = None):
+    """
+    Open a websocket connection and send the authentication handshake
+    :param uri: The chat url of the endpoint
+    :param token: The token to authenticate with
+    :param conversation_id: The id of the conversation to connect to
+    :param codec: The json codec of the handshake (default: the default codec)
+    :return: The authenticated websocket connection
+    """
+
+    import websockets
+    connection = await connect_limited(uri, token, lambda: websockets.connect(uri))
+    await connection.send((codec or get_codec()).dumps({
+        "id": conversation_id,
+        "token": token,
+    }))
+    return connection
+
+
+class ConnectionPool(object):
+    """
+    A pool of warm, already authenticated chat connections
+
+    Connections are keyed by (endpoint, token, conversation id). A pool belongs to the event loop
+    its connections were opened on.
+
+    Attributes:
+        max_size (int): The maximum number of idle connections kept in the pool
+        idle_timeout (float): The seconds an idle connection is kept before it is dropped
+        health_check (bool): Whether to ping idle connections before handing them out
+        ping_timeout (float): The seconds to wait for the pong of the health check
+
+    e.g.
+    >>> pool = ConnectionPool(max_size=16)
+    >>> chat = await new_chat(42, pool=pool)
+    >>> async for partial in chat.ask("hi"):  # the connection goes back to the pool after the `end` frame
+    ...     print(partial.message, end="")
+    """
+
+    def __init__(
+        self,
+        max_size: int = 8,
+        idle_timeout: float = 60.,
+        health_check: bool = False,
+        ping_timeout: float = 5.,
+    ):
+        if max_size < 0:
+            raise ValueError("Max size must not be negative")
+
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.ping_timeout = ping_timeout
+
+        # key -> [(connection, released at)], the most recently released connection is the last one
+        self._idle: Dict[Key, List[tuple]] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self) -> int:
+        """
+        The number of idle connections in the pool
+        """
+
+        return self._size
+
+    def _discard(self, connection) -> None:
+        if not is_open(connection):
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # released from synchronous code, no closing handshake can run
+            abort(connection)
+        else:
+            asyncio.ensure_future(connection.close())
+
+    async def _healthy(self, connection) -> bool:
+        if not is_open(connection):
+            return False
+        if not self.health_check:
+            return True
+
+        try:
+            waiter = await connection.ping()
+            await asyncio.wait_for(waiter, self.ping_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def acquire(self, uri: str, token: str, conversation_id: int = -1, codec: Codec = None):
+        """
+        Get a connection from the pool, a new one is opened if there is no idle connection
+        :param uri: The chat url of the endpoint
+        :param token: The token to authenticate with
+        :param conversation_id: The id of the conversation to connect to (default: -1)
+        :param codec: The json codec of the handshake of a new connection (default: the default codec)
+        :return: The authenticated websocket connection
+        """
+
+        key = (uri, token, conversation_id)
+        idle = self._idle.get(key)
+        while idle:
+            connection, released_at = idle.pop()
+            self._size -= 1
+            if not idle:
+                del self._idle[key]
+
+            if time.monotonic() - released_at > self.idle_timeout or not await self._healthy(connection):
+                self._discard(connection)
+                idle = self._idle.get(key)
+                continue
+
+            self.hits += 1
+            return connection
+
+        self.misses += 1
+        return await open_connection(uri, token, conversation_id, codec)
+
+    def release(self, uri: str, token: str, conversation_id: int, connection, reusable: bool = True) -> None:
+        """
+        Give a connection back to the pool, it must not be in the middle of a response
+        :param uri: The chat url of the endpoint
+        :param token: The token the connection was authenticated with
+        :param conversation_id: The id of the conversation of the connection
+        :param connection: The websocket connection
+        :param reusable: Whether the connection can be handed out again (closed if False)
+        """
+
+        if not reusable or self.max_size == 0 or not is_open(connection):
+            self._discard(connection)
+            return
+
+        key = (uri, token, conversation_id)
+        self._idle.setdefault(key, []).append((connection, time.monotonic()))
+        self._idle.move_to_end(key)
+        self._size += 1
+        self._evict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in list(self._idle):
+            fresh, expired = [], []
+            for item in self._idle[key]:
+                (fresh if now - item[1] <= self.idle_timeout else expired).append(item)
+
+            for connection, _ in expired:
+                self._discard(connection)
+            self._size -= len(expired)
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+
+        # drop the least recently used keys first
+        while self._size > self.max_size:
+            key = next(iter(self._idle))
+            connection, _ = self._idle[key].pop(0)
+            self._size -= 1
+            if not self._idle[key]:
+                del self._idle[key]
+            self._discard(connection)
+
+    async def warm(
+        self, uri: str, token: str, conversation_id: int = -1, count: int = 1, codec: Codec = None,
+    ) -> None:
+        """
+        Open connections ahead of time
+        :param uri: The chat url of the endpoint
+        :param token: The token to authenticate with
+        :param conversation_id: The id of the conversation to connect to (default: -1)
+        :param count: The number of connections to open (default: 1)
+        :param codec: The json codec of the handshakes (default: the default codec)
+        """
+
+        connections = await asyncio.gather(*[
+            open_connection(uri, token, conversation_id, codec) for _ in range(count)
+        ])
+        for connection in connections:
+            self.release(uri, token, conversation_id, connection)
+
+    async def close(self) -> None:
+        """
+        Close every idle connection of the pool
+        """
+
+        connections = [connection for idle in self._idle.values() for connection, _ in idle]
+        self._idle.clear()
+        self._size = 0
+        await asyncio.gather(*[connection.close() for connection in connections], return_exceptions=True)
+
+    def __len__(self):
+        return self._size
+
+    def __str__(self):
+        return f"ConnectionPool(size={self._size}, max_size={self.max_size}, hits={self.hits}, misses={self.misses})"
+
+    __repr__ = __str__
@@ -1,6 +1,14 @@
 # Desc: Quota Operations for Chat Nio
+import time
+import threading
+import contextvars
+from concurrent.futures import Future
+from typing import Dict, Optional
+from weakref import WeakKeyDictionary
+
 from .auth import authenticate_require, is_authenticated
-from .globals import client, AuthenticationError
+from .globals import get_client, get_async_client, current_client, AuthenticationError
+from .codec import loads, dumps_bytes
 
 
 class Subscription(object):
@@ -12,8 +20,10 @@ class Subscription(object):
         expired (int): The expiration date of the subscription (days)
     """
 
-    is_subscribed = False
-    expired = 0
+    __slots__ = ("is_subscribed", "expired")
+
+    is_subscribed: bool
+    expired: int
 
     def __init__(self, data: dict):
         self.is_subscribed = bool(data["is_subscribed"])
@@ -40,10 +50,29 @@ def get_quota() -> float:
     if not is_authenticated():
         return 0.
 
-    resp = client.get("/quota")
+    resp = get_client().get("/quota")
     resp.raise_for_status()
 
-    data = resp.json()
+    data = loads(resp.content)
+    if not data["status"]:
+        raise AuthenticationError(data["message"])
+
+    return float(data["quota"])
+
+
+async def get_quota_async() -> float:
+    """
+    Get the quota for the Chat Nio API (async version of `get_quota`)
+    :return: The quota for the Chat Nio API
+    """
+
+    if not is_authenticated():
+        return 0.
+
+    resp = await get_async_client().get("/quota")
+    resp.raise_for_status()
+
+    data = loads(resp.content)
     if not data["status"]:
         raise AuthenticationError(data["message"])
 
@@ -62,10 +91,33 @@ def buy_quota(quota: int) -> bool:
     if quota <= 0:
         raise ValueError("Quota must be greater than 0")
 
-    resp = client.post("/buy", json={"quota": quota})
+    resp = get_client().post("/buy", content=dumps_bytes({"quota": quota}))
+    resp.raise_for_status()
+
+    data = loads(resp.content)
+    if data["status"]:
+        invalidate_account_status()
+    return bool(data["status"])
+
+
+async def buy_quota_async(quota: int) -> bool:
+    """
+    Buy quota for the Chat Nio API (async version of `buy_quota`)
+    :param quota: The quota to buy for the Chat Nio API
+    :return: The status of the purchase (True if successful)
+    """
+
+    authenticate_require()
+
+    if quota <= 0:
+        raise ValueError("Quota must be greater than 0")
+
+    resp = await get_async_client().post("/buy", content=dumps_bytes({"quota": quota}))
     resp.raise_for_status()
 
-    data = resp.json()
+    data = loads(resp.content)
+    if data["status"]:
+        invalidate_account_status()
     return bool(data["status"])
 
 
@@ -78,10 +130,29 @@ def get_subscription() -> Subscription:
     if not is_authenticated():
         return Subscription({"is_subscribed": False, "expired": 0})
 
-    resp = client.get("/subscription")
+    resp = get_client().get("/subscription")
+    resp.raise_for_status()
+
+    data = loads(resp.content)
+    if not data["status"]:
+        raise AuthenticationError(data["message"])
+
+    return Subscription(data)
+
+
+async def get_subscription_async() -> Subscription:
+    """
+    Get the subscription status for the Chat Nio API (async version of `get_subscription`)
+    :return: The `subscription` instance
+    """
+
+    if not is_authenticated():
+        return Subscription({"is_subscribed": False, "expired": 0})
+
+    resp = await get_async_client().get("/subscription")
     resp.raise_for_status()
 
-    data = resp.json()
+    data = loads(resp.content)
     if not data["status"]:
         raise AuthenticationError(data["message"])
 
@@ -98,10 +169,31 @@ def buy_subscription(level: int, month: int) -> bool:
 
     if month <= 0:
         raise ValueError("Month must be greater than 0")
-    resp = client.post("/subscribe", json={"level": level, "month": month})
+    resp = get_client().post("/subscribe", content=dumps_bytes({"level": level, "month": month}))
     resp.raise_for_status()
 
-    data = resp.json()
+    data = loads(resp.content)
+    if data["status"]:
+        invalidate_account_status()
+    return bool(data["status"])
+
+
+async def buy_subscription_async(level: int, month: int) -> bool:
+    """
+    Buy subscription for the Chat Nio API (async version of `buy_subscription`)
+    :return: The status of the purchase (True if successful)
+    """
+
+    authenticate_require()
+
+    if month <= 0:
+        raise ValueError("Month must be greater than 0")
+    resp = await get_async_client().post("/subscribe", content=dumps_bytes({"level": level, "month": month}))
+    resp.raise_for_status()
+
+    data = loads(resp.content)
+    if data["status"]:
+        invalidate_account_status()
     return bool(data["status"])
 
 
@@ -121,11 +213,208 @@ def get_package() -> dict:
     if not is_authenticated():
         return {"cert": False, "teenager": False}
 
-    resp = client.get("/package")
+    resp = get_client().get("/package")
+    resp.raise_for_status()
+
+    data = loads(resp.content)
+    if not data["status"]:
+        raise AuthenticationError(data["message"])
+
+    return data["data"]
+
+
+async def get_package_async() -> dict:
+    """
+    Get the package for the Chat Nio API (async version of `get_package`)
+    :return: The package for the Chat Nio API
+    :rtype: dict
+    """
+
+    if not is_authenticated():
+        return {"cert": False, "teenager": False}
+
+    resp = await get_async_client().get("/package")
     resp.raise_for_status()
 
-    data = resp.json()
+    data = loads(resp.content)
     if not data["status"]:
         raise AuthenticationError(data["message"])
 
     return data["data"]
+
+
+class AccountStatus(object):
+    """
+    A snapshot of the account: quota, subscription and package, fetched together
+
+    Attributes:
+        quota (float): The quota of the user
+        subscription (Subscription): The subscription status of the user
+        package (dict): The package of the user
+        fetched_at (float): The time of the fetch (`time.monotonic`)
+    """
+
+    __slots__ = ("quota", "subscription", "package", "fetched_at", "_key")
+
+    def __init__(self, quota: float, subscription: Subscription, package: dict, key: tuple = None):
+        self.quota = quota
+        self.subscription = subscription
+        self.package = package
+        self.fetched_at = time.monotonic()
+        self._key = key
+
+    @property
+    def age(self) -> float:
+        """
+        The seconds since the snapshot was fetched
+        """
+
+        return time.monotonic() - self.fetched_at
+
+    def __str__(self):
+        return f"AccountStatus(quota={self.quota}, subscription={self.subscription}, package={self.package})"
+
+    __repr__ = __str__
+
+
+# the cached status of every account, by (key, endpoint)
+_statuses: Dict[tuple, AccountStatus] = {}
+# bumped by every invalidation of an account: a fetch that started before a purchase is neither cached
+# nor joined by the callers that come after it
+_generations: Dict[tuple, int] = {}
+_status_lock = threading.Lock()
+
+# the fetches in flight by account, (generation, future), shared by concurrent callers
+_flights: Dict[tuple, tuple] = {}
+_async_flights: "WeakKeyDictionary" = WeakKeyDictionary()  # event loop -> {account: fetch in flight}
+
+
+def _account_key() -> tuple:
+    client = current_client()
+    return client.token, client.endpoint
+
+
+def _cached_status(key: tuple, max_age: float) -> Optional[AccountStatus]:
+    status = _statuses.get(key)
+    if status is not None and status.age <= max_age:
+        return status
+    return None
+
+
+def _store_status(status: AccountStatus, generation: int) -> None:
+    with _status_lock:
+        if generation == _generations.get(status._key, 0):
+            _statuses[status._key] = status
+
+
+def _current_flight(flights: dict, key: tuple) -> Optional[tuple]:
+    # a fetch started before the last invalidation of the account is not shared anymore
+    flight = flights.get(key)
+    if flight is not None and flight[0] == _generations.get(key, 0):
+        return flight
+    return None
+
+
+def invalidate_account_status() -> None:
+    """
+    Drop the cached status of the current account (done by a successful `buy_quota` or `buy_subscription`)
+    """
+
+    key = _account_key()
+    with _status_lock:
+        _statuses.pop(key, None)
+        _generations[key] = _generations.get(key, 0) + 1
+
+
+def _fetch_account_status(key: tuple) -> AccountStatus:
+    # the workers of the client run with the context of the caller (e.g. the current `ChatNio` client)
+    executor = current_client().get_executor()
+    subscription = executor.submit(contextvars.copy_context().run, get_subscription)
+    package = executor.submit(contextvars.copy_context().run, get_package)
+    return AccountStatus(get_quota(), subscription.result(), package.result(), key)
+
+
+def get_account_status(max_age: float = 5.) -> AccountStatus:
+    """
+    Get the quota, subscription and package of the account, fetched concurrently and cached
+
+    Concurrent callers share a single fetch. The cache is kept per key and endpoint, and dropped by purchases.
+
+    e.g.
+    >>> status = get_account_status()
+    >>> if status.quota > 0 and status.subscription:
+    ...     print(status.package)
+
+    :param max_age: The maximum age in seconds of a cached status (default: 5, 0 to always fetch)
+    :return: The `account status` instance
+    """
+
+    key = _account_key()
+    with _status_lock:
+        status = _cached_status(key, max_age)
+        if status is not None:
+            return status
+
+        flight = _current_flight(_flights, key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = (_generations.get(key, 0), Future())
+
+    if not leader:
+        return flight[1].result()
+
+    generation, future = flight
+    try:
+        status = _fetch_account_status(key)
+        _store_status(status, generation)
+        future.set_result(status)
+        return status
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _status_lock:
+            if _flights.get(key) is flight:
+                del _flights[key]
+
+
+async def _fetch_account_status_async(key: tuple) -> AccountStatus:
+    import asyncio
+    quota, subscription, package = await asyncio.gather(
+        get_quota_async(), get_subscription_async(), get_package_async(),
+    )
+    return AccountStatus(quota, subscription, package, key)
+
+
+async def get_account_status_async(max_age: float = 5.) -> AccountStatus:
+    """
+    Get the quota, subscription and package of the account (async version of `get_account_status`)
+    :param max_age: The maximum age in seconds of a cached status (default: 5, 0 to always fetch)
+    :return: The `account status` instance
+    """
+
+    import asyncio
+
+    key = _account_key()
+    status = _cached_status(key, max_age)
+    if status is not None:
+        return status
+
+    loop = asyncio.get_event_loop()
+    flights = _async_flights.setdefault(loop, {})
+    flight = _current_flight(flights, key)
+    if flight is None:
+        generation = _generations.get(key, 0)
+        task = asyncio.ensure_future(_fetch_account_status_async(key))
+        flight = flights[key] = (generation, task)
+
+        def land(task: "asyncio.Future") -> None:
+            if flights.get(key) is flight:
+                del flights[key]
+            if not task.cancelled() and task.exception() is None:
+                _store_status(task.result(), generation)
+
+        task.add_done_callback(land)
+
+    # a cancelled caller does not cancel the fetch of the others
+    return await asyncio.shield(flight[1])
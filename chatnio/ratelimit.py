@@ -0,0 +1,411 @@
+# Desc: Adaptive Rate Limiting for Chat Nio (token buckets per endpoint and key, 429 handling)
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+_SCHEMES = {"ws": "http", "wss": "https"}
+# the seconds over which the rates are measured, and between two slow downs
+_WINDOW = 0.5
+
+
+def origin(url: str) -> str:
+    """
+    The endpoint of a url, shared by its http and websocket urls (e.g. "https://api.chatnio.net")
+    """
+
+    parts = urlsplit(url)
+    return f"{_SCHEMES.get(parts.scheme, parts.scheme)}://{parts.netloc}"
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a `Retry-After` header, in seconds or as an http date
+    :return: The seconds to wait (None if the header is missing or invalid)
+    """
+
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class TokenBucket(object):
+    """
+    A token bucket whose rate adapts to the throttling of the server (additive increase, multiplicative decrease)
+
+    Calls are spread at `rate` per second, with bursts of up to `burst` calls. Every successful call raises
+    the rate a little (by `increase` calls per second, per second of traffic). A throttled call brings the rate
+    down to `decrease` times the rate actually sent, but not below 90% of the rate of the successful calls
+    (what the server lets through), and holds the bucket for the time the server asked for (`Retry-After`).
+    The rate goes down at most once per half second, the other throttled calls only hold the bucket.
+    Without `on_success` / `on_throttled` feedback the rate stays fixed (e.g. `TokenBucket(50, burst=1)` spreads
+    calls evenly, as the `rate` of the bulk operations does).
+
+    Attributes:
+        rate (float): The current rate, in calls per second
+        burst (float): The maximum number of calls at once
+        min_rate (float): The lowest rate after throttling
+        max_rate (float): The highest rate reached by the increases (default: no ceiling)
+        throttled (int): The number of throttled calls
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.,
+        burst: float = None,
+        min_rate: float = 0.1,
+        max_rate: float = None,
+        increase: float = 1.,
+        decrease: float = 0.7,
+    ):
+        if rate <= 0:
+            raise ValueError("Rate must be greater than 0")
+
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.throttled = 0
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._decreased = 0.
+        # the rates of the calls sent and of the successful calls, measured over windows of `_WINDOW` seconds
+        self._sent_rate: Optional[float] = None
+        self._ok_rate = 0.
+        self._window = self._updated
+        self._window_calls = 0
+        self._window_ok = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _measure(self, now: float) -> None:
+        elapsed = now - self._window
+        if elapsed >= _WINDOW:
+            rate = self._window_calls / elapsed
+            self._sent_rate = rate if self._sent_rate is None else (rate + self._sent_rate) / 2
+            self._ok_rate = (self._window_ok / elapsed + self._ok_rate) / 2
+            self._window, self._window_calls, self._window_ok = now, 0, 0
+
+    def _reserve(self) -> float:
+        # take a token (going into debt if there is none), return the seconds to wait for it
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._measure(now)
+            self._window_calls += 1
+            self._tokens -= 1
+            return 0. if self._tokens >= 0 else -self._tokens / self.rate
+
+    def wait(self) -> None:
+        """
+        Block until the next call is allowed
+        """
+
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self) -> None:
+        """
+        Wait until the next call is allowed (async version of `wait`)
+        """
+
+        delay = self._reserve()
+        if delay > 0:
+            import asyncio
+            await asyncio.sleep(delay)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._window_ok += 1
+            rate = self.rate + self.increase / self.rate
+            self.rate = rate if self.max_rate is None else min(rate, self.max_rate)
+
+    def on_throttled(self, delay: float, sent: float = None) -> None:
+        """
+        Slow down after a throttled call
+        :param delay: The seconds before the next call (e.g. the `Retry-After` of the server)
+        :param sent: The time the call was sent (`time.monotonic`, default: now)
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            self._refill(now)
+            # slow down once per window: the calls sent before it were throttled at the old rate
+            if (sent is None or sent >= self._decreased) and now - self._decreased >= _WINDOW:
+                rate = self.rate if self._sent_rate is None else min(self.rate, self._sent_rate)
+                rate = max(rate * self.decrease, self._ok_rate * 0.9, self.min_rate)
+                self.rate = min(rate, self.rate)
+                self._decreased = now
+            # a debt worth `delay` holds every call of the bucket, then they are spread at the new rate
+            self._tokens = min(self._tokens, -delay * self.rate)
+
+    def __str__(self):
+        return f"TokenBucket(rate={self.rate:.2f}, burst={self.burst}, throttled={self.throttled})"
+
+    __repr__ = __str__
+
+
+class AdaptiveRateLimiter(object):
+    """
+    The rate limiter of the http requests and chat connections: a `TokenBucket` per endpoint and key,
+    and retries of the throttled calls (429, or 503 with a `Retry-After`)
+
+    A throttled call is retried after the `Retry-After` of the server (with up to 20% jitter),
+    or after a jittered exponential backoff if the server gave none. The last throttled answer is returned
+    (or raised) once `max_retries` retries were spent.
+
+    Attributes:
+        max_retries (int): The maximum number of retries of a throttled call
+        base_delay (float): The first backoff when the server gives no `Retry-After`
+        max_delay (float): The longest backoff
+        retries (int): The number of retried calls
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.,
+        burst: float = None,
+        min_rate: float = 0.1,
+        max_rate: float = None,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.,
+    ):
+        """
+        :param rate: The starting rate of every bucket, in calls per second (default: 10)
+        :param burst: The maximum number of calls at once (default: the rate)
+        :param min_rate: The lowest rate after throttling (default: 0.1)
+        :param max_rate: The highest rate of a bucket (default: no ceiling, it keeps probing the server)
+        :param max_retries: The maximum number of retries of a throttled call (default: 5)
+        :param base_delay: The first backoff when the server gives no `Retry-After` (default: 0.5)
+        :param max_delay: The longest backoff (default: 30)
+        """
+
+        self._options = dict(rate=rate, burst=burst, min_rate=min_rate, max_rate=max_rate)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str, token: str) -> TokenBucket:
+        """
+        Get the bucket of an endpoint and key (created on first use)
+        :param url: Any url of the endpoint (http or websocket)
+        :param token: The key
+        """
+
+        key = (origin(url), token or "anonymous")
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(**self._options)
+        return bucket
+
+    @property
+    def buckets(self) -> Dict[Tuple[str, str], TokenBucket]:
+        with self._lock:
+            return dict(self._buckets)
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        """
+        The seconds to wait before retrying a throttled call
+        :param attempt: The number of the retry, from 0
+        :param retry_after: The `Retry-After` of the server (None if it gave none)
+        """
+
+        if retry_after is not None:
+            return retry_after * random.uniform(1., 1.2)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _throttled(self, bucket: TokenBucket, sent: float, attempt: int, retry_after: Optional[float]) -> None:
+        bucket.on_throttled(self.retry_delay(attempt, retry_after), sent)
+        with self._lock:
+            self.retries += 1
+
+    def should_retry(self, status: int, retry_after: Optional[float], attempt: int) -> bool:
+        throttled = status == 429 or (status == 503 and retry_after is not None)
+        return throttled and attempt < self.max_retries
+
+    def send(self, url: str, token: str, func: Callable[[], Any], status: Callable[[Any], tuple]) -> Any:
+        """
+        Make a call through the bucket of its endpoint and key, retrying it while it is throttled
+        :param url: The url of the call
+        :param token: The key of the call
+        :param func: The call
+        :param status: Gives (status code, retry after) of the result of the call
+        :return: The result of the last attempt
+        """
+
+        bucket = self.bucket(url, token)
+        attempt = 0
+        while True:
+            bucket.wait()
+            sent = time.monotonic()
+            result = func()
+            code, retry_after = status(result)
+            if not self.should_retry(code, retry_after, attempt):
+                if code != 429:
+                    bucket.on_success()
+                return result
+
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+            self._throttled(bucket, sent, attempt, retry_after)
+            attempt += 1
+
+    async def send_async(
+        self, url: str, token: str, func: Callable[[], Awaitable], status: Callable[[Any], tuple],
+    ) -> Any:
+        """
+        Make a call through the bucket of its endpoint and key (async version of `send`)
+        """
+
+        bucket = self.bucket(url, token)
+        attempt = 0
+        while True:
+            await bucket.wait_async()
+            sent = time.monotonic()
+            result = await func()
+            code, retry_after = status(result)
+            if not self.should_retry(code, retry_after, attempt):
+                if code != 429:
+                    bucket.on_success()
+                return result
+
+            close = getattr(result, "aclose", None)
+            if close is not None:
+                await close()
+            self._throttled(bucket, sent, attempt, retry_after)
+            attempt += 1
+
+    async def connect_async(self, url: str, token: str, connect: Callable[[], Awaitable]) -> Any:
+        """
+        Open a connection through the bucket of its endpoint and key, retrying while the handshake is throttled
+        :param url: The url of the connection
+        :param token: The key of the connection
+        :param connect: Opens the connection
+        :return: The connection
+        """
+
+        bucket = self.bucket(url, token)
+        attempt = 0
+        while True:
+            await bucket.wait_async()
+            sent = time.monotonic()
+            try:
+                connection = await connect()
+            except Exception as e:
+                code, retry_after = handshake_status(e)
+                if not self.should_retry(code, retry_after, attempt):
+                    raise
+                self._throttled(bucket, sent, attempt, retry_after)
+                attempt += 1
+                continue
+
+            bucket.on_success()
+            return connection
+
+    def __str__(self):
+        return f"AdaptiveRateLimiter(buckets={len(self._buckets)}, retries={self.retries})"
+
+    __repr__ = __str__
+
+
+def handshake_status(error: BaseException) -> tuple:
+    """
+    The (status code, retry after) of a rejected websocket handshake (0 if the error is not a rejection)
+    """
+
+    # websockets >= 14: InvalidStatus(response), before: InvalidStatusCode(status_code, headers)
+    response = getattr(error, "response", None)
+    code = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    if not isinstance(code, int):
+        return 0, None
+
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    return code, parse_retry_after(headers.get("Retry-After"))
+
+
+_limiter: Optional[AdaptiveRateLimiter] = None
+
+
+def enable_rate_limiter(
+    rate: float = 10.,
+    burst: float = None,
+    min_rate: float = 0.1,
+    max_rate: float = None,
+    max_retries: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.,
+) -> AdaptiveRateLimiter:
+    """
+    Limit the http requests and chat connections of every client, adapting to the throttling of the server
+    (see `AdaptiveRateLimiter` for the options)
+
+    e.g.
+    >>> enable_rate_limiter(rate=20, max_retries=8)
+    >>> for result in load_conversations(ids, concurrency=32):  # slows down on 429 instead of failing
+    ...     print(result.id, result.ok)
+
+    :return: The `rate limiter` instance
+    """
+
+    global _limiter
+    _limiter = AdaptiveRateLimiter(rate, burst, min_rate, max_rate, max_retries, base_delay, max_delay)
+    return _limiter
+
+
+def disable_rate_limiter() -> None:
+    """
+    Stop limiting the requests (the limiter is dropped)
+    """
+
+    global _limiter
+    _limiter = None
+
+
+def get_rate_limiter() -> Optional[AdaptiveRateLimiter]:
+    """
+    Get the rate limiter
+    :return: The `rate limiter` instance (None if the limiter is disabled)
+    """
+
+    return _limiter
+
+
+async def connect_limited(url: str, token: str, connect: Callable[[], Awaitable]) -> Any:
+    """
+    Open a connection through the rate limiter (directly if the limiter is disabled)
+    :param url: The url of the connection
+    :param token: The key of the connection
+    :param connect: Opens the connection
+    :return: The connection
+    """
+
+    limiter = _limiter
+    if limiter is None:
+        return await connect()
+    return await limiter.connect_async(url, token, connect)
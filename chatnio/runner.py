@@ -0,0 +1,285 @@
+# Desc: Background Event Loop for the synchronous Chat Nio API
+import queue
+import atexit
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+from typing import Any, AsyncIterable, Awaitable, Iterator, Optional
+
+# markers of the bridge queue of `BackgroundLoop.iterate`
+_ITEM, _ERROR, _END = 0, 1, 2
+
+
+async def _in_context(coroutine: Awaitable, context: contextvars.Context) -> Any:
+    # a task runs in a copy of the context of the loop thread, bring the variables of the caller in
+    for variable, value in context.items():
+        variable.set(value)
+    return await coroutine
+
+
+class BackgroundLoop(object):
+    """
+    One long-lived event loop running in a daemon thread, shared by the synchronous API
+
+    Connections opened through it stay bound to it, so they can be reused by later sync calls
+    from any thread. Coroutines submitted from many threads run concurrently on the loop.
+
+    e.g.
+    >>> runner = BackgroundLoop().start()
+    >>> chat = runner.run(new_chat())
+    >>> runner.run(chat.close_async())
+    >>> runner.stop()
+    """
+
+    def __init__(self, name: str = "chatnio-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """
+        The event loop (started on first use)
+        """
+
+        if self._loop is None:
+            self.start()
+        return self._loop
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "BackgroundLoop":
+        """
+        Start the loop thread (does nothing if it is running)
+        :return: The loop itself
+        """
+
+        with self._lock:
+            if self.running:
+                return self
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run() -> None:
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            return self
+
+    def in_loop(self) -> bool:
+        """
+        Check if the caller runs on the loop thread (blocking there would deadlock)
+        """
+
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coroutine: Awaitable) -> concurrent.futures.Future:
+        """
+        Schedule a coroutine on the loop
+        :param coroutine: The coroutine to run
+        :return: The future of its result
+        """
+
+        # the coroutine keeps the context of the caller (e.g. the current `ChatNio` client)
+        return asyncio.run_coroutine_threadsafe(_in_context(coroutine, contextvars.copy_context()), self.loop)
+
+    def run(self, coroutine: Awaitable, timeout: float = None) -> Any:
+        """
+        Run a coroutine on the loop and wait for its result
+        :param coroutine: The coroutine to run
+        :param timeout: The maximum seconds to wait (default: wait forever)
+        :return: The result of the coroutine
+        :raise concurrent.futures.TimeoutError: If the coroutine did not finish in time (it is cancelled)
+        """
+
+        if self.in_loop():
+            coroutine.close()
+            raise RuntimeError("Cannot wait for the background loop from its own thread")
+
+        future = self.submit(coroutine)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # timeouts and interrupts (e.g. KeyboardInterrupt) of the caller cancel the coroutine
+            future.cancel()
+            raise
+
+    def iterate(self, iterable: AsyncIterable, buffer: int = 16) -> Iterator:
+        """
+        Iterate an async iterable from synchronous code, the iterable runs on the loop
+
+        Items are handed over through a bounded buffer: the iterable is paused while `buffer` items are waiting
+        for the caller. Leaving the loop early (break, exception, close) cancels the iterable and waits for its
+        cleanup (`aclose`), so nothing is left running on the loop.
+
+        e.g.
+        >>> for partial in runner.iterate(chat.ask("hi")):
+        ...     print(partial.message, end="")
+
+        :param iterable: The async iterable (e.g. an async generator)
+        :param buffer: The maximum number of items produced ahead of the caller (default: 16)
+        :return: The iterator of items
+        """
+
+        if buffer <= 0:
+            raise ValueError("Buffer must be greater than 0")
+        if self.in_loop():
+            raise RuntimeError("Cannot wait for the background loop from its own thread")
+
+        loop = self.loop
+        items: queue.SimpleQueue = queue.SimpleQueue()
+        state = {}
+
+        async def produce() -> None:
+            state["task"] = asyncio.current_task()
+            # the credits bound the buffer, the caller gives one back for every item it takes
+            credits = state["credits"] = asyncio.Semaphore(buffer)
+            iterator = iterable.__aiter__()
+            try:
+                while True:
+                    await credits.acquire()
+                    try:
+                        item = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    items.put((_ITEM, item))
+            except asyncio.CancelledError:
+                pass
+            except BaseException as e:
+                items.put((_ERROR, e))
+            finally:
+                try:
+                    aclose = getattr(iterator, "aclose", None)
+                    if aclose is not None:
+                        await aclose()
+                finally:
+                    items.put((_END, None))
+
+        async def cancel() -> None:
+            task = state.get("task")
+            if task is not None:
+                task.cancel()
+                await asyncio.wait({task})
+
+        def give_back(count: int) -> None:
+            credits = state["credits"]
+            for _ in range(count):
+                credits.release()
+
+        # the producer is scheduled before any later coroutine, so its task is known when `cancel` runs
+        self.submit(produce())
+        finished = False
+        # credits are given back in batches (waking the loop thread is the expensive part of the hand-over):
+        # when half of the buffer was taken, or before waiting for the next item
+        owed, batch = 0, max(buffer // 2, 1)
+        try:
+            while True:
+                try:
+                    kind, value = items.get_nowait()
+                except queue.Empty:
+                    if owed:
+                        loop.call_soon_threadsafe(give_back, owed)
+                        owed = 0
+                    kind, value = items.get()
+
+                if kind == _ITEM:
+                    owed += 1
+                    if owed >= batch:
+                        loop.call_soon_threadsafe(give_back, owed)
+                        owed = 0
+                    yield value
+                elif kind == _ERROR:
+                    raise value
+                else:
+                    finished = True
+                    return
+        finally:
+            if not finished:
+                if self.in_loop():
+                    # closed by the garbage collector on the loop thread, nothing can be waited for here
+                    state["task"].cancel()
+                else:
+                    self.run(cancel())
+
+    def stop(self, timeout: float = 5.) -> None:
+        """
+        Cancel the pending tasks, stop the loop and wait for its thread
+        :param timeout: The maximum seconds to wait for the thread
+        """
+
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or thread is None or not thread.is_alive():
+                return
+
+            async def shutdown() -> None:
+                tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+            try:
+                asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout)
+            except Exception:
+                pass
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            if not thread.is_alive():
+                loop.close()
+            self._loop = self._thread = None
+
+    def __str__(self):
+        return f"BackgroundLoop(name={self.name}, running={self.running})"
+
+    __repr__ = __str__
+
+
+_default: Optional[BackgroundLoop] = None
+_default_lock = threading.Lock()
+
+
+def get_background_loop() -> BackgroundLoop:
+    """
+    Get the background loop of the synchronous API (started on first use, stopped at exit)
+    :return: The `background loop` instance
+    """
+
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = BackgroundLoop()
+                atexit.register(_default.stop)
+    return _default
+
+
+def run_sync(coroutine: Awaitable, timeout: float = None) -> Any:
+    """
+    Run a coroutine on the background loop and wait for its result
+    :param coroutine: The coroutine to run
+    :param timeout: The maximum seconds to wait (default: wait forever)
+    :return: The result of the coroutine
+    """
+
+    return get_background_loop().run(coroutine, timeout)
+
+
+def iterate_sync(iterable: AsyncIterable, buffer: int = 16) -> Iterator:
+    """
+    Iterate an async iterable on the background loop, from synchronous code (see `BackgroundLoop.iterate`)
+    :param iterable: The async iterable (e.g. an async generator)
+    :param buffer: The maximum number of items produced ahead of the caller (default: 16)
+    :return: The iterator of items
+    """
+
+    return get_background_loop().iterate(iterable, buffer)
@@ -0,0 +1,435 @@
+# Desc: Message Storage for Chat Nio (conversation history)
+import sys
+from array import array
+from collections.abc import MutableSequence
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+
+class MessageList(MutableSequence):
+    """
+    A list with O(1) amortized appends and prepends, and bulk splices at both ends
+
+    Items are kept in two lists: the front half stored reversed, and the back half in order,
+    so older history can be prepended page by page without moving the whole list.
+
+    e.g.
+    >>> messages = MessageList(["c", "d"])
+    >>> messages.extendleft(["a", "b"])
+    >>> messages.append("e")
+    >>> messages[0], messages[-1], messages[1:3]
+    ('a', 'e', ['b', 'c'])
+    """
+
+    __slots__ = ("_front", "_back")
+
+    def __init__(self, items: Iterable[Any] = ()):
+        self._front: List[Any] = []
+        self._back: List[Any] = list(items)
+
+    def _locate(self, index: int) -> tuple:
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("message index out of range")
+
+        front = len(self._front)
+        if index < front:
+            return self._front, front - 1 - index
+        return self._back, index - front
+
+    def tolist(self) -> List[Any]:
+        """
+        Copy the items into a plain list
+        """
+
+        return self._front[::-1] + self._back
+
+    def _reset(self, items: List[Any]) -> None:
+        self._front = []
+        self._back = items
+
+    def __len__(self):
+        return len(self._front) + len(self._back)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return list(islice(self, start, stop))
+            return self.tolist()[index]
+
+        items, position = self._locate(index)
+        return items[position]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            items = self.tolist()
+            items[index] = value
+            self._reset(items)
+            return
+
+        items, position = self._locate(index)
+        items[position] = value
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            items = self.tolist()
+            del items[index]
+            self._reset(items)
+            return
+
+        items, position = self._locate(index)
+        del items[position]
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain(reversed(self._front), self._back)
+
+    def __reversed__(self) -> Iterator[Any]:
+        return chain(reversed(self._back), self._front)
+
+    def __contains__(self, item):
+        return item in self._back or item in self._front
+
+    def insert(self, index: int, value: Any) -> None:
+        size = len(self)
+        if index < 0:
+            index = max(index + size, 0)
+
+        front = len(self._front)
+        if index <= 0:
+            self._front.append(value)
+        elif index >= size:
+            self._back.append(value)
+        elif index < front:
+            self._front.insert(front - index, value)
+        else:
+            self._back.insert(index - front, value)
+
+    def append(self, value: Any) -> None:
+        self._back.append(value)
+
+    def appendleft(self, value: Any) -> None:
+        """
+        Insert an item before the first one, O(1) amortized
+        """
+
+        self._front.append(value)
+
+    def extend(self, values: Iterable[Any]) -> None:
+        self._back.extend(values)
+
+    def extendleft(self, values: Iterable[Any]) -> None:
+        """
+        Insert items before the first one, keeping their order, O(k) amortized for k items
+        """
+
+        if not isinstance(values, (list, tuple)):
+            values = list(values)
+        self._front.extend(reversed(values))
+
+    def splice(self, index: int, values: Iterable[Any]) -> None:
+        """
+        Insert items at a position, keeping their order
+        :param index: The position of the first inserted item
+        :param values: The items to insert
+        """
+
+        size = len(self)
+        if index < 0:
+            index = max(index + size, 0)
+
+        front = len(self._front)
+        if index <= 0:
+            self.extendleft(values)
+        elif index >= size:
+            self.extend(values)
+        elif index <= front:
+            position = front - index
+            self._front[position:position] = reversed(list(values))
+        else:
+            position = index - front
+            self._back[position:position] = values
+
+    def pop(self, index: int = -1) -> Any:
+        if index == -1 and self._back:
+            return self._back.pop()
+        if index == 0 and self._front:
+            return self._front.pop()
+
+        items, position = self._locate(index)
+        return items.pop(position)
+
+    def clear(self) -> None:
+        self._front = []
+        self._back = []
+
+    def copy(self) -> "MessageList":
+        messages = MessageList.__new__(MessageList)
+        messages._front = self._front.copy()
+        messages._back = self._back.copy()
+        return messages
+
+    def sort(self, *, key=None, reverse: bool = False) -> None:
+        items = self.tolist()
+        items.sort(key=key, reverse=reverse)
+        self._reset(items)
+
+    def reverse(self) -> None:
+        self._front, self._back = self._back, self._front
+
+    def __eq__(self, other):
+        if isinstance(other, MessageList):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __add__(self, other):
+        return self.tolist() + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self.tolist()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __str__(self):
+        return str(self.tolist())
+
+    __repr__ = __str__
+
+
+class ColumnarMessages(MutableSequence):
+    """
+    A compact, columnar store of messages: one role code per message and one contiguous utf-8 buffer
+    for all contents (with offsets), instead of one object per message
+
+    Messages are built on access, so items are equal but not identical between accesses.
+    Appending is O(1) amortized; inserting, replacing or deleting in the middle moves the buffer (O(n)).
+
+    e.g.
+    >>> messages = ColumnarMessages([Message("user", "hi"), Message("assistant", "hello")])
+    >>> messages[1]
+    Message(role=assistant, content=hello)
+    """
+
+    __slots__ = ("_roles", "_codes", "_role_names", "_buffer", "_offsets", "_factory")
+
+    def __init__(self, items: Iterable[Any] = (), factory=None):
+        """
+        :param items: The messages (objects with `role` and `content`)
+        :param factory: Builds a message from (role, content) (default: `Message`)
+        """
+
+        self._roles = array("B")
+        self._codes: Dict[str, int] = {}
+        self._role_names: List[str] = []
+        self._buffer = bytearray()
+        self._offsets = array("Q", [0])
+        self._factory = factory
+        self.extend(items)
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], factory=None) -> "ColumnarMessages":
+        """
+        Build the store from message records ({"role": ..., "content": ...}), without building messages
+        """
+
+        messages = cls(factory=factory)
+        for record in records:
+            messages._append(record.get("role", "user"), record.get("content", ""))
+        return messages
+
+    def _code(self, role: str) -> int:
+        code = self._codes.get(role)
+        if code is None:
+            if len(self._role_names) > 0xFF:
+                raise ValueError("Too many distinct roles for a columnar store")
+            code = self._codes[role] = len(self._role_names)
+            self._role_names.append(sys.intern(role))
+        return code
+
+    def _append(self, role: str, content: str) -> None:
+        self._roles.append(self._code(role))
+        self._buffer += content.encode()
+        self._offsets.append(len(self._buffer))
+
+    def _build(self, index: int) -> Any:
+        if self._factory is None:
+            from .conversation import Message
+            self._factory = Message
+
+        content = self._buffer[self._offsets[index]:self._offsets[index + 1]].decode()
+        return self._factory(self._role_names[self._roles[index]], content)
+
+    def _index(self, index: int) -> int:
+        size = len(self._roles)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("message index out of range")
+        return index
+
+    def _replace(self, start: int, stop: int, items: Iterable[Any]) -> None:
+        # replace the messages [start, stop) by items, moving the tail of the buffer once
+        roles = array("B")
+        chunks = []
+        lengths = []
+        for item in items:
+            roles.append(self._code(item.role))
+            encoded = item.content.encode()
+            chunks.append(encoded)
+            lengths.append(len(encoded))
+
+        begin, end = self._offsets[start], self._offsets[stop]
+        content = b"".join(chunks)
+        delta = len(content) - (end - begin)
+
+        offsets = array("Q")
+        position = begin
+        for length in lengths:
+            position += length
+            offsets.append(position)
+        offsets.extend(offset + delta for offset in self._offsets[stop + 1:])
+
+        self._buffer[begin:end] = content
+        self._roles[start:stop] = roles
+        self._offsets[start + 1:] = offsets
+
+    def tolist(self) -> List[Any]:
+        """
+        Build every message into a plain list
+        """
+
+        return [self._build(index) for index in range(len(self._roles))]
+
+    def __len__(self):
+        return len(self._roles)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._build(position) for position in range(*index.indices(len(self._roles)))]
+        return self._build(self._index(index))
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._roles))
+            if step != 1:
+                items = self.tolist()
+                items[index] = value
+                self._replace(0, len(self._roles), items)
+                return
+            self._replace(start, max(start, stop), list(value))
+            return
+
+        index = self._index(index)
+        self._replace(index, index + 1, [value])
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._roles))
+            if step != 1:
+                items = self.tolist()
+                del items[index]
+                self._replace(0, len(self._roles), items)
+                return
+            self._replace(start, max(start, stop), [])
+            return
+
+        index = self._index(index)
+        self._replace(index, index + 1, [])
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self._build(index) for index in range(len(self._roles)))
+
+    def __reversed__(self) -> Iterator[Any]:
+        return (self._build(index) for index in range(len(self._roles) - 1, -1, -1))
+
+    def insert(self, index: int, value: Any) -> None:
+        size = len(self._roles)
+        index = min(max(index + size if index < 0 else index, 0), size)
+        self._replace(index, index, [value])
+
+    def append(self, value: Any) -> None:
+        self._append(value.role, value.content)
+
+    def appendleft(self, value: Any) -> None:
+        self._replace(0, 0, [value])
+
+    def extend(self, values: Iterable[Any]) -> None:
+        for value in values:
+            self._append(value.role, value.content)
+
+    def extendleft(self, values: Iterable[Any]) -> None:
+        self._replace(0, 0, values)
+
+    def splice(self, index: int, values: Iterable[Any]) -> None:
+        size = len(self._roles)
+        index = min(max(index + size if index < 0 else index, 0), size)
+        self._replace(index, index, values)
+
+    def clear(self) -> None:
+        self._roles = array("B")
+        self._buffer = bytearray()
+        self._offsets = array("Q", [0])
+
+    def copy(self) -> "ColumnarMessages":
+        messages = ColumnarMessages.__new__(ColumnarMessages)
+        messages._roles = array("B", self._roles)
+        messages._codes = dict(self._codes)
+        messages._role_names = list(self._role_names)
+        messages._buffer = bytearray(self._buffer)
+        messages._offsets = array("Q", self._offsets)
+        messages._factory = self._factory
+        return messages
+
+    def sort(self, *, key=None, reverse: bool = False) -> None:
+        items = self.tolist()
+        items.sort(key=key, reverse=reverse)
+        self._replace(0, len(self._roles), items)
+
+    def reverse(self) -> None:
+        self._replace(0, len(self._roles), self.tolist()[::-1])
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The size of the columns in bytes
+        """
+
+        return (
+            self._roles.itemsize * len(self._roles)
+            + len(self._buffer)
+            + self._offsets.itemsize * len(self._offsets)
+        )
+
+    def __eq__(self, other):
+        if isinstance(other, (MutableSequence, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __add__(self, other):
+        return self.tolist() + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self.tolist()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __str__(self):
+        return str(self.tolist())
+
+    __repr__ = __str__
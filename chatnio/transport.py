@@ -0,0 +1,334 @@
+# Desc: Http Transports for Chat Nio (pool limits, timeouts, http/2, rate limiting of the requests)
+import asyncio
+import threading
+from importlib.util import find_spec
+
+import httpx
+
+from .ratelimit import get_rate_limiter, parse_retry_after
+
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def _ssl_context():
+    # loading the certificates takes tens of milliseconds, every transport shares one context
+    global _context
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                create = getattr(httpx, "create_ssl_context", None)
+                _context = create() if create is not None else True
+    return _context
+
+
+class TransportConfig(object):
+    """
+    The settings of the http connections of a client (the defaults are the ones of httpx)
+
+    e.g.
+    >>> config = TransportConfig(http2=True, max_connections=32, read_timeout=30)
+    >>> client = ChatNio("sk-...", transport=config)
+    >>> chatnio.set_transport(config)  # or for the module-level functions
+
+    Attributes:
+        http1 (bool): Whether to speak http/1.1 (without it, http/2 is used with prior knowledge, e.g. for h2c)
+        http2 (bool): Whether to negotiate http/2, multiplexing the requests on few connections
+            (needs the `h2` package: `pip install chatnio[http2]`). It pays off with the async functions:
+            the blocking http/2 connections of httpcore 1.0 are not safe to share between threads
+        max_connections (int): The maximum number of connections (None: no limit), keep it at or above the number
+            of threads sharing the client: the blocking pool of httpcore 1.0 can break connections threads wait for
+        max_keepalive_connections (int): The maximum number of idle connections kept alive (None: no limit)
+        keepalive_expiry (float): The seconds an idle connection is kept alive (None: forever)
+        connect_timeout (float): The seconds to open a connection (None: no timeout)
+        read_timeout (float): The seconds to wait for a chunk of the response (None: no timeout)
+        write_timeout (float): The seconds to send a chunk of the request (None: no timeout)
+        pool_timeout (float): The seconds to wait for a free connection of the pool (None: no timeout)
+        retries (int): The retries of a failed connection attempt
+    """
+
+    __slots__ = (
+        "http1", "http2", "max_connections", "max_keepalive_connections", "keepalive_expiry",
+        "connect_timeout", "read_timeout", "write_timeout", "pool_timeout", "retries",
+    )
+
+    def __init__(
+        self,
+        http2: bool = False,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 5.,
+        connect_timeout: float = 5.,
+        read_timeout: float = 5.,
+        write_timeout: float = 5.,
+        pool_timeout: float = 5.,
+        retries: int = 0,
+        http1: bool = True,
+    ):
+        if http2 and find_spec("h2") is None:
+            raise ImportError("http/2 needs the `h2` package, install it with `pip install chatnio[http2]`")
+        if not http1 and not http2:
+            raise ValueError("At least one of http/1.1 and http/2 must be enabled")
+
+        self.http1 = http1
+        self.http2 = http2
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.pool_timeout = pool_timeout
+        self.retries = retries
+
+    def replace(self, **changes) -> "TransportConfig":
+        """
+        Copy the config with some settings changed (e.g. `config.replace(http2=True)`)
+        """
+
+        options = {name: getattr(self, name) for name in TransportConfig.__slots__}
+        options.update(changes)
+        return TransportConfig(**options)
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout, read=self.read_timeout, write=self.write_timeout, pool=self.pool_timeout,
+        )
+
+    def _transport_options(self) -> dict:
+        return dict(
+            http1=self.http1, http2=self.http2, limits=self.limits, retries=self.retries, verify=_ssl_context(),
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, TransportConfig):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in TransportConfig.__slots__)
+
+    def __str__(self):
+        options = ", ".join(f"{name}={getattr(self, name)}" for name in TransportConfig.__slots__)
+        return f"TransportConfig({options})"
+
+    __repr__ = __str__
+
+
+def build_client(base_url: str, headers: dict, config: TransportConfig = None) -> httpx.Client:
+    """
+    Create the blocking http client of an endpoint
+    :param base_url: The endpoint
+    :param headers: The headers of the requests
+    :param config: The transport settings (default: the defaults of httpx)
+    """
+
+    config = config or TransportConfig()
+    return httpx.Client(
+        base_url=base_url,
+        headers=headers,
+        timeout=config.timeout,
+        transport=ClientTransport(httpx.HTTPTransport(**config._transport_options())),
+    )
+
+
+def build_async_client(base_url: str, headers: dict, config: TransportConfig = None) -> httpx.AsyncClient:
+    """
+    Create the async http client of an endpoint (see `build_client`)
+    """
+
+    config = config or TransportConfig()
+    return httpx.AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        timeout=config.timeout,
+        transport=AsyncClientTransport(httpx.AsyncHTTPTransport(**config._transport_options())),
+    )
+
+
+def retire_client(client, loop: asyncio.AbstractEventLoop = None) -> None:
+    """
+    Close a client built by `build_client` / `build_async_client` once its requests in flight are done
+    :param client: The http client
+    :param loop: The event loop of an async client
+    """
+
+    transport = client._transport
+    if isinstance(transport, AsyncClientTransport):
+        transport.retire(loop)
+    elif isinstance(transport, ClientTransport):
+        transport.retire()
+
+
+def _token(request: httpx.Request) -> str:
+    authorization = request.headers.get("Authorization", "")
+    return authorization[len("Bearer "):] if authorization.startswith("Bearer ") else authorization
+
+
+def _status(response: httpx.Response) -> tuple:
+    return response.status_code, parse_retry_after(response.headers.get("Retry-After"))
+
+
+class _Stream(httpx.SyncByteStream):
+    # the body of a response, the request is in flight until it is closed
+
+    def __init__(self, stream: httpx.SyncByteStream, transport: "ClientTransport"):
+        self.stream = stream
+        self.transport = transport
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.stream.close()
+        finally:
+            self.transport._finish()
+
+
+class _AsyncStream(httpx.AsyncByteStream):
+
+    def __init__(self, stream: httpx.AsyncByteStream, transport: "AsyncClientTransport"):
+        self.stream = stream
+        self.transport = transport
+        self.closed = False
+
+    def __aiter__(self):
+        return self.stream.__aiter__()
+
+    async def aclose(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self.stream.aclose()
+        finally:
+            await self.transport._finish()
+
+
+class ClientTransport(httpx.BaseTransport):
+    """
+    The transport of the blocking http clients: sends the requests through the rate limiter
+    (see `enable_rate_limiter`), and counts the requests in flight, so a retired transport
+    (e.g. after `set_endpoint`) is closed once its last response is closed
+
+    Attributes:
+        transport (httpx.BaseTransport): The transport sending the requests
+        in_flight (int): The number of requests whose response is not closed yet
+    """
+
+    def __init__(self, transport: httpx.BaseTransport = None):
+        self.transport = transport or httpx.HTTPTransport()
+        self.in_flight = 0
+        self.retired = False
+        self._lock = threading.Lock()
+
+    def _send(self, request: httpx.Request) -> httpx.Response:
+        limiter = get_rate_limiter()
+        if limiter is None:
+            return self.transport.handle_request(request)
+
+        return limiter.send(
+            str(request.url), _token(request), lambda: self.transport.handle_request(request), _status,
+        )
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.in_flight += 1
+        try:
+            response = self._send(request)
+        except BaseException:
+            self._finish()
+            raise
+
+        response.stream = _Stream(response.stream, self)
+        return response
+
+    def _finish(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            idle = self.retired and self.in_flight == 0
+        if idle:
+            self.transport.close()
+
+    def retire(self) -> None:
+        """
+        Close the transport once the requests in flight are done (now if there is none)
+        """
+
+        with self._lock:
+            self.retired = True
+            idle = self.in_flight == 0
+        if idle:
+            self.transport.close()
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncClientTransport(httpx.AsyncBaseTransport):
+    """
+    The transport of the async http clients (async version of `ClientTransport`)
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport = None):
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self.in_flight = 0
+        self.retired = False
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        limiter = get_rate_limiter()
+        if limiter is None:
+            return await self.transport.handle_async_request(request)
+
+        return await limiter.send_async(
+            str(request.url), _token(request), lambda: self.transport.handle_async_request(request), _status,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # the transport belongs to one event loop, no lock needed
+        self.in_flight += 1
+        try:
+            response = await self._send(request)
+        except BaseException:
+            await self._finish()
+            raise
+
+        response.stream = _AsyncStream(response.stream, self)
+        return response
+
+    async def _finish(self) -> None:
+        self.in_flight -= 1
+        if self.retired and self.in_flight == 0:
+            await self.transport.aclose()
+
+    def retire(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Close the transport once the requests in flight are done, can be called from any thread
+        :param loop: The event loop of the transport
+        """
+
+        def close():
+            self.retired = True
+            if self.in_flight == 0:
+                loop.create_task(self.transport.aclose())
+
+        try:
+            loop.call_soon_threadsafe(close)
+        except RuntimeError:
+            # the loop is closed, and its connections with it
+            pass
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -11,28 +11,37 @@ with open('HISTORY.rst') as history_file:
     history = history_file.read()
 
 requirements = [
-    "httpx>=0.13.3",
+    "httpx>=0.21.0",
     "websockets>=8.1",
 ]
 
+extras_requirements = {
+    # faster json codecs for websocket frames and REST payloads (see `chatnio.set_codec`)
+    "orjson": ["orjson>=3.0"],
+    "msgspec": ["msgspec>=0.18"],
+    "ujson": ["ujson>=5.0"],
+    # http/2 for the REST helpers (see `chatnio.TransportConfig`)
+    "http2": ["httpx[http2]>=0.21.0"],
+}
+
 test_requirements = []
 
 setup(
     author="Deeptrain Community",
     author_email='zmh@lightxi.com',
-    python_requires='>=3.6',
+    python_requires='>=3.7',
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Natural Language :: English',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
     ],
     description="The official Python library for the Chat Nio API ",
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
@@ -0,0 +1,29 @@
+import os
+import pytest
+import chatnio
+from chatnio.mock import MockServer
+
+
+@pytest.fixture(scope="session", autouse=True)
+def server():
+    """
+    Run the suite against a local mock server, set `CHATNIO_LIVE=1` to use the real api instead
+    """
+
+    if os.environ.get("CHATNIO_LIVE"):
+        yield None
+        return
+
+    with MockServer() as mock:
+        mock.add_conversation("hello", [
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": "Hello! How can I assist you today?"},
+        ], _id=1)
+
+        endpoint, token = chatnio.globals.API_BASE, chatnio.get_token()
+        chatnio.set_endpoint(mock.url)
+        chatnio.set_key(mock.token)
+        yield mock
+
+        chatnio.set_endpoint(endpoint)
+        chatnio.set_key(token)
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import chatnio
+from chatnio import ChatNio, AuthenticationError
+from chatnio.mock import MockServer
+
+
+@pytest.fixture
+def other():
+    """
+    A second tenant: another endpoint, accepting another key
+    """
+
+    with MockServer(token="sk-other") as mock:
+        mock.add_conversation("other", [{"role": "user", "content": "from the other server"}], _id=1)
+        yield mock
+
+
+def test_clients(server, other):
+    default = ChatNio(server.token, server.url)
+    tenant = ChatNio(other.token, other.url)
+    logging.debug(f"[api]: clients: {default}, {tenant}")
+
+    # calls for different keys and endpoints run concurrently, without touching the default client
+    with ThreadPoolExecutor(8) as executor:
+        names = list(executor.map(
+            lambda client: client.load_conversation(1).name, [default, tenant] * 8,
+        ))
+    assert names == [server.conversations[1]["name"], "other"] * 8
+    assert chatnio.get_token() == server.token
+
+    with pytest.raises(AuthenticationError):
+        ChatNio(server.token, other.url).get_quota()
+
+    with tenant.use():
+        assert chatnio.current_client() is tenant and chatnio.get_token() == other.token
+        assert chatnio.load_conversation(1).name == "other"
+    assert chatnio.current_client() is chatnio.get_default_client()
+
+    # iterators and worker threads keep the client of the call
+    assert [conversation.name for conversation in tenant.iter_conversations()] == ["other"]
+    assert [result.value.name for result in tenant.load_conversations([1])] == ["other"]
+
+
+def test_clients_async(server, other):
+    tenant = ChatNio(other.token, other.url)
+
+    async def run():
+        quota, conversation = await asyncio.gather(chatnio.get_quota_async(), tenant.load_conversation_async(1))
+        assert quota >= 0 and conversation.name == "other"
+        assert [item.name async for item in tenant.iter_conversations_async()] == ["other"]
+        assert chatnio.current_client() is chatnio.get_default_client()
+
+        chat = await tenant.new_chat()
+        assert chat.token == other.token and chat.uri.startswith(other.url.replace("http", "ws"))
+        assert "".join([delta async for delta in chat.ask_text("tenant")]).startswith("tenant")
+        await chat.close_async()
+        await tenant.close_async()
+
+    asyncio.run(run())
+
+    chat = tenant.new_chat_sync()  # opened on the background loop, with the key of the tenant
+    assert "".join(chat.stream_sync("sync tenant", text=True)).startswith("sync tenant")
+    assert chat.close()
+    tenant.close()
+
+
+def test_cache_per_client(server, other):
+    cache = chatnio.enable_conversation_cache()
+    try:
+        tenant = ChatNio(other.token, other.url)
+        assert chatnio.load_conversation(1).name != tenant.load_conversation(1).name
+        assert tenant.load_conversation(1).name == "other" and cache.hits == 1
+    finally:
+        chatnio.disable_conversation_cache()
@@ -0,0 +1,104 @@
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from chatnio import AuthenticationError, Balancer, ChatNio, TargetStats, is_target_failure
+from chatnio.mock import MockServer
+
+
+@pytest.fixture
+def mirrors():
+    with MockServer() as first, MockServer() as second:
+        yield first, second
+
+
+def test_balancer(mirrors):
+    first, second = mirrors
+    balancer = Balancer([ChatNio(first.token, first.url), ChatNio(second.token, second.url)], eject_time=0.2)
+
+    with ThreadPoolExecutor(4) as executor:
+        assert all(quota >= 0 for quota in executor.map(lambda _: balancer.get_quota(), range(40)))
+    assert first.requests and second.requests  # both targets get traffic
+    assert sum(stats.requests for stats in balancer.stats()) == 40
+
+    # a failing target is ejected after `eject_after` failures, the calls go to the healthy one
+    second.error_rate = 1
+    errors = 0
+    for _ in range(50):
+        try:
+            balancer.get_quota()
+        except Exception:
+            errors += 1
+    assert errors == 3
+    healthy, failing = balancer.stats()
+    logging.debug(f"[balancer]: stats: {healthy}, {failing}")
+    assert isinstance(failing, TargetStats) and failing.ejected and failing.errors == 3
+    assert healthy.outstanding == 0 and not healthy.ejected
+
+    # back after the ejection
+    time.sleep(0.25)
+    assert not balancer.stats()[1].ejected
+    second.error_rate = 0
+    assert all(balancer.get_quota() >= 0 for _ in range(30))
+    assert balancer.stats()[1].requests > failing.requests
+
+
+def test_balancer_quota(mirrors):
+    first, second = mirrors
+    second.quota = 0
+    balancer = Balancer(
+        [ChatNio(first.token, first.url), ChatNio(second.token, second.url)], strategy="latency", min_quota=1,
+    )
+
+    assert balancer.refresh_quota() == [first.quota, 0]
+    requests = second.requests
+    for _ in range(10):
+        balancer.get_package()
+    assert second.requests == requests  # no quota left, skipped
+
+    async def run():
+        assert await balancer.refresh_quota_async() == [first.quota, 0]
+        chat = await balancer.new_chat()
+        assert chat.client is balancer.targets[0]
+        assert [item async for item in balancer.iter_conversations_async()] == []
+        await chat.close_async()
+        await balancer.close_async()
+
+    asyncio.run(run())
+    assert all(stats.outstanding == 0 for stats in balancer.stats())
+
+
+def test_balancer_caller_errors(mirrors):
+    first, second = mirrors
+    balancer = Balancer([ChatNio(first.token, first.url), ChatNio(second.token, second.url)], eject_after=2)
+
+    # the errors of the calls themselves do not eject a healthy target
+    for _ in range(10):
+        with pytest.raises(ValueError):
+            balancer.buy_quota(0)
+        with pytest.raises(AuthenticationError):
+            balancer.load_conversation(404)
+    assert all(stats.errors == 0 and not stats.ejected for stats in balancer.stats())
+
+    # server errors and throttling do
+    assert is_target_failure(ConnectionError()) and not is_target_failure(KeyError())
+    first.error_rate, first.error_status = 1, 429
+    for _ in range(10):
+        try:
+            balancer.get_quota()
+        except Exception as e:
+            assert is_target_failure(e)
+    assert balancer.stats()[0].ejected and not balancer.stats()[1].ejected
+
+
+def test_balancer_quota_same_mask(mirrors):
+    first, _ = mirrors
+    # the keys only differ in the middle, masked alike: every target still gets its own quota
+    keys = [first.token + "-0000-abcd", first.token + "-1111-abcd"]
+    assert len({str(ChatNio(key, first.url)) for key in keys}) == 1
+    balancer = Balancer([ChatNio(first.token, first.url)] + [ChatNio(key, first.url) for key in keys])
+    assert balancer.refresh_quota() == [first.quota, None, None]
+    assert asyncio.run(balancer.refresh_quota_async()) == [first.quota, None, None]
+    balancer.close()
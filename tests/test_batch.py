@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+import pytest
+import chatnio.batch
+from chatnio import Chat, batch_ask, BatchResult
+from .test_chat import _EchoConnection
+
+
+class _FailingConnection(_EchoConnection):
+    async def send(self, message):
+        if "fail" in message:
+            raise ConnectionError("connection lost")
+        await super().send(message)
+
+
+_opened = []
+
+
+async def _new_echo_chat(conversation_id: int = -1, pool=None) -> Chat:
+    chat = Chat(conversation_id, pool)
+    chat.connection = _FailingConnection()
+    _opened.append(chat)
+    return chat
+
+
+async def _test_batch_ask():
+    jobs = ["hi", ("hello", "gpt-4"), {"message": "", "web": True}, ("fail",), "bye"]
+    results = []
+    async for result in batch_ask(jobs, concurrency=2):
+        logging.debug(f"[batch]: new result: {result}")
+        assert isinstance(result, BatchResult)
+        results.append(result)
+
+    results.sort(key=lambda result: result.index)
+    assert [result.response for result in results] == ["hi", "hello", "", "", "bye"]
+    assert [result.ok for result in results] == [True, True, True, False, True]
+    assert isinstance(results[3].error, ConnectionError)
+    assert results[1].model == "gpt-4" and results[2].web
+    assert results[0].quota == 0.1
+
+
+async def _test_batch_conversations():
+    # a new conversation per job, unless the history is shared on purpose
+    _opened.clear()
+    results = await chatnio.batch.Batch([str(i) for i in range(10)], concurrency=2).collect()
+    assert [result.response for result in results] == [str(i) for i in range(10)] and len(_opened) == 10
+
+    _opened.clear()
+    await chatnio.batch.Batch([str(i) for i in range(10)], concurrency=2, shared_history=True).collect()
+    assert 1 <= len(_opened) <= 2  # one per connection
+
+
+async def _test_batch_malformed():
+    for job in [(), ("hi", "gpt-4", False, "extra"), {"model": "gpt-4"}, 42]:
+        with pytest.raises(ValueError):
+            await batch_ask(["hi", job, "bye"], concurrency=1).collect()
+
+
+async def _test_batch_cancel():
+    batch = batch_ask(str(i) for i in range(100))
+    async for _ in batch:
+        batch.cancel()
+    assert batch.cancelled
+
+
+def test_batch_ask(monkeypatch):
+    monkeypatch.setattr(chatnio.batch, "new_chat", _new_echo_chat)
+    asyncio.run(_test_batch_ask())
+    asyncio.run(_test_batch_conversations())
+    asyncio.run(_test_batch_malformed())
+    asyncio.run(_test_batch_cancel())
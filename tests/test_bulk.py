@@ -0,0 +1,78 @@
+import time
+import asyncio
+import logging
+
+import pytest
+from chatnio import (
+    ChatNio, BulkResult, TokenBucket, Conversation, AuthenticationError,
+    load_conversations, delete_conversations, load_conversations_async, delete_conversations_async,
+)
+from chatnio.mock import MockServer
+
+
+def test_load_conversations(server):
+    results = list(load_conversations([1, 999, 1], concurrency=2))
+    logging.debug(f"[bulk]: load results: {results}")
+
+    assert sorted(result.id for result in results) == [1, 1, 999]
+    for result in results:
+        assert isinstance(result, BulkResult)
+        if result.id == 1:
+            assert result.ok and isinstance(result.value, Conversation)
+        else:
+            assert not result and isinstance(result.error, AuthenticationError)
+
+
+def test_delete_conversations(server):
+    ids = [server.add_conversation(f"bulk {index}")["id"] for index in range(6)]
+
+    results = list(delete_conversations(ids[:3]))
+    assert sorted(result.id for result in results) == ids[:3] and all(result.value for result in results)
+
+    async def run():
+        return [result async for result in delete_conversations_async(ids[3:] + [ids[0]], concurrency=2)]
+
+    results = asyncio.run(run())
+    assert {result.id: result.value for result in results} == {ids[3]: True, ids[4]: True, ids[5]: True, ids[0]: False}
+
+
+def test_load_conversations_async_early_exit(server):
+    async def run():
+        async for result in load_conversations_async(iter([1] * 100), concurrency=4):
+            return result
+
+    assert asyncio.run(run()).value.id == 1
+
+
+def test_rate_limiter(server):
+    limiter = TokenBucket(50, burst=1)
+    start = time.monotonic()
+    assert len(list(load_conversations([1] * 6, concurrency=6, rate=limiter))) == 6
+    assert time.monotonic() - start >= 0.09
+
+
+def test_bulk_checked_when_called(server):
+    # nothing to iterate yet, the arguments and the key are checked right away
+    for operation in (load_conversations, delete_conversations, load_conversations_async, delete_conversations_async):
+        with pytest.raises(ValueError):
+            operation([1], concurrency=0)
+        with ChatNio("").use(), pytest.raises(AuthenticationError):
+            operation([1])
+
+
+def test_bulk_client_binding(server):
+    with MockServer() as other:
+        _id = other.add_conversation("other")["id"]
+        client = ChatNio(other.token, other.url)
+
+        # created with the client, iterated without it: the requests still go to its endpoint
+        with client.use():
+            results = load_conversations([_id])
+            results_async = load_conversations_async([_id])
+        assert [result.value.name for result in results] == ["other"]
+
+        async def run():
+            return [result async for result in results_async]
+
+        assert [result.value.name for result in asyncio.run(run())] == ["other"]
+        client.close()
@@ -0,0 +1,106 @@
+import time
+import asyncio
+import pytest
+import chatnio.conversation
+from chatnio import (
+    TTLCache, enable_conversation_cache, disable_conversation_cache, invalidate_conversation,
+    load_conversation, load_conversation_async, list_conversations, delete_conversation, new_chat,
+    iter_conversations,
+)
+
+
+@pytest.fixture
+def cache():
+    yield enable_conversation_cache(maxsize=8, ttl=60)
+    disable_conversation_cache()
+
+
+def test_ttl_cache():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2, etag='"b"')
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)  # "b" is the least recently used
+    assert "b" not in cache and len(cache) == 2
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    entry = cache.lookup("c")
+    assert entry is not None and not entry.fresh
+
+    cache.refresh(entry)
+    assert cache.get("c") == 3 and cache.revalidations == 1
+
+
+def test_conversation_cache(server, cache):
+    requests = server.requests
+    first = load_conversation(1)
+    second = load_conversation(1)
+    assert server.requests == requests + 1
+    assert first.messages == second.messages and first is not second
+
+    # cached conversations are copies, changing one does not change the cache
+    second.append_message(second.messages[0])
+    assert len(load_conversation(1)) == len(first)
+
+    assert asyncio.run(load_conversation_async(1)).id == 1
+    assert server.requests == requests + 1 and cache.hits == 3
+
+
+def test_iter_conversations_cache(server, cache):
+    requests = server.requests
+    next(iter_conversations())  # an incomplete stream is not cached
+    streamed = list(iter_conversations())
+    assert server.requests == requests + 2
+
+    assert [conversation.id for conversation in list_conversations()] == [c.id for c in streamed]
+    assert server.requests == requests + 2
+
+
+def test_iter_conversations_memory(server, monkeypatch):
+    # without a cache, the streamed conversations are not kept (nor copied)
+    def copy(self):
+        raise AssertionError("copied without a cache")
+
+    monkeypatch.setattr(chatnio.conversation.Conversation, "copy", copy)
+    assert len(list(iter_conversations())) == len(server.conversations)
+    monkeypatch.undo()
+
+    # a list longer than the limit is streamed without being cached
+    monkeypatch.setattr(chatnio.conversation, "LIST_CACHE_LIMIT", 0)
+    cache = enable_conversation_cache()
+    try:
+        list(iter_conversations())
+        assert len(cache) == 0
+    finally:
+        disable_conversation_cache()
+
+
+def test_conversation_cache_revalidation(server, cache):
+    load_conversation(1)
+    cache.ttl = 0
+    invalidate_conversation(None)
+
+    load_conversation(1)
+    requests = server.requests
+    assert load_conversation(1).id == 1
+    assert server.requests == requests + 1 and cache.revalidations == 1
+
+
+def test_conversation_cache_invalidation(server, cache):
+    conversation = server.add_conversation("cache")
+    assert len(load_conversation(conversation["id"])) == 0
+    assert any(item.id == conversation["id"] for item in list_conversations())
+
+    async def ask():
+        chat = await new_chat(conversation["id"])
+        async for _ in chat.ask_text("hello"):
+            pass
+        await chat.close_async()
+
+    asyncio.run(ask())
+    assert len(load_conversation(conversation["id"])) == 2
+
+    assert delete_conversation(conversation["id"])
+    assert all(item.id != conversation["id"] for item in list_conversations())
@@ -1,5 +1,7 @@
+import json
+import asyncio
 import logging
-from chatnio import new_chat, Chat, PartialMessage
+from chatnio import new_chat, Chat, PartialMessage, TextStream
 
 
 async def _test_new_chat():
@@ -15,5 +17,196 @@ async def _test_new_chat():
 
 
 def test_new_chat():
-    import asyncio
     asyncio.run(_test_new_chat())
+
+
+class _EchoConnection(object):
+    """In-memory socket answering every chat message with two frames"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    async def send(self, message):
+        data = json.loads(message)
+        if data.get("type") == "chat":
+            await self.queue.put(json.dumps({"message": data["message"], "end": False}))
+            await self.queue.put(json.dumps({"message": "", "quota": 0.1, "end": True}))
+
+    async def recv(self):
+        return await self.queue.get()
+
+    async def close(self):
+        pass
+
+
+async def _test_shared_chat():
+    chat = Chat()
+    chat.connection = _EchoConnection()
+
+    async def collect(message):
+        return [partial.message async for partial in chat.ask(message)]
+
+    first, second = await asyncio.gather(collect("first"), collect("second"))
+    assert first == ["first", ""]
+    assert second == ["second", ""]
+    assert chat.queue_size == 0 and not chat.is_busy()
+
+    stream = chat.ask("hold")
+    await stream.__anext__()
+    assert chat.queue_size == 1 and chat.is_busy()
+
+    try:
+        async for _ in chat.ask("waiting", timeout=0.05):
+            pass
+        assert False, "expected timeout"
+    except asyncio.TimeoutError:
+        pass
+    assert chat.queue_size == 1
+
+    await stream.aclose()
+    assert chat.queue_size == 0
+
+    # the rest of the left response is drained, the next ask reads its own frames
+    assert [partial.message async for partial in chat.ask("next")] == ["next", ""]
+    assert not chat.is_busy() and chat.connection.queue.empty()
+
+
+def test_shared_chat():
+    asyncio.run(_test_shared_chat())
+
+
+async def _test_ask_text():
+    chat = await new_chat()
+
+    stream = chat.ask_text("hello world")
+    assert isinstance(stream, TextStream)
+    deltas = [delta async for delta in stream]
+    logging.debug(f"[chat]: text stream: {stream}")
+
+    assert all(isinstance(delta, str) and delta for delta in deltas)
+    assert "".join(deltas).startswith("hello world hello")
+    assert stream.end and stream.quota > 0
+
+    assert await chat.ask_text("again").text() == " ".join(["again"] * 64)
+    await chat.close_async()
+
+    # early exits release the connection
+    chat = Chat()
+    chat.connection = _EchoConnection()
+    stream = chat.ask_text("hold")
+    async for _ in stream:
+        break
+    assert chat.is_busy()
+    await stream.aclose()
+    assert chat.queue_size == 0
+
+
+def test_ask_text():
+    asyncio.run(_test_ask_text())
+
+
+def test_ask_sync():
+    import threading
+    from chatnio import new_chat_sync, get_background_loop
+
+    chat = asyncio.run(new_chat())  # bound to a loop that is closed afterwards
+    partials = []
+    chat.ask_sync("hello sync", hook=partials.append)
+    assert partials and partials[-1].end
+    assert chat.is_connected() and chat._loop is get_background_loop().loop
+
+    chat.ask_sync("reuse", hook=partials.append)  # the connection stays on the background loop
+    assert chat.close() and not chat.is_connected()
+
+    chats = [new_chat_sync() for _ in range(4)]
+    results = []
+
+    def work(chat):
+        frames = []
+        chat.ask_sync("threads", hook=frames.append)
+        results.append(frames[-1].end)
+
+    threads = [threading.Thread(target=work, args=(chat,)) for chat in chats]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * 4
+    assert all(chat.close() for chat in chats)
+
+
+def test_stream_sync():
+    from chatnio import new_chat_sync, iterate_sync
+
+    chat = new_chat_sync()
+    partials = list(chat.stream_sync("hello stream"))
+    logging.debug(f"[chat]: sync stream: {partials[-1]}")
+    assert all(isinstance(partial, PartialMessage) for partial in partials)
+    assert partials[-1].end and partials[-1].quota > 0
+
+    # leaving early drains the response in the background, the next ask is not polluted by its frames
+    for _ in chat.stream_sync("hello world", buffer=1):
+        break
+    assert "".join(chat.stream_sync("again", text=True)) == " ".join(["again"] * 64)
+    assert chat.is_connected() and chat.queue_size == 0
+    assert chat.close()
+
+    async def failing():
+        yield 1
+        raise ValueError("upstream")
+
+    items = []
+    try:
+        for item in iterate_sync(failing()):
+            items.append(item)
+        assert False, "expected the upstream error"
+    except ValueError:
+        pass
+    assert items == [1]
+
+
+def test_background_loop():
+    from chatnio import BackgroundLoop
+
+    runner = BackgroundLoop("test-loop").start()
+    try:
+        assert runner.running and runner.run(asyncio.sleep(0, "done")) == "done"
+
+        async def inner():
+            runner.run(asyncio.sleep(0))
+
+        try:
+            runner.run(inner())
+            assert False, "expected a deadlock guard"
+        except RuntimeError:
+            pass
+    finally:
+        runner.stop()
+    assert not runner.running
+
+
+def _wait_for(condition, timeout: float = 5.) -> bool:
+    import time
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_close_after_loop(server):
+    from chatnio import ConnectionPool
+
+    # the loop of the connection stopped (still open) or closed: `close` drops the socket anyway
+    loop = asyncio.new_event_loop()
+    for pool in (None, ConnectionPool()):
+        disconnections = server.disconnections
+        chat = loop.run_until_complete(new_chat(1, pool=pool))
+        assert chat.close() and not chat.is_connected()
+        assert _wait_for(lambda: server.disconnections == disconnections + 1)
+        assert pool is None or pool.size == 0
+    loop.close()
+
+    disconnections = server.disconnections
+    chat = asyncio.run(new_chat(1))
+    assert chat.close()
+    assert _wait_for(lambda: server.disconnections == disconnections + 1)
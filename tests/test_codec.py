@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import pytest
+from chatnio import Codec, get_codec, set_codec, new_chat, get_quota, load_conversation
+from chatnio.codec import CODECS
+
+
+def _available():
+    names = []
+    for name in CODECS:
+        try:
+            get_codec(name)
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+@pytest.mark.parametrize("name", _available())
+def test_codec_roundtrip(name):
+    codec = get_codec(name)
+    logging.debug(f"[codec]: testing codec: {codec}")
+    data = {"message": "hello, 世界", "quota": 0.5, "end": False, "list": [1, None]}
+
+    assert isinstance(codec.dumps(data), str)
+    assert isinstance(codec.dumps_bytes(data), bytes)
+    assert codec.loads(codec.dumps(data)) == data
+    assert codec.loads(codec.dumps_bytes(data)) == data
+
+
+def test_codec_unknown():
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+
+
+@pytest.mark.parametrize("name", _available())
+def test_codec_client(name):
+    default = get_codec()
+    try:
+        assert set_codec(name).name == name
+        assert get_quota() > 0
+        assert load_conversation(1).messages[0].content == "hi"
+
+        async def ask():
+            chat = await new_chat(codec=get_codec("json"))
+            assert isinstance(chat.codec, Codec) and chat.codec.name == "json"
+            partials = [partial async for partial in chat.ask("hello")]
+            await chat.close_async()
+            return partials
+
+        assert asyncio.run(ask())[-1].end
+    finally:
+        set_codec(default)
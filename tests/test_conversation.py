@@ -1,5 +1,10 @@
+import json
 import logging
+import asyncio
 from chatnio import list_conversations, load_conversation, delete_conversation, Conversation
+from chatnio import list_conversations_async, load_conversation_async
+from chatnio import iter_conversations, iter_conversations_async
+from chatnio.codec import ArrayStream
 
 
 def test_list_conversations():
@@ -23,3 +28,79 @@ def _test_delete_conversation():
     logging.info(f"[conversation]: delete conversation: {result}")
 
     assert result
+
+
+def test_list_conversations_async():
+    conversations = asyncio.run(list_conversations_async())
+    logging.info(f"[conversation]: load conversations (async): {conversations}")
+
+    assert isinstance(conversations, list)
+    assert all(isinstance(conversation, Conversation) for conversation in conversations)
+
+
+def test_load_conversation_async():
+    conversation = asyncio.run(load_conversation_async(1))
+    logging.info(f"[conversation]: load conversation (async): {conversation}")
+
+    assert isinstance(conversation, Conversation)
+    assert conversation.id == 1
+
+
+def test_iter_conversations():
+    conversations = list(iter_conversations(chunk_size=8))
+    logging.info(f"[conversation]: stream conversations: {conversations}")
+
+    assert [conversation.id for conversation in conversations] == [c.id for c in list_conversations()]
+
+    async def collect():
+        return [conversation async for conversation in iter_conversations_async()]
+
+    assert [conversation.id for conversation in asyncio.run(collect())] == [c.id for c in conversations]
+
+
+def test_array_stream():
+    document = '{"status": true, "message": "\\"data\\": [", "data": [{"id": 1, "name": "é"}, 2, 30]}'.encode()
+    stream = ArrayStream("data")
+
+    items = []
+    for index in range(len(document)):
+        items += stream.feed(document[index:index + 1])
+    assert items == [{"id": 1, "name": "é"}, 2, 30] and stream.done and stream.close() is None
+
+    stream = ArrayStream("data")
+    assert stream.feed(b'{"status": false, "message": "denied"}') == []
+    assert stream.close() == {"status": False, "message": "denied"}
+
+    # only a key of the top level object matches, not one nested in an earlier value
+    stream = ArrayStream("data")
+    items = stream.feed(b'{"meta": {"data": [0], "note": "]}"}, "data": [{"id": 1}, "a]\\"b", null]}')
+    assert items == [{"id": 1}, 'a]"b', None] and stream.done
+    assert ArrayStream().feed(b' [1, [2, {"x": "]"}]]') == [1, [2, {"x": "]"}]]
+
+    # an item split over many chunks is decoded once it is complete (after one attempt when it starts)
+    decoded = []
+
+    class CountingDecoder(json.JSONDecoder):
+        def raw_decode(self, s, idx=0):
+            decoded.append(idx)
+            return super().raw_decode(s, idx)
+
+    stream = ArrayStream("data")
+    stream._decoder = CountingDecoder()
+    item = '{"content": "%s", "list": [%s]}' % ("x\\\"" * 2000, ", ".join(["{}"] * 2000))
+    document = ('{"data": [%s, %s]}' % (item, item)).encode()
+    items = []
+    for index in range(0, len(document), 7):
+        items += stream.feed(document[index:index + 7])
+    assert len(items) == 2 and len(decoded) == 1 + 2 * 2 and items[0]["content"] == 'x"' * 2000
+
+
+def test_lazy_messages():
+    conversation = Conversation({"id": 1, "name": "lazy", "message": [{"role": "user", "content": "hi"}]})
+    assert not conversation.parsed and len(conversation) == 1
+
+    copied = conversation.copy()
+    assert conversation[0].content == "hi" and conversation.parsed and not copied.parsed
+
+    conversation.append_message(conversation[0])
+    assert len(conversation) == 2 and len(copied) == 1
@@ -0,0 +1,58 @@
+import logging
+import chatnio.export
+from chatnio import ExportState, export_conversations, read_archive
+
+
+def test_export_formats(server, tmp_path):
+    ids = [1, server.add_conversation("export", [{"role": "user", "content": "héllo"}])["id"]]
+
+    for name in ("conversations.jsonl", "conversations.bin"):
+        result = export_conversations(str(tmp_path / name), ids + [999])
+        logging.debug(f"[export]: {name}: {result}")
+        assert result.written == 2 and list(result.failed) == [999] and not result
+
+        for use_mmap in (True, False):
+            conversations = sorted(read_archive(str(tmp_path / name), use_mmap=use_mmap), key=lambda c: c.id)
+            assert [conversation.id for conversation in conversations] == ids
+            assert conversations[1][0].content == "héllo"
+
+    assert (tmp_path / "conversations.bin").read_bytes().startswith(chatnio.export.MAGIC)
+    assert len((tmp_path / "conversations.jsonl").read_bytes().splitlines()) == 2
+
+
+def test_export_incremental(server, tmp_path):
+    conversation = server.add_conversation("incremental", [{"role": "user", "content": "hi"}])
+    ids = [1, conversation["id"]]
+    state = str(tmp_path / "state.json")
+
+    assert export_conversations(str(tmp_path / "full.jsonl"), ids, state=state).written == 2
+    assert export_conversations(str(tmp_path / "delta.jsonl"), ids, state=state, incremental=True).written == 0
+
+    conversation["message"].append({"role": "assistant", "content": "hello"})
+    result = export_conversations(str(tmp_path / "delta.jsonl"), ids, state=state, incremental=True)
+    assert result.written == 1 and result.skipped == 1
+    assert [len(c) for c in read_archive(str(tmp_path / "delta.jsonl"))] == [2]
+
+
+def test_export_resume(server, tmp_path, monkeypatch):
+    ids = [server.add_conversation(f"resume {index}")["id"] for index in range(5)]
+    path, state = str(tmp_path / "archive.bin"), str(tmp_path / "state.json")
+
+    fetch = chatnio.export._fetch
+
+    def interrupted(_id, etag):
+        if _id == ids[3]:
+            raise KeyboardInterrupt
+        return fetch(_id, etag)
+
+    monkeypatch.setattr(chatnio.export, "_fetch", interrupted)
+    try:
+        export_conversations(path, ids, state=state, concurrency=1, checkpoint_every=2)
+    except KeyboardInterrupt:
+        pass
+    assert len(ExportState(state).done) == 2
+
+    monkeypatch.setattr(chatnio.export, "_fetch", fetch)
+    result = export_conversations(path, ids, state=state)
+    assert result.skipped == 2 and result.written == 3 and not ExportState(state).in_progress
+    assert sorted(conversation.id for conversation in read_archive(path)) == ids
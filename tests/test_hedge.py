@@ -0,0 +1,158 @@
+import time
+import asyncio
+import logging
+
+import pytest
+import chatnio
+from chatnio import ChatNio, HedgePolicy
+from chatnio.mock import MockServer
+
+
+def answer_model(message: str, model: str) -> str:
+    return f"{model} answered"
+
+
+@pytest.fixture
+def mirrors():
+    with MockServer(stall_rate=1, stall_time=0.5, responder=answer_model) as slow, \
+            MockServer(responder=answer_model) as fast:
+        yield slow, fast
+
+
+def test_hedge_policy():
+    policy = HedgePolicy(history=20, min_samples=5, initial=0.5, percentile=90)
+    assert policy.deadline() == 0.5
+    for latency in range(1, 21):
+        policy.record(latency / 100)
+    assert policy.deadline() == pytest.approx(0.18)
+
+    # only the recent latencies count
+    for _ in range(20):
+        policy.record(0.01)
+    assert policy.deadline() == pytest.approx(0.01)
+    policy.min_delay = 0.05
+    assert policy.deadline() == 0.05
+    assert HedgePolicy(delay=0.2).deadline() == 0.2
+    logging.debug(f"[hedge]: {policy}")
+
+    with pytest.raises(ValueError):
+        HedgePolicy(percentile=0)
+
+
+def test_hedged_chat(mirrors):
+    slow, fast = mirrors
+    targets = [ChatNio(slow.token, slow.url), ChatNio(fast.token, fast.url)]
+
+    async def run():
+        chat = await chatnio.new_hedged_chat(
+            targets=targets, models=["gpt-3.5-turbo-16k"], policy=HedgePolicy(delay=0.05),
+        )
+
+        # the primary stalls, the hedge on the mirror (with the fallback model) answers first
+        start = time.perf_counter()
+        response = "".join([partial.message async for partial in chat.ask("hi", model="gpt-4")])
+        assert time.perf_counter() - start < 0.3
+        assert response == "gpt-3.5-turbo-16k answered"
+        assert chat.hedges == 1 and chat.hedge_wins == 1 and slow.stalls == 1
+
+        # the primary is recorded too, censored at the seconds it ran before it was cancelled
+        assert len(chat.policy.latencies) == 2 and max(chat.policy.latencies) >= 0.05
+
+        # the loser is cancelled: its chat opens a clean connection and is free again
+        await asyncio.sleep(0.1)
+        assert not any(c.is_busy() for c in chat.chats) and all(c.is_connected() for c in chat.chats)
+        assert all(c.drain_timeout == chatnio.Chat.drain_timeout for c in chat.chats)
+
+        slow.stall_rate = 0
+        for _ in range(5):
+            response = "".join([partial.message async for partial in chat.ask("hi", model="gpt-4")])
+            assert response == "gpt-4 answered"
+        assert chat.asks == 6 and chat.hedges == 1
+        logging.debug(f"[hedge]: {chat}")
+        await chat.close_async()
+
+    asyncio.run(run())
+
+
+def test_hedged_chat_failure(mirrors):
+    slow, fast = mirrors
+    slow.stall_rate = 0
+    targets = [ChatNio(slow.token, slow.url), ChatNio(fast.token, fast.url)]
+
+    async def run():
+        chat = await chatnio.new_hedged_chat(targets=targets, policy=HedgePolicy(delay=10))
+
+        # a failed attempt is hedged right away, without waiting for the deadline
+        await chat.chats[0].connection.close()
+        start = time.perf_counter()
+        response = "".join([partial.message async for partial in chat.ask("hi")])
+        assert time.perf_counter() - start < 1 and response == "gpt-3.5-turbo answered"
+        assert chat.hedges == 1 and chat.hedge_wins == 1
+
+        # every attempt failed
+        await chat.chats[1].connection.close()
+        with pytest.raises(Exception):
+            async for _ in chat.ask("hi"):
+                pass
+        await chat.close_async()
+
+    asyncio.run(run())
+
+
+def test_hedged_chat_early_exit(mirrors):
+    slow, _ = mirrors
+
+    async def run():
+        # both attempts stall, leaving after the first frame cancels the one left behind too
+        chat = await chatnio.new_hedged_chat(targets=[ChatNio(slow.token, slow.url)], count=2)
+        chat.policy.initial = 0.05
+        async for partial in chat.ask("hi"):
+            assert partial.message
+            break
+        assert chat.hedges == 1 and slow.stalls == 2
+
+        await asyncio.sleep(0.1)
+        assert not any(c.is_busy() for c in chat.chats)
+        slow.stall_rate = 0
+        assert "".join([partial.message async for partial in chat.ask("hi")]) == "gpt-3.5-turbo answered"
+        await chat.close_async()
+
+    asyncio.run(run())
+
+
+def test_hedged_chat_sync():
+    chat = chatnio.new_hedged_chat_sync(policy=HedgePolicy(delay=1))
+    response = "".join(partial.message for partial in chat.stream_sync("hello world"))
+    assert response.startswith("hello world hello") and chat.asks == 1 and chat.hedges == 0
+    chat.close()
+
+
+def test_hedged_chat_limits(mirrors):
+    slow, fast = mirrors
+
+    async def run():
+        # never more attempts than chats, whatever the policy allows
+        chat = await chatnio.new_hedged_chat(
+            targets=[ChatNio(slow.token, slow.url)], count=1, policy=HedgePolicy(delay=0.01, max_hedges=3),
+        )
+        assert "".join([partial.message async for partial in chat.ask("hi")]) == "gpt-3.5-turbo answered"
+        assert chat.hedges == 0 and slow.stalls == 1
+        await chat.close_async()
+
+        # an attempt waiting too long for its chat fails, and is hedged right away
+        chat = await chatnio.new_hedged_chat(
+            targets=[ChatNio(fast.token, fast.url)], count=2, policy=HedgePolicy(delay=10),
+        )
+        for c in chat.chats:
+            await c._acquire()
+        start = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            async for _ in chat.ask("hi", timeout=0.05):
+                pass
+        assert time.perf_counter() - start < 1 and chat.hedges == 1
+        for c in chat.chats:
+            c._release()
+        assert "".join([partial.message async for partial in chat.ask("hi", timeout=1)]) == "gpt-3.5-turbo answered"
+        await chat.close_async()
+
+    asyncio.run(run())
@@ -0,0 +1,27 @@
+import sys
+import subprocess
+
+HEAVY_MODULES = ("httpx", "websockets", "asyncio")
+
+
+def _loaded_after(code: str) -> list:
+    check = f"import sys; {code}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.check_output([sys.executable, "-c", check], text=True)
+    return output.split()
+
+
+def test_import_is_lazy():
+    assert _loaded_after("import chatnio") == []
+    assert _loaded_after("import chatnio; chatnio.get_quota; chatnio.set_key('sk-...')") == []
+    assert "websockets" not in _loaded_after("import chatnio; chatnio.Chat")
+
+
+def test_lazy_attributes():
+    import chatnio
+
+    assert chatnio.get_quota is chatnio.quota.get_quota
+    assert chatnio.client is chatnio.globals.get_client()
+    assert set(chatnio.__all__) <= set(dir(chatnio))
+    assert len(chatnio.__all__) == len(set(chatnio.__all__))
+    assert len(chatnio._ATTRIBUTES) == sum(len(names) for names in chatnio._LAZY_IMPORTS.values())
+    assert all(getattr(chatnio, name) is not None for name in chatnio.__all__)
@@ -0,0 +1,116 @@
+import time
+import asyncio
+import logging
+import pytest
+from chatnio import QuotaMeter, enable_quota_meter, disable_quota_meter, get_quota, new_chat
+
+
+@pytest.fixture
+def meter():
+    budgets = []
+    yield enable_quota_meter(budget=0.001, on_budget=budgets.append)
+    disable_quota_meter()
+
+
+def test_quota_meter():
+    budgets = []
+    meter = QuotaMeter(budget=1., on_budget=budgets.append)
+    meter.record(0.5, 1, "gpt-4", "sk-0123456789abcdef")
+    meter.record(0.25, 2, "gpt-3.5-turbo", "sk-0123456789abcdef")
+    assert meter.total == 0.75 and not budgets and not meter.over_budget
+
+    meter.record(0.5, 1, "gpt-4", "sk-other-key-0000")
+    meter.record(0.5, 1, "gpt-4", "sk-other-key-0000")
+    assert budgets == [meter] and meter.over_budget
+    assert meter.by_conversation == {1: 1.5, 2: 0.25} and meter.by_model["gpt-4"] == 1.5
+    assert meter.by_key == {"sk-...cdef": 0.75, "sk-...0000": 1.}
+
+    meter.reset()
+    assert meter.total == 0 and meter.responses == 0 and meter.by_model == {}
+
+
+def test_quota_meter_chat(server, meter):
+    quota = meter.reconcile()
+    assert meter.remaining == quota
+
+    async def ask():
+        chat = await new_chat(1)
+        try:
+            async for _ in chat.ask("count my quota", "gpt-4"):
+                pass
+        finally:
+            await chat.close_async()
+
+    asyncio.run(ask())
+    logging.debug(f"[meter]: after one response: {meter}")
+
+    assert meter.responses == 1 and meter.total > 0 and meter.by_conversation == {1: meter.total}
+    assert meter.by_model == {"gpt-4": meter.total} and meter.over_budget
+    assert meter.remaining == pytest.approx(get_quota())
+
+    assert meter.reconcile() == pytest.approx(quota - meter.total) and meter.drift == pytest.approx(0)
+
+
+def test_quota_meter_reconcile_interval(server):
+    meter = QuotaMeter(reconcile_interval=60)
+    meter.record(0.1)  # the first record reconciles in the background
+
+    deadline = time.monotonic() + 5
+    while meter.remaining is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert meter.remaining == pytest.approx(get_quota())
+
+
+def test_quota_meter_accounts(server):
+    from chatnio import ChatNio
+    from chatnio.mock import MockServer
+
+    with MockServer(token="sk-mock-other", quota=50.) as other:
+        first, second = ChatNio(server.token, server.url), ChatNio(other.token, other.url)
+        meter = enable_quota_meter(reconcile_interval=60)
+
+        async def ask(client):
+            chat = await client.new_chat()
+            try:
+                async for _ in chat.ask("count my quota", "gpt-4"):
+                    pass
+            finally:
+                await chat.close_async()
+
+        async def run():
+            await ask(first)
+            await ask(second)
+            # the end frames reconcile every account with its own client, in the background
+            while meter.get_remaining(first) is None or meter.get_remaining(second) is None:
+                await asyncio.sleep(0.01)
+
+        try:
+            asyncio.run(asyncio.wait_for(run(), 5))
+        finally:
+            disable_quota_meter()
+
+        # the spend of one key is never taken from the quota of the other
+        assert meter.get_remaining(first) == pytest.approx(first.get_quota())
+        assert meter.get_remaining(second) == pytest.approx(second.get_quota())
+        assert meter.get_remaining(second) < 50 < meter.get_remaining(first)
+        with second.use():
+            assert meter.remaining == meter.get_remaining(second) and meter.drift == 0
+
+        first.close()
+        second.close()
+
+
+def test_quota_meter_reconcile_failure():
+    from chatnio import ChatNio
+    from chatnio.mock import MockServer
+
+    with MockServer(error_rate=1, error_status=503) as down:
+        client = ChatNio(down.token, down.url)
+        meter = QuotaMeter(reconcile_interval=60)
+        for _ in range(5):
+            meter.record(0.1, client=client)
+            time.sleep(0.05)
+
+        # the failed reconciliation waits for the next interval, instead of being retried on every response
+        assert down.requests == 1 and meter.get_remaining(client) is None
+        client.close()
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import httpx
+import pytest
+import chatnio
+from chatnio import new_chat, get_quota, load_conversation
+from chatnio.mock import MockServer
+
+
+@pytest.fixture
+def mock(server):
+    """A dedicated mock server, the endpoint is restored afterwards"""
+
+    servers = []
+    token = chatnio.get_token()
+
+    def start(**options):
+        instance = MockServer(**options).start()
+        servers.append(instance)
+        chatnio.set_endpoint(instance.url)
+        chatnio.set_key(instance.token)
+        return instance
+
+    yield start
+
+    for instance in servers:
+        instance.stop()
+    if server is not None:
+        chatnio.set_endpoint(server.url)
+    chatnio.set_key(token)
+
+
+async def _ask(message: str) -> list:
+    chat = await new_chat()
+    try:
+        return [partial async for partial in chat.ask(message)]
+    finally:
+        await chat.close_async()
+
+
+def test_mock_chunks(mock):
+    server = mock(chunk_size=16, responder=lambda message, model: " ".join([model] * 40))
+    partials = asyncio.run(_ask("hi"))
+    logging.debug(f"[mock]: partials: {partials}")
+
+    assert len(partials) == 4  # 16 + 16 + 8 tokens, then the end frame
+    assert "".join(partial.message for partial in partials) == " ".join(["gpt-3.5-turbo"] * 40)
+    assert partials[-1].end and partials[-1].quota == pytest.approx(0.04)
+    assert get_quota() == pytest.approx(100 - 0.04)
+
+    conversation = load_conversation(max(server.conversations))
+    assert [message.role for message in conversation] == ["user", "assistant"]
+
+
+def test_mock_error_injection(mock):
+    mock(error_rate=1, error_status=503)
+    with pytest.raises(httpx.HTTPStatusError):
+        get_quota()
+
+
+def test_mock_drop(mock):
+    mock(drop_rate=1, seed=1)
+    with pytest.raises(Exception):
+        asyncio.run(_ask("hello"))
+
+
+def test_mock_unauthorized(mock):
+    mock(token="sk-other")
+    chatnio.set_key("sk-wrong")
+    with pytest.raises(chatnio.AuthenticationError):
+        get_quota()
+
+
+class _BrokenConnection(object):
+    """A socket that looks open but fails on the first message"""
+
+    async def send(self, message):
+        raise ConnectionResetError("connection reset by peer")
+
+    async def close(self):
+        pass
+
+
+def test_reconnect(mock):
+    server = mock(drop_rate=1., seed=1)
+    policy = chatnio.ReconnectPolicy(base_delay=0.01)
+
+    async def run():
+        chat = await new_chat(reconnect=policy)
+        try:
+            # dropped in the middle of the response: surfaced, and the chat reconnects for the next ask
+            with pytest.raises(chatnio.StreamInterrupted) as info:
+                async for _ in chat.ask("drop me"):
+                    pass
+            assert info.value.received and chat.is_connected() and chat.reconnects == 1
+
+            server.drop_rate = 0.
+            assert len([partial async for partial in chat.ask("hello")]) > 1
+
+            # interrupted before the first frame: sent again on a new connection
+            chat.connection = _BrokenConnection()
+            partials = [partial async for partial in chat.ask("again")]
+            assert partials[-1].end and chat.reconnects == 2
+
+            # a connection closed in between is detected and reopened before the next ask
+            await chat.connection.close()
+            assert not chat.is_connected()
+            assert [partial async for partial in chat.ask("reopen")][-1].end
+            assert chat.reconnects == 3
+        finally:
+            await chat.close_async()
+
+    asyncio.run(run())
+
+
+def test_reconnect_policy():
+    policy = chatnio.ReconnectPolicy(base_delay=1., max_delay=5., jitter=False)
+    assert [policy.delay(attempt) for attempt in range(6)] == [0., 1., 2., 4., 5., 5.]
+    assert 0 <= chatnio.ReconnectPolicy(base_delay=1.).delay(3) <= 4.
@@ -0,0 +1,84 @@
+import asyncio
+import chatnio.pool
+from chatnio import ConnectionPool, new_chat
+from .test_chat import _EchoConnection
+
+opened = []
+
+
+async def _open_echo_connection(uri: str, token: str, conversation_id: int, codec=None):
+    connection = _EchoConnection()
+    opened.append(connection)
+    return connection
+
+
+async def _ask(chat, message):
+    return "".join([partial.message async for partial in chat.ask(message)])
+
+
+async def _test_pool_reuse():
+    pool = ConnectionPool(max_size=2)
+
+    # existing conversation: the connection goes back to the pool after every response
+    chat = await new_chat(42, pool=pool)
+    assert await _ask(chat, "hi") == "hi"
+    assert chat.connection is None and pool.size == 1
+
+    other = await new_chat(42, pool=pool)
+    assert pool.hits == 1 and pool.size == 0
+    assert await _ask(chat, "again") == "again"
+    assert len(opened) == 2
+
+    # new conversation: kept by the chat, never shared once used
+    fresh = await new_chat(pool=pool)
+    await _ask(fresh, "new")
+    assert fresh.connection is not None
+    fresh.close()
+    assert pool.size == 1
+
+    other.close()
+    assert pool.size == 2 and len(pool) == 2
+    await pool.close()
+    assert pool.size == 0
+
+
+async def _test_pool_idle_timeout():
+    pool = ConnectionPool(idle_timeout=0)
+    chat = await new_chat(7, pool=pool)
+    chat.close()
+
+    await asyncio.sleep(0.01)
+    await pool.acquire(chat.uri, chat.token, 7)
+    assert pool.hits == 0 and pool.misses == 2
+
+
+def test_pool(monkeypatch):
+    monkeypatch.setattr(chatnio.pool, "open_connection", _open_echo_connection)
+    asyncio.run(_test_pool_reuse())
+    asyncio.run(_test_pool_idle_timeout())
+
+
+class _CountingCodec(chatnio.Codec):
+    def __init__(self):
+        self.frames = []
+
+    def dumps(self, data):
+        self.frames.append(data)
+        return super().dumps(data)
+
+
+async def _test_pool_codec():
+    # the handshake of a pooled connection goes through the codec of the chat, like every other frame
+    pool, codec = ConnectionPool(), _CountingCodec()
+    chat = await new_chat(pool=pool, codec=codec)
+    assert (await _ask(chat, "hi")).startswith("hi")
+    assert "token" in codec.frames[0] and codec.frames[1]["message"] == "hi"
+
+    await pool.warm(chat.uri, chat.token, 7, codec=codec)
+    assert codec.frames[-1]["id"] == 7
+    chat.close()
+    await pool.close()
+
+
+def test_pool_codec():
+    asyncio.run(_test_pool_codec())
@@ -1,5 +1,10 @@
+import time
 import logging
+import asyncio
+
+import pytest
 from chatnio import get_quota, buy_quota, get_package, get_subscription, buy_subscription, Subscription
+from chatnio import get_quota_async, get_package_async, get_subscription_async
 
 
 def test_get_quota():
@@ -37,3 +42,89 @@ def _test_buy_subscription():
 
     assert result
 
+
+def test_get_quota_async():
+    quota = asyncio.run(get_quota_async())
+    logging.debug(f"[quota]: get current quota (async): {quota}")
+    assert quota >= 0
+
+
+def test_get_package_async():
+    result = asyncio.run(get_package_async())
+    logging.debug(f"[quota]: get package (async): {result}")
+
+    assert isinstance(result, dict)
+    assert "cert" in result and "teenager" in result
+
+
+def test_get_subscription_async():
+    result = asyncio.run(get_subscription_async())
+    logging.debug(f"[quota]: get subscription (async): {result}")
+
+    assert isinstance(result, Subscription)
+
+
+def test_account_status(server):
+    from concurrent.futures import ThreadPoolExecutor
+    from chatnio import AccountStatus, get_account_status, get_account_status_async, invalidate_account_status
+
+    invalidate_account_status()
+    requests = server.requests
+    with ThreadPoolExecutor(8) as executor:
+        statuses = list(executor.map(lambda _: get_account_status(), range(8)))
+    logging.debug(f"[quota]: account status: {statuses[0]}")
+
+    assert isinstance(statuses[0], AccountStatus) and all(status is statuses[0] for status in statuses)
+    assert server.requests == requests + 3
+    assert statuses[0].quota == get_quota() and isinstance(statuses[0].subscription, Subscription)
+
+    buy_quota(1)  # purchases invalidate the status
+    status = get_account_status()
+    assert status is not statuses[0] and status.quota == statuses[0].quota + 1
+
+    async def run():
+        invalidate_account_status()
+        return await asyncio.gather(*[get_account_status_async() for _ in range(8)])
+
+    requests = server.requests
+    statuses = asyncio.run(run())
+    assert all(status is statuses[0] for status in statuses) and server.requests == requests + 3
+
+
+def test_account_status_invalidation(server):
+    import threading
+    from chatnio import ChatNio, invalidate_account_status
+    from chatnio.mock import MockServer
+
+    with MockServer() as other:
+        first, second = ChatNio(server.token, server.url), ChatNio(other.token, other.url)
+        assert first.get_executor() is not second.get_executor()  # no queueing behind other clients
+        with first.use():
+            invalidate_account_status()
+        status, other_status = first.get_account_status(), second.get_account_status()
+
+        # a purchase drops the status of its own account only
+        requests = other.requests
+        assert first.buy_quota(1) and first.get_account_status() is not status
+        assert second.get_account_status() is other_status and other.requests == requests
+
+        # a failed purchase keeps it
+        other.error_rate = 1
+        with pytest.raises(Exception):
+            second.buy_quota(1)
+        other.error_rate = 0
+        assert second.get_account_status() is other_status
+
+        # a caller after a purchase does not join the fetch that started before it
+        other.latency = 0.1
+        stale = []
+        thread = threading.Thread(target=lambda: stale.append(second.get_account_status(max_age=0)))
+        thread.start()
+        time.sleep(0.05)
+        with second.use():
+            invalidate_account_status()  # as a purchase does
+        fresh = second.get_account_status(max_age=0)
+        thread.join()
+        assert fresh is not stale[0] and second.get_account_status() is fresh
+        first.close()
+        second.close()
@@ -0,0 +1,85 @@
+import time
+import asyncio
+import logging
+
+import pytest
+import chatnio
+from chatnio import ChatNio, TokenBucket
+from chatnio.mock import MockServer
+from chatnio.ratelimit import parse_retry_after
+
+
+@pytest.fixture
+def limited():
+    """
+    A server allowing 20 requests per second, and a limiter starting well above it
+    """
+
+    with MockServer(rate_limit=20) as mock:
+        mock.add_conversation("limited", _id=1)
+        limiter = chatnio.enable_rate_limiter(rate=80, max_retries=10)
+        try:
+            yield mock, limiter
+        finally:
+            chatnio.disable_rate_limiter()
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, burst=5)
+    start = time.perf_counter()
+    for _ in range(15):
+        bucket.wait()
+    assert time.perf_counter() - start >= 0.09  # 5 at once, then 10 at 100 per second
+
+    bucket.on_throttled(0.05)
+    assert bucket.rate == 70 and bucket.throttled == 1
+    start = time.perf_counter()
+    bucket.wait()
+    assert time.perf_counter() - start >= 0.05  # held for the retry after
+
+    bucket.on_throttled(0.)
+    assert bucket.rate == 70 and bucket.throttled == 2  # one slow down per window
+    bucket.on_success()
+    assert bucket.rate > 70
+
+    assert parse_retry_after("1.5") == 1.5 and parse_retry_after("soon") is None and parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.
+
+
+def test_rate_limiter(limited):
+    server, limiter = limited
+    client = ChatNio(server.token, server.url)
+
+    results = list(client.load_conversations([1] * 60, concurrency=16))
+    assert all(result.ok for result in results)
+    assert server.throttled and limiter.retries >= server.throttled
+
+    bucket = limiter.bucket(server.url, server.token)
+    logging.debug(f"[ratelimit]: {limiter}, {bucket}, server throttled {server.throttled}")
+    assert bucket is limiter.buckets[(server.url, server.token)] and bucket.rate < 80  # adapted to the server
+
+    # without the limiter, the same burst fails
+    chatnio.disable_rate_limiter()
+    time.sleep(1)
+    results = list(client.load_conversations([1] * 60, concurrency=16))
+    assert not all(result.ok for result in results)
+
+
+def test_rate_limiter_async(limited):
+    server, limiter = limited
+    client = ChatNio(server.token, server.url)
+
+    async def run():
+        conversations = await asyncio.gather(*(client.load_conversation_async(1) for _ in range(40)))
+        assert all(conversation is not None for conversation in conversations)
+
+        # the websocket handshakes share the bucket of the endpoint and key, and are retried on 429 too
+        server.rate_limit, throttled = 2, server.throttled
+        chats = await asyncio.gather(*(client.new_chat() for _ in range(6)))
+        assert server.throttled > throttled
+        for chat in chats:
+            await chat.close_async()
+        await client.close_async()
+
+    asyncio.run(run())
+    assert server.throttled and len(limiter.buckets) == 1
@@ -0,0 +1,104 @@
+import copy
+import pytest
+from chatnio import MessageList, ColumnarMessages, Conversation
+from chatnio.conversation import Message
+from chatnio.quota import Subscription
+
+
+def test_message_list():
+    messages = MessageList([2, 3])
+    messages.extendleft([0, 1])
+    messages.append(4)
+    messages.appendleft(-1)
+
+    assert messages == [-1, 0, 1, 2, 3, 4] and len(messages) == 6
+    assert messages[0] == -1 and messages[-1] == 4 and messages[2] == 1
+    assert messages[1:4] == [0, 1, 2] and messages[::-2] == [4, 2, 0]
+    assert list(reversed(messages)) == [4, 3, 2, 1, 0, -1]
+    assert 0 in messages and 9 not in messages
+
+    messages.splice(1, ["a", "b"])
+    messages.splice(6, ["c"])
+    assert messages == [-1, "a", "b", 0, 1, 2, "c", 3, 4]
+
+    del messages[1:3]
+    del messages[4]
+    messages.insert(1, "x")
+    messages[0] = "y"
+    assert messages == ["y", "x", 0, 1, 2, 3, 4]
+    assert messages.pop(0) == "y" and messages.pop() == 4
+
+    messages.reverse()
+    assert messages == [3, 2, 1, 0, "x"]
+    assert messages + ["z"] == [3, 2, 1, 0, "x", "z"]
+
+    with pytest.raises(IndexError):
+        messages[5]
+
+
+def test_conversation_insert_messages():
+    conversation = Conversation({"id": 1, "name": "history", "message": [{"role": "user", "content": "3"}]})
+    conversation.insert_messages([Message("user", "1"), Message("assistant", "2")])
+    conversation.insert_message(Message("assistant", "0"))
+    conversation.append_messages([Message("user", "4")])
+
+    assert [message.content for message in conversation] == ["0", "1", "2", "3", "4"]
+    assert [message.content for message in conversation[1:3]] == ["1", "2"]
+    assert conversation[-1].content == "4" and len(conversation) == 5
+
+    conversation.length = 2
+    assert isinstance(conversation.messages, MessageList)
+    assert [message.content for message in conversation.get_messages()] == ["0", "1"]
+
+
+def test_columnar_messages():
+    messages = ColumnarMessages([Message("user", "c"), Message("assistant", "dé")])
+    messages.extendleft([Message("user", "a"), Message("assistant", "b")])
+    messages.append(Message("system", "e"))
+
+    assert [message.content for message in messages] == ["a", "b", "c", "dé", "e"]
+    assert messages[3] == Message("assistant", "dé") and messages[-1].role == "system"
+    assert [message.content for message in messages[1:3]] == ["b", "c"]
+    assert [message.content for message in reversed(messages)] == ["e", "dé", "c", "b", "a"]
+    assert messages.nbytes < 64
+
+    messages.splice(2, [Message("user", "x"), Message("user", "yy")])
+    messages[0] = Message("assistant", "zzz")
+    del messages[-2]
+    del messages[1:2]
+    assert [message.content for message in messages] == ["zzz", "x", "yy", "c", "e"]
+    assert messages.pop().content == "e" and len(messages) == 4
+
+    copied = messages.copy()
+    copied.append(Message("user", "f"))
+    assert len(messages) == 4 and len(copied) == 5
+
+    with pytest.raises(IndexError):
+        messages[4]
+
+
+def test_columnar_conversation():
+    data = {"id": 1, "name": "compact", "message": [{"role": "user", "content": "hi"}, {"role": "assistant"}]}
+    conversation = Conversation(data, columnar=True)
+
+    assert conversation.columnar and isinstance(conversation.messages, ColumnarMessages)
+    assert [message.content for message in conversation] == ["hi", ""]
+    assert list(Conversation(data).compact()) == list(conversation)
+
+    conversation.append_message(Message("user", "more"))
+    copied = conversation.copy()
+    copied.length = 1
+    assert len(conversation) == 3 and len(copied) == 1 and copied.columnar
+
+
+def test_slots():
+    message = Message("".join(["us", "er"]), "hi")
+    assert message.role is Message("user", "hello").role
+
+    conversation = Conversation({"id": 1, "name": "slots"})
+    subscription = Subscription({"is_subscribed": True, "expired": 3})
+    for instance in (message, conversation, subscription):
+        assert not hasattr(instance, "__dict__")
+
+    assert copy.copy(conversation).name == "slots"
+    assert bool(subscription) and int(subscription) == 3
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import threading
+
+import pytest
+import chatnio
+from chatnio import ChatNio, TransportConfig
+from chatnio.mock import MockServer
+
+
+@pytest.fixture
+def mirror():
+    with MockServer() as mock:
+        mock.add_conversation("mirror", _id=1)
+        yield mock
+
+
+def test_transport_config(server):
+    config = TransportConfig(max_connections=4, max_keepalive_connections=2, keepalive_expiry=1., read_timeout=30)
+    assert config.replace(read_timeout=30) == config and config.replace(retries=2) != config
+    logging.debug(f"[transport]: {config}")
+
+    client = ChatNio(server.token, server.url, transport=config)
+    assert client.get_client().timeout.read == 30 and client.get_quota() >= 0
+    client.set_transport(config.replace(read_timeout=1))
+    assert client.get_client().timeout.read == 1 and client.get_quota() >= 0
+    client.close()
+
+    chatnio.set_transport(max_connections=8, connect_timeout=2)
+    try:
+        assert chatnio.get_transport().max_connections == 8 and chatnio.get_client().timeout.connect == 2
+        assert chatnio.get_quota() >= 0
+    finally:
+        chatnio.set_transport(None)
+    assert chatnio.get_transport() is None
+
+    with pytest.raises(ValueError):
+        TransportConfig(http1=False)
+
+
+def test_set_endpoint(server, mirror):
+    client = ChatNio(server.token, server.url)
+    old = client.get_client()
+
+    # a response in flight on the old endpoint survives the switch
+    with old.stream("GET", "/conversation/load", params={"id": 1}) as response:
+        client.set_endpoint(mirror.url)
+        assert client.get_client() is not old
+        assert client.load_conversation(1).name == "mirror"
+        assert response.read() and response.json()["data"]["name"] == "hello"
+        assert old._transport.retired and old._transport.in_flight == 0
+
+    # the retired client is closed once its last response is closed, even after a late request
+    assert old._transport.transport._pool.connections == []
+    assert old.get("/quota").status_code == 200 and old._transport.transport._pool.connections == []
+
+    # calls racing the switch land on either endpoint, without failing
+    errors = []
+
+    def load():
+        for _ in range(50):
+            try:
+                client.load_conversation(1)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for url in [server.url, mirror.url] * 5:
+        client.set_endpoint(url)
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    client.close()
+
+
+def test_set_endpoint_async(server, mirror):
+    client = ChatNio(server.token, server.url)
+
+    async def run():
+        old = client.get_async_client()
+        assert (await client.load_conversation_async(1)).name == "hello"
+        client.set_endpoint(mirror.url)
+        assert (await client.load_conversation_async(1)).name == "mirror"
+        await asyncio.sleep(0.01)
+        assert old._transport.retired and old._transport.transport._pool.connections == []
+        await client.close_async()
+
+    asyncio.run(run())
+
+
+def test_http2(server):
+    pytest.importorskip("h2")
+
+    client = ChatNio(server.token, server.url, transport=TransportConfig(http2=True, http1=False))
+    connections = server.http2_connections
+    assert client.get_client().get("/quota").http_version == "HTTP/2"
+
+    async def run():
+        conversations = await asyncio.gather(*(client.load_conversation_async(1) for _ in range(50)))
+        assert all(conversation.name == "hello" for conversation in conversations)
+        await client.close_async()
+
+    asyncio.run(run())
+    # one connection per client, every request multiplexed on it
+    assert server.http2_connections - connections == 2
+    client.close()